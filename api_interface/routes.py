@@ -1,18 +1,39 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+import asyncio
+import hmac
+import time
+from urllib.parse import quote
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Header, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import logging
 import os
-import uuid
+
+import config
 
 # Import functions from Whisper module
-from speech_to_text.whisper_handler import transcribe_audio_file
-from nlp_engine.response_generator import generate_response 
+from speech_to_text.whisper_handler import TranscriptionError, transcribe_audio, load_audio
+from speech_to_text.long_form import transcribe_long_audio
+from speech_to_text.streaming import StreamingSession
+from nlp_engine.response_generator import build_cached_reply, response_cache, catalog_manager
+from text_to_speech.kokoro_handler import get_tts_status, stream_speech, SAMPLE_RATE, SENTENCE_SPLIT_PATTERN
+from text_to_speech.player import wav_header, pcm16_bytes
+from text_to_speech.tts_cache import tts_cache
+from text_to_speech.audio_store import audio_store, MEDIA_TYPES
+from speech_to_text.batching import whisper_batcher
+from utils.executors import search_executor, stt_executor, tts_executor, StageSaturated, executor_stats, prefetch
+from utils.startup import startup_loader, ComponentNotReady, READY
+from utils.metrics import registry, COUNTER, GAUGE
+from utils.profiler import sampling_profiler
+from logs.store import conversation_log, log_chat_reply
+from chat_interface.web_chat import extract_tts_text
+from voice_interface.twilio_handler import telephony_audio_cache
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Define temporary directory path for audio files
-# This path should be set as absolute or relative to project root
-TEMP_AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'temp_audio_files')
+# Temporary directory for audio formats that cannot be decoded from memory
+TEMP_AUDIO_DIR = config.TEMP_AUDIO_DIR
 
 # Model for text chat message input
 class MessageInput(BaseModel):
@@ -28,61 +49,379 @@ async def api_health_check():
     """
     return {"status": "ok", "message": "API is healthy"}
 
+@router.get("/api/ready")
+async def api_ready_check():
+    """
+    Readiness check: load state and load time of each component (catalog, Whisper, TTS).
+    Returns 200 once the required components are loaded (the catalog, so text chat works), 503 before.
+    """
+    status = startup_loader.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@router.get("/api/response_cache")
+async def response_cache_stats():
+    """
+    Hit/miss counters of the chat response cache.
+    """
+    return response_cache.stats()
+
+@router.get("/api/catalog")
+async def catalog_status():
+    """
+    Version, size and source (CSV or prebuilt snapshot) of the catalog in use, and the reload counters.
+    """
+    return catalog_manager.stats()
+
+def require_admin_token(x_admin_token: str):
+    """The /api/admin/* endpoints need the X-Admin-Token header to match ADMIN_API_TOKEN (disabled when it is empty)."""
+    if not config.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="The admin API is disabled (ADMIN_API_TOKEN is not set).")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+@router.post("/api/admin/catalog/reload")
+async def reload_catalog(x_admin_token: str = Header(None)):
+    """
+    Re-reads products.csv and swaps the new catalog in without a restart.
+    Requires the admin token (see require_admin_token).
+    If the file cannot be read, the catalog in use is kept.
+    """
+    require_admin_token(x_admin_token)
+
+    try:
+        # Parsing and index building run off the event loop; requests keep using the old catalog meanwhile
+        return await asyncio.to_thread(catalog_manager.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Catalog reload failed, the previous catalog is still in use: {e}")
+
+@router.get("/api/conversation_log")
+async def conversation_log_stats():
+    """
+    Queued, written and dropped records of the conversation log writer.
+    """
+    return conversation_log.stats()
+
+@router.get("/api/tts_status")
+async def tts_status():
+    """
+    Readiness and per-call latency of the text-to-speech engine, and the TTS audio cache counters.
+    """
+    return {**get_tts_status(), "cache": tts_cache.stats()}
+
+@router.api_route(config.AUDIO_URL_PREFIX + "/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_audio(file_path: str, request: Request):
+    """
+    Serves a synthesized reply from the audio store.
+    Files are content-addressed (the name is the hash of text and voice), so the name is a strong
+    ETag and responses may be cached as immutable; If-None-Match gets a 304 and Range requests
+    (seeking in the browser's audio player) get a 206 with just the requested bytes.
+    """
+    found = audio_store.lookup(file_path)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+    path, _ = found
+
+    headers = {
+        "ETag": f'"{path.stem}"',
+        "Cache-Control": f"public, max-age={config.AUDIO_HTTP_MAX_AGE_SECONDS}, immutable",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or headers["ETag"] in if_none_match):
+        return Response(status_code=304, headers=headers)
+    # FileResponse streams the file and handles Range/If-Range (206, 416) itself
+    return FileResponse(path, media_type=MEDIA_TYPES.get(path.suffix, "application/octet-stream"), headers=headers)
+
+@router.get("/api/stages")
+async def stage_stats():
+    """
+    Running, completed and rejected jobs of the search/STT/TTS stage executors,
+    and the batch sizes of the Whisper batcher.
+    """
+    return {**executor_stats(), "whisper_batcher": whisper_batcher.stats()}
+
+def collect_app_metrics():
+    """
+    Scrape-time metrics read from the counters the components already keep (see utils.metrics):
+    stage pools and queues, caches, the conversation log, component load times and the profiler.
+    """
+    stages = executor_stats()
+    yield ("callcenter_stage_workers", GAUGE, "Worker threads of each stage pool.",
+           [({"stage": name}, stats["workers"]) for name, stats in stages.items()])
+    yield ("callcenter_stage_in_flight", GAUGE, "Jobs running or waiting in each stage pool.",
+           [({"stage": name}, stats["in_flight"]) for name, stats in stages.items()])
+    yield ("callcenter_stage_queue_depth", GAUGE, "Jobs waiting for a free worker of each stage pool.",
+           [({"stage": name}, max(0, stats["in_flight"] - stats["workers"])) for name, stats in stages.items()])
+    yield ("callcenter_stage_jobs", COUNTER, "Jobs of each stage pool, by outcome.",
+           [({"stage": name, "outcome": outcome}, stats[outcome]) for name, stats in stages.items() for outcome in ("completed", "rejected")])
+
+    batcher = whisper_batcher.stats()
+    yield ("callcenter_whisper_batcher_queue_depth", GAUGE, "Transcriptions waiting for the next Whisper batch.", [({}, batcher["waiting"])])
+    log = conversation_log.stats()
+    yield ("callcenter_conversation_log_queue_depth", GAUGE, "Conversation records waiting for the log writer.", [({}, log["queued"])])
+    yield ("callcenter_conversation_log_records", COUNTER, "Conversation records, by outcome.",
+           [({"outcome": outcome}, log[outcome]) for outcome in ("written", "dropped")])
+
+    caches = {"response": response_cache.stats(), "tts_audio": tts_cache.stats(), "telephony_audio": telephony_audio_cache.stats()}
+    yield ("callcenter_cache_lookups", COUNTER, "Cache lookups, by cache and result.",
+           [({"cache": name, "result": result}, stats[key]) for name, stats in caches.items() for result, key in (("hit", "hits"), ("miss", "misses"))])
+    yield ("callcenter_cache_hit_ratio", GAUGE, "Share of cache lookups that were hits since startup.",
+           [({"cache": name}, stats["hits"] / (stats["hits"] + stats["misses"]) if stats["hits"] + stats["misses"] else 0.0)
+            for name, stats in caches.items()])
+    yield ("callcenter_cache_entries", GAUGE, "Entries held by each cache.",
+           [({"cache": name}, stats.get("size", stats.get("entries"))) for name, stats in caches.items()])
+    yield ("callcenter_audio_store_bytes", GAUGE, "Bytes of synthesized audio on disk.", [({}, caches["tts_audio"]["bytes"])])
+
+    components = startup_loader.status()["components"]
+    yield ("callcenter_component_ready", GAUGE, "Whether each component (catalog, Whisper, TTS) has loaded.",
+           [({"component": name}, component["state"] == READY) for name, component in components.items()])
+    yield ("callcenter_component_load_seconds", GAUGE, "Seconds each component took to load (so far, while loading).",
+           [({"component": name}, component["seconds"]) for name, component in components.items() if component["seconds"] is not None])
+
+    catalog = catalog_manager.stats()
+    yield ("callcenter_catalog_products", GAUGE, "Products in the catalog in use.", [({}, catalog["products"])])
+    yield ("callcenter_catalog_version", GAUGE, "Version of the catalog in use (incremented on every load).", [({}, catalog["version"])])
+    yield ("callcenter_catalog_load_seconds", GAUGE, "Seconds the last catalog load took.", [({}, catalog["load_seconds"])])
+
+    tts = get_tts_status()
+    yield ("callcenter_tts_idle_pipelines", GAUGE, "Kokoro pipelines not in use, by language code.",
+           [({"lang_code": lang_code}, idle) for lang_code, idle in tts["idle_pipelines"].items()])
+
+    profiler = sampling_profiler.stats()
+    yield ("callcenter_profiler_running", GAUGE, "Whether the sampling profiler is running.", [({}, profiler["running"])])
+    yield ("callcenter_profiler_samples", COUNTER, "Stack samples taken by the current profile.", [({}, profiler["samples"])])
+
+registry.add_collector(collect_app_metrics)
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Every metric in the Prometheus text format: per-stage latency histograms, HTTP request
+    latency, file writes, audio seconds, and the queue/cache/load-time gauges collected above.
+    """
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.post("/api/admin/profiler/start")
+async def start_profiler(interval_ms: int = None, seconds: float = config.PROFILER_MAX_SECONDS, x_admin_token: str = Header(None)):
+    """
+    Starts the sampling profiler (a new profile; it stops by itself after `seconds`).
+    Requires the admin token (see require_admin_token).
+    """
+    require_admin_token(x_admin_token)
+    return await asyncio.to_thread(sampling_profiler.start, interval_ms, min(seconds, config.PROFILER_MAX_SECONDS))
+
+@router.post("/api/admin/profiler/stop")
+async def stop_profiler(x_admin_token: str = Header(None)):
+    require_admin_token(x_admin_token)
+    return await asyncio.to_thread(sampling_profiler.stop)
+
+@router.get("/api/admin/profiler")
+async def profiler_report(include_idle: bool = False, top: int = None, x_admin_token: str = Header(None)):
+    """
+    The current (or last) profile as collapsed stacks, e.g. for flamegraph.pl or speedscope.
+    Stacks of idle threads (waiting pool workers, the event loop's select) are left out unless include_idle.
+    """
+    require_admin_token(x_admin_token)
+    stats = sampling_profiler.stats()
+    return PlainTextResponse(sampling_profiler.collapsed(include_idle=include_idle, top=top),
+                             headers={"X-Profiler-Samples": str(stats["samples"]), "X-Profiler-Running": str(stats["running"]).lower()})
+
 # Route for receiving text message (from chat UI or after voice conversion)
 @router.post("/chat")
-def chat_response(data: MessageInput):
+async def chat_response(data: MessageInput):
     """
     Receives text message and sends it to NLP engine to generate response.
+    Returns the reply text/HTML together with the structured result (intent, products, related products).
     """
-    print(f"Received text message from {data.source}: {data.text}")
-    reply_text = generate_response(data.text)
-    print(f"Generated NLP reply: {reply_text}")
-    return {"reply": reply_text}
+    logger.info("Received text message from %s: %s", data.source, data.text)
+    startup_loader.require("catalog")
+    started = time.perf_counter()
+    reply = await search_executor.run(build_cached_reply, data.text)
+    logger.info("Generated NLP reply: %s", reply.reply)
+    log_chat_reply(data.source, data.text, reply, latency_ms=(time.perf_counter() - started) * 1000, lang=data.lang)
+    return reply.to_dict()
+
+SUPPORTED_AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.webm')
+# Formats soundfile decodes itself; the others need librosa
+SOUNDFILE_AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg')
+
+async def read_audio_upload(audio_file: UploadFile) -> bytes:
+    """
+    Reads an uploaded audio file into a size-capped in-memory buffer (it is decoded straight from bytes).
+    Raises 400 for unsupported formats and 413 above MAX_AUDIO_UPLOAD_BYTES.
+    """
+    if not (audio_file.filename or "").lower().endswith(SUPPORTED_AUDIO_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Unsupported audio file format. Please send WAV, MP3, FLAC, OGG, or WEBM.")
+    audio_bytes = bytearray()
+    while True:
+        chunk = await audio_file.read(1024 * 1024) # 1MB chunks
+        if not chunk:
+            break
+        audio_bytes.extend(chunk)
+        if len(audio_bytes) > config.MAX_AUDIO_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Audio file too large. The limit is {config.MAX_AUDIO_UPLOAD_BYTES} bytes.")
+    logger.info("Received audio file in memory: %s (%d bytes)", audio_file.filename, len(audio_bytes))
+    return bytes(audio_bytes)
 
 # Route for receiving audio file and converting it to text
 @router.post("/api/process_audio")
 async def process_audio_endpoint(
     audio_file: UploadFile = File(..., description="Audio file for processing (WAV, MP3, FLAC, OGG, WEBM)"),
     language: str = Form("persian", description="Audio file language (e.g., 'persian', 'english')"),
-    task: str = Form("transcribe", description="Whisper task ('transcribe' or 'translate')")
+    task: str = Form("transcribe", description="Whisper task ('transcribe' or 'translate')"),
+    long_form: bool = Form(False, description="Return timestamped segments (windowed decoding for audio of any length)")
 ):
     """
     Receives an audio file and converts it to text.
     Returns the transcribed text as JSON.
     """
-    if not audio_file.filename.lower().endswith(('.wav', '.mp3', '.flac', '.ogg', '.webm')):
-        raise HTTPException(status_code=400, detail="Unsupported audio file format. Please send WAV, MP3, FLAC, OGG, or WEBM.")
+    file_extension = os.path.splitext(audio_file.filename or "")[1]
+    startup_loader.require("whisper")
 
-    # Temporarily save audio file in TEMP_AUDIO_DIR
-    file_extension = os.path.splitext(audio_file.filename)[1]
-    # Create complete temporary file path
-    temp_audio_path = os.path.join(TEMP_AUDIO_DIR, f"temp_audio_{uuid.uuid4().hex}{file_extension}")
-    
     try:
-        with open(temp_audio_path, "wb") as buffer:
-            while True:
-                chunk = await audio_file.read(1024 * 1024) # 1MB chunks
-                if not chunk:
-                    break
-                buffer.write(chunk)
-        
-        print(f"Received audio file saved temporarily at: {temp_audio_path}")
+        audio_bytes = await read_audio_upload(audio_file)
 
-        # Convert speech to text using Whisper
-        transcribed_text = transcribe_audio_file(temp_audio_path, language=language, task=task)
-        print(f"Transcribed Text: {transcribed_text}")
+        if long_form:
+            # Windowed decoding with per-window timestamps
+            result = await stt_executor.run(transcribe_long_audio, audio_bytes, language=language, task=task, file_extension=file_extension)
+            logger.info("Transcribed Text: %s", result["text"])
+            return JSONResponse(content={
+                "transcribed_text": result["text"],
+                "segments": result["segments"]
+            })
 
-        if "Error:" in transcribed_text:
-            raise HTTPException(status_code=500, detail=f"Error in speech-to-text conversion: {transcribed_text}")
+        # Convert speech to text using Whisper
+        transcribed_text = await stt_executor.run(transcribe_audio, audio_bytes, language=language, task=task, file_extension=file_extension)
+        logger.info("Transcribed Text: %s", transcribed_text)
 
         return JSONResponse(content={
             "transcribed_text": transcribed_text
         })
 
+    except (HTTPException, StageSaturated, ComponentNotReady):
+        raise
+    except TranscriptionError as e:
+        logger.error("Error in speech-to-text conversion: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error in speech-to-text conversion: {e}")
     except Exception as e:
-        print(f"Error processing audio: {e}")
+        logger.error("Error processing audio: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error in audio file processing: {str(e)}")
+
+# Route for a whole spoken turn: audio in, spoken reply out
+@router.post("/api/voice_turn")
+async def voice_turn_endpoint(
+    audio_file: UploadFile = File(..., description="Recorded question (WAV, MP3, FLAC, OGG, WEBM)"),
+    language: str = Form("persian", description="Audio file language (e.g., 'persian', 'english')"),
+    voice: str = Form(None, description="Kokoro voice of the reply (default TTS_DEFAULT_VOICE)")
+):
+    """
+    Transcribes the question, answers it and streams the spoken reply back as a WAV, all in one request.
+    The reply is synthesized sentence by sentence and the response starts with the first sentence,
+    while the following ones are still being synthesized (VOICE_TURN_PREFETCH_SEGMENTS ahead).
+
+    Response headers:
+        Server-Timing: decode, stt, nlp, tts_first_byte and total (time to the first audio byte), in ms
+        X-Transcript, X-Reply-Text: the transcript and the spoken reply text, percent-encoded (UTF-8)
+        X-Reply-Intent: intent of the reply
+    """
+    startup_loader.require("catalog")
+    startup_loader.require("whisper")
+    startup_loader.require("tts")
+    file_extension = os.path.splitext(audio_file.filename or "")[1]
+    timings = {}
+    started = stage_started = time.perf_counter()
+
+    def lap(stage: str):
+        nonlocal stage_started
+        now = time.perf_counter()
+        timings[stage] = (now - stage_started) * 1000
+        stage_started = now
+
+    audio_bytes = await read_audio_upload(audio_file)
+    try:
+        audio = await asyncio.to_thread(load_audio, audio_bytes, file_extension=file_extension)
+    except ImportError as e:
+        if file_extension.lower() in SOUNDFILE_AUDIO_EXTENSIONS:
+            # soundfile could not read it: the upload itself is broken (librosa was only the fallback)
+            raise HTTPException(status_code=400, detail="Could not decode the audio file.")
+        raise HTTPException(status_code=500, detail=f"Cannot decode {file_extension} audio on this server: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode the audio file: {e}")
+    lap("decode")
+
+    try:
+        transcribed_text = await stt_executor.run(transcribe_audio, audio, language=language, sampling_rate=16000)
+    except TranscriptionError as e:
+        logger.error("Error in speech-to-text conversion: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error in speech-to-text conversion: {e}")
+    lap("stt")
+
+    reply = await search_executor.run(build_cached_reply, transcribed_text)
+    tts_text = extract_tts_text(reply)
+    lap("nlp")
+    log_chat_reply("voice_turn", transcribed_text, reply, latency_ms=(time.perf_counter() - started) * 1000)
+
+    # Synthesis keeps running on the TTS stage while earlier sentences are sent
+    segments = prefetch(
+        tts_executor.open_stream(stream_speech(tts_text, voice=voice, split_pattern=SENTENCE_SPLIT_PATTERN)),
+        config.VOICE_TURN_PREFETCH_SEGMENTS,
+    )
+    try:
+        first_segment = await segments.__anext__()
+    except StopAsyncIteration:
+        first_segment = None
+    lap("tts_first_byte")
+    timings["total"] = (time.perf_counter() - started) * 1000
+    logger.info("Voice turn: %r -> %r %s", transcribed_text, tts_text,
+                " ".join(f"{stage}={ms:.0f}ms" for stage, ms in timings.items()))
+
+    async def body():
+        try:
+            yield wav_header(SAMPLE_RATE)
+            if first_segment is not None:
+                yield pcm16_bytes(first_segment)
+            async for segment in segments:
+                yield pcm16_bytes(segment)
+        finally:
+            await segments.aclose()  # the client may disconnect mid-reply
+
+    return StreamingResponse(body(), media_type="audio/wav", headers={
+        "Server-Timing": ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items()),
+        "X-Transcript": quote(transcribed_text),
+        "X-Reply-Text": quote(tts_text),
+        "X-Reply-Intent": reply.intent or "",
+        "Cache-Control": "no-store",
+    })
+
+# Route for live speech-to-text over a WebSocket
+@router.websocket("/api/stt_stream")
+async def stt_stream_endpoint(websocket: WebSocket, language: str = "persian", task: str = "transcribe"):
+    """
+    Receives a continuous stream of 16 kHz, 16-bit little-endian mono PCM as binary messages.
+    Sends {"type": "partial"} transcripts while the caller speaks and a {"type": "final"} transcript
+    when voice-activity detection sees the end of each utterance.
+    A text message "end" flushes the open utterance; the server answers {"type": "done"} and closes.
+    """
+    await websocket.accept()
+    try:
+        startup_loader.require("whisper")
+    except ComponentNotReady as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1013)  # try again later
+        return
+    session = StreamingSession(websocket.send_json, language=language, task=task)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                await session.feed(message["bytes"])
+            elif message.get("text", "").strip().lower() == "end":
+                await session.finish()
+                await websocket.send_json({"type": "done"})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
     finally:
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-            print(f"Temporary audio file removed: {temp_audio_path}")
\ No newline at end of file
+        session.close()
@@ -0,0 +1,5 @@
+"""
+Benchmarks of the call center: latency micro-benchmarks of the NLP engine, real-time factor of the
+speech models and a load generator for the HTTP API. Every suite writes JSON that `compare` diffs
+between two versions (see benchmarks/__main__.py).
+"""
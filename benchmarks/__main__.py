@@ -0,0 +1,71 @@
+"""
+    python -m benchmarks micro --sizes 1000,10000 --output results/micro.json
+    python -m benchmarks speech --stub-models --output results/speech.json
+    python -m benchmarks load --stub-models --concurrency 32 --duration 30 --output results/load.json
+    python -m benchmarks serve --stub-models --port 8001     # then: load --url http://127.0.0.1:8001
+    python -m benchmarks compare old/load.json new/load.json --threshold 0.1
+
+`compare` prints the change of p50/p95/p99 of every benchmark in both files and exits with
+status 1 when one got slower than the threshold (a relative change, 0.1 = 10 %) and by more
+than --min-delta-ms.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks import load, micro, speech
+from benchmarks.stats import compare_results, write_results
+
+SUITES = {"micro": micro, "speech": speech, "load": load}
+
+
+def compare(args) -> int:
+    with open(args.baseline, encoding="utf-8") as baseline_file, open(args.candidate, encoding="utf-8") as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+    if baseline.get("suite") != candidate.get("suite"):
+        print(f"Warning: comparing a {baseline.get('suite')} run with a {candidate.get('suite')} run")
+
+    rows = compare_results(baseline, candidate, args.threshold, args.min_delta_ms)
+    width = max([len(row[0]) for row in rows] + [len("benchmark")])
+    print(f"{'benchmark':<{width}} {'':<6} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for name, key, old, new, change, regressed in rows:
+        print(f"{name:<{width}} {key:<6} {old:>10.3f} {new:>10.3f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{len(rows)} comparisons, {regressions} slower by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of the AI call center.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, module in SUITES.items():
+        suite_parser = commands.add_parser(name, help=module.__doc__.strip().splitlines()[0])
+        module.add_arguments(suite_parser)
+        suite_parser.add_argument("--output", help="Write the results to this JSON file")
+
+    serve_parser = commands.add_parser("serve", help="Run the app (optionally with stub models) as a load target")
+    load.add_app_arguments(serve_parser)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8001)
+
+    compare_parser = commands.add_parser("compare", help="Diff the latency percentiles of two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.1, help="Smaller slowdowns (in ms) are never regressions")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        return compare(args)
+    if args.command == "serve":
+        load.serve(args)
+        return 0
+
+    params = {key: value for key, value in vars(args).items() if key not in ("command", "output")}
+    results = SUITES[args.command].run(args)
+    write_results(args.output, args.command, params, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Async load generator for the HTTP API: POST /chat, /chat/ (web chat, with TTS) and /api/process_audio
+in a weighted mix, reporting throughput and p50/p95/p99 per endpoint.
+
+Closed loop (default): --concurrency clients each send their next request as soon as the previous
+one has answered. Open loop (--rate): requests start on a Poisson schedule whatever the server does,
+and latency is measured from the scheduled start, so a stalled server shows up in the tail instead
+of silently slowing the generator down (coordinated omission).
+
+Target: the app in this process (httpx ASGI transport, startup events run here) or, with --url,
+a running server, e.g. one started with `python -m benchmarks serve --stub-models`.
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.micro import FIXED_MESSAGES
+from benchmarks.stats import summarize
+from benchmarks.synthetic import speech_like, wav_bytes
+
+DEFAULT_MIX = "chat=6,web_chat=3,process_audio=1"
+
+
+class RequestFactory:
+    """Builds the requests of each endpoint; --unique makes every message distinct (no response cache hits)."""
+
+    def __init__(self, rng: random.Random, unique: bool, audio_seconds: float, language: str):
+        self.rng = rng
+        self.unique = unique
+        self.language = language
+        self.audio = wav_bytes(speech_like(audio_seconds, 16000, seed=1), 16000)
+        self.sent = 0
+
+    def message(self) -> str:
+        self.sent += 1
+        message = self.rng.choice(FIXED_MESSAGES)
+        return f"{message} ref{self.sent}" if self.unique else message
+
+    def build(self, endpoint: str) -> dict:
+        if endpoint == "chat":
+            return {"method": "POST", "url": "/chat", "json": {"text": self.message(), "source": "load", "lang": "en"}}
+        if endpoint == "web_chat":
+            return {"method": "POST", "url": "/chat/", "json": {"text": self.message()}}
+        if endpoint == "process_audio":
+            return {"method": "POST", "url": "/api/process_audio",
+                    "files": {"audio_file": ("question.wav", self.audio, "audio/wav")},
+                    "data": {"language": self.language}}
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, endpoint: str, seconds: float, status):
+        self.latencies.setdefault(endpoint, []).append((seconds, status))
+        self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+    def results(self, elapsed_seconds: float) -> dict:
+        results = {}
+        every_ok = []
+        for endpoint in sorted(self.latencies):
+            ok = [seconds for seconds, status in self.latencies[endpoint] if isinstance(status, int) and status < 400]
+            every_ok.extend(ok)
+            statuses = self.statuses[endpoint]
+            results[endpoint] = {
+                **summarize(ok, elapsed_seconds),
+                "requests": sum(statuses.values()),
+                # 503 = shed by a saturated stage or a component still loading
+                "rejected": statuses.get(503, 0),
+                "errors": sum(count for status, count in statuses.items() if status != 503 and not (isinstance(status, int) and status < 400)),
+                "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            }
+        results["all"] = summarize(every_ok, elapsed_seconds)
+        return results
+
+
+async def _send(client: httpx.AsyncClient, request: dict, timeout: float):
+    try:
+        response = await client.request(**request, timeout=timeout)
+        return response.status_code
+    except httpx.TimeoutException:
+        return "timeout"
+    except httpx.HTTPError as e:
+        return type(e).__name__
+
+
+async def closed_loop(client, factory, endpoints, weights, args, recorder, rng):
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            started = time.perf_counter()
+            status = await _send(client, factory.build(endpoint), args.timeout)
+            if started >= measure_from:
+                recorder.record(endpoint, time.perf_counter() - started, status)
+
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    return time.perf_counter() - measure_from
+
+
+async def open_loop(client, factory, endpoints, weights, args, recorder, rng):
+    tasks = set()
+    dropped = 0
+
+    async def one(endpoint, scheduled, measured):
+        status = await _send(client, factory.build(endpoint), args.timeout)
+        if measured:
+            recorder.record(endpoint, time.perf_counter() - scheduled, status)
+
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+    scheduled = started
+    while True:
+        scheduled += rng.expovariate(args.rate)
+        if scheduled >= deadline:
+            break
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        if len(tasks) >= args.max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(one(rng.choices(endpoints, weights)[0], scheduled, scheduled >= measure_from))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    if dropped:
+        print(f"{dropped} requests were not sent: {args.max_in_flight} were already in flight")
+    return deadline - measure_from
+
+
+async def _server_stats(client: httpx.AsyncClient) -> dict:
+    stats = {}
+    for name, path in (("stages", "/api/stages"), ("response_cache", "/api/response_cache"), ("tts", "/api/tts_status")):
+        try:
+            response = await client.get(path)
+            stats[name] = response.json() if response.status_code == 200 else {"status": response.status_code}
+        except (httpx.HTTPError, ValueError) as e:
+            stats[name] = {"error": str(e)}
+    return stats
+
+
+def prepare_app(stub_models: bool, synthetic_catalog: int):
+    """Installs the stub models and/or a synthetic catalog before the app starts (in this process)."""
+    if stub_models:
+        from benchmarks.stubs import install_stub_models
+        install_stub_models()
+    if synthetic_catalog:
+        import main
+        from nlp_engine.catalog_index import make_synthetic_catalog
+        from nlp_engine.response_generator import catalog_manager
+
+        # Replaces the products.csv loader, so the synthetic catalog is the one the app serves
+        df = make_synthetic_catalog(synthetic_catalog)
+        main.startup_loader.register("catalog", lambda: catalog_manager.load_dataframe(df), required=True)
+
+
+async def _wait_ready(components=("catalog", "whisper", "tts"), timeout: float = 600):
+    from utils.startup import startup_loader
+
+    for component in components:
+        if not await asyncio.to_thread(startup_loader.wait, component, timeout):
+            print(f"Warning: the {component} component is {startup_loader.state(component)}; its requests will be rejected")
+
+
+async def run_load(args) -> dict:
+    rng = random.Random(args.seed)
+    mix = dict(item.split("=") for item in args.mix.split(",") if item.strip())
+    endpoints, weights = list(mix), [float(weight) for weight in mix.values()]
+    factory = RequestFactory(rng, args.unique, args.audio_seconds, args.language)
+    recorder = LoadRecorder()
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight if args.rate else 0))
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits)
+        shutdown = None
+    else:
+        prepare_app(args.stub_models, args.synthetic_catalog)
+        import main
+
+        await main.startup_event()
+        await _wait_ready()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", limits=limits)
+        shutdown = main.shutdown_event
+
+    try:
+        loop = open_loop if args.rate else closed_loop
+        elapsed = await loop(client, factory, endpoints, weights, args, recorder, rng)
+        results = recorder.results(elapsed)
+        results["server"] = await _server_stats(client)
+    finally:
+        await client.aclose()
+        if shutdown is not None:
+            await shutdown()
+
+    print(f"{'endpoint':<14} {'requests':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'503':>6} {'errors':>6}")
+    for endpoint in endpoints:
+        if endpoint in results:
+            row = results[endpoint]
+            print(f"{endpoint:<14} {row['requests']:>8} {row.get('throughput_per_s') or 0:>8.1f} {row.get('p50_ms') or 0:>9.1f} "
+                  f"{row.get('p95_ms') or 0:>9.1f} {row.get('p99_ms') or 0:>9.1f} {row['rejected']:>6} {row['errors']:>6}")
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument("--url", help="Base URL of a running server (default: the app in this process)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. chat=6,web_chat=3,process_audio=1")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients of the closed loop")
+    parser.add_argument("--rate", type=float, default=0, help="Requests per second of an open loop (0 = closed loop)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open loop: requests beyond this are not sent")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--unique", action="store_true", help="Make every chat message distinct (bypasses the response cache)")
+    parser.add_argument("--audio-seconds", type=float, default=4, help="Length of the uploaded synthetic question")
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--seed", type=int, default=0)
+    add_app_arguments(parser)
+
+
+def add_app_arguments(parser):
+    parser.add_argument("--stub-models", action="store_true", help="Replace Whisper and Kokoro with benchmarks.stubs")
+    parser.add_argument("--synthetic-catalog", type=int, default=0, help="Serve a synthetic catalog of this many products")
+
+
+def run(args) -> dict:
+    return asyncio.run(run_load(args))
+
+
+def serve(args):
+    """Runs the app under uvicorn with the same options, as the target of `load --url`."""
+    import uvicorn
+
+    prepare_app(args.stub_models, args.synthetic_catalog)
+    import main
+
+    uvicorn.run(main.app, host=args.host, port=args.port, log_level="warning")
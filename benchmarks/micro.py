@@ -0,0 +1,93 @@
+"""
+Micro-benchmarks of the NLP engine on synthetic catalogs (same columns as products.csv):
+
+- generate_response: per-message latency of the whole rule/search pipeline (no response cache),
+  for a fixed mix of conversational, listing, title and keyword-search messages;
+- find_related_products: first call for a product (computed) and later calls (served from the table);
+- extract_tts_text: spoken summary of a product reply, from the structured reply and from its HTML.
+
+Each catalog is swapped in with catalog_manager.load_dataframe, so the calls take the same
+path as in the app.
+"""
+import random
+import time
+
+from benchmarks.stats import summarize, time_calls
+from chat_interface.web_chat import extract_tts_text
+from nlp_engine.catalog_index import make_synthetic_catalog
+from nlp_engine.response_generator import catalog_manager, find_related_products, format_product_response, generate_response
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+
+# Messages that do not depend on the catalog content
+FIXED_MESSAGES = [
+    "hello",
+    "thank you so much",
+    "what products do you sell",
+    "do you have a wireless headphone in black",
+    "how much is the smart lamp",
+    "i am looking for something for my desk",
+    "portable speaker w17 blue",
+    "what is the capital of france",
+    "qwerty zxcvb",
+]
+
+
+def catalog_messages(df, rng: random.Random, count: int) -> list:
+    """Messages naming real products of the catalog (the title match and keyword search paths)."""
+    titles = [df.iloc[rng.randrange(len(df))]["title"].lower() for _ in range(count)]
+    return [f"i want a {title}" for title in titles[: count // 2]] + [f"tell me about the {title}" for title in titles[count // 2:]]
+
+
+def bench_catalog(num_products: int, repeat: int, samples: int, seed: int) -> dict:
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    df = make_synthetic_catalog(num_products, seed=seed)
+    generate_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    catalog_manager.load_dataframe(df)
+    index_seconds = time.perf_counter() - started
+
+    results = {
+        "catalog": {
+            "products": num_products,
+            "generate_seconds": round(generate_seconds, 3),
+            "index_build_seconds": round(index_seconds, 3),
+        },
+    }
+
+    messages = FIXED_MESSAGES + catalog_messages(df, rng, 8)
+    results["generate_response"] = summarize(time_calls(generate_response, messages, repeat=repeat))
+    results["generate_response_by_message"] = {
+        message: summarize(time_calls(generate_response, [message], repeat=repeat, warmup=0))
+        for message in messages[:len(FIXED_MESSAGES)]
+    }
+
+    # Rows of the catalog in use, as the engine passes them (cold = the first call of a fresh index)
+    index = catalog_manager.current.index
+    rows = [index.df.iloc[rng.randrange(len(index.df))] for _ in range(samples)]
+    results["find_related_products_cold"] = summarize(time_calls(lambda row: find_related_products(row, index), rows, warmup=0))
+    results["find_related_products_warm"] = summarize(time_calls(lambda row: find_related_products(row, index), rows, repeat=repeat))
+
+    replies = [format_product_response(row, index) for row in rows]
+    results["extract_tts_text_reply"] = summarize(time_calls(extract_tts_text, replies, repeat=repeat))
+    results["extract_tts_text_html"] = summarize(time_calls(extract_tts_text, [reply.reply for reply in replies], repeat=repeat))
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated catalog sizes (products)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed rounds over each input set")
+    parser.add_argument("--samples", type=int, default=50, help="Products sampled for the related/TTS benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def run(args) -> dict:
+    results = {}
+    for num_products in [int(size) for size in args.sizes.split(",") if size.strip()]:
+        results[str(num_products)] = catalog = bench_catalog(num_products, args.repeat, args.samples, args.seed)
+        print(f"{num_products:>9} products  index {catalog['catalog']['index_build_seconds']:>7.2f} s  "
+              + "  ".join(f"{name} p50={catalog[name]['p50_ms']:.3f} p99={catalog[name]['p99_ms']:.3f} ms"
+                          for name in ("generate_response", "find_related_products_cold", "extract_tts_text_html")))
+    return results
@@ -0,0 +1,112 @@
+"""
+Real-time factor (processing time / audio duration; below 1 is faster than real time) of the
+speech models on synthetic audio:
+
+- STT: transcribe_audio on 5-60 s clips (clips over 30 s take the long-form path), batching off;
+- TTS: stream_speech on short, medium and long replies, with the time to the first segment.
+
+With --stub-models the models are replaced by benchmarks.stubs, which only checks the harness
+and measures the overhead around the models.
+"""
+import time
+
+import config
+from benchmarks.stats import summarize
+from benchmarks.synthetic import speech_like
+
+DEFAULT_CLIP_SECONDS = "5,15,30,60"
+
+TTS_TEXTS = {
+    "short": "Hello! How can I assist you with our products today?",
+    "medium": "Wireless Headphone W17, price 79.99 dollars. Related products: Portable Speaker W3, price 45 dollars; "
+              "Mini Earbuds W120, price 29.5 dollars.",
+    "long": "I can provide information about our products, including their prices, categories, descriptions, "
+            "images, and links. Our smart home range covers lamps, speakers and routers. Most items ship within two "
+            "days, and every order can be returned within thirty days. Just ask me about a product, or tell me what "
+            "you need it for, and I will suggest a few options that fit your budget.",
+}
+
+
+def bench_stt(clip_seconds: list, language: str, runs: int) -> dict:
+    from speech_to_text import whisper_handler
+
+    config.WHISPER_BATCHING = False  # time the model itself, not the batching window
+    started = time.perf_counter()
+    whisper_handler.load_whisper_model()
+    load_seconds = time.perf_counter() - started
+    if whisper_handler.model is None:
+        return {"error": "Whisper model failed to load"}
+
+    results = {"load_seconds": round(load_seconds, 2), "model": whisper_handler.WHISPER_MODEL_NAME, "clips": {}}
+    for seconds in clip_seconds:
+        audio = speech_like(seconds, 16000, seed=int(seconds))
+        whisper_handler.transcribe_audio(audio, language=language)  # warm-up
+        latencies = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            whisper_handler.transcribe_audio(audio, language=language)
+            latencies.append(time.perf_counter() - started)
+        summary = summarize(latencies)
+        summary["audio_seconds"] = seconds
+        summary["rtf_p50"] = round(summary["p50_ms"] / 1000 / seconds, 4)
+        results["clips"][f"{seconds:g}s"] = summary
+        print(f"STT {seconds:>5g}s clip: p50 {summary['p50_ms']:>9.1f} ms  RTF {summary['rtf_p50']:.3f}")
+    return results
+
+
+def bench_tts(runs: int) -> dict:
+    from text_to_speech import kokoro_handler
+
+    started = time.perf_counter()
+    kokoro_handler.load_tts_pipelines()
+    results = {"load_seconds": round(time.perf_counter() - started, 2), "texts": {}}
+
+    for name, text in TTS_TEXTS.items():
+        latencies, first_audio, audio_seconds = [], [], 0.0
+        for _ in range(runs + 1):
+            started = time.perf_counter()
+            first = None
+            samples = 0
+            for segment in kokoro_handler.stream_speech(text, split_pattern=kokoro_handler.SENTENCE_SPLIT_PATTERN):
+                if first is None:
+                    first = time.perf_counter() - started
+                samples += len(segment)
+            latencies.append(time.perf_counter() - started)
+            first_audio.append(first or 0.0)
+            audio_seconds = samples / kokoro_handler.SAMPLE_RATE
+        # The first round is the warm-up
+        summary = summarize(latencies[1:])
+        summary["chars"] = len(text)
+        summary["audio_seconds"] = round(audio_seconds, 3)
+        summary["rtf_p50"] = round(summary["p50_ms"] / 1000 / audio_seconds, 4) if audio_seconds else None
+        summary["first_audio"] = summarize(first_audio[1:])
+        results["texts"][name] = summary
+        print(f"TTS {name:>6} ({len(text)} chars, {audio_seconds:.1f} s audio): p50 {summary['p50_ms']:>9.1f} ms  "
+              f"first audio {summary['first_audio']['p50_ms']:.1f} ms  RTF {summary['rtf_p50']}")
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument("--clips", default=DEFAULT_CLIP_SECONDS, help="Comma-separated STT clip lengths in seconds")
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per clip/text (after one warm-up)")
+    parser.add_argument("--skip-stt", action="store_true")
+    parser.add_argument("--skip-tts", action="store_true")
+    parser.add_argument("--stub-models", action="store_true", help="Replace Whisper and Kokoro with benchmarks.stubs")
+
+
+def run(args) -> dict:
+    if args.stub_models:
+        from benchmarks.stubs import install_stub_models
+        install_stub_models()
+
+    results = {}
+    if not args.skip_stt:
+        results["stt"] = bench_stt([float(seconds) for seconds in args.clips.split(",") if seconds.strip()], args.language, args.runs)
+    if not args.skip_tts:
+        try:
+            results["tts"] = bench_tts(args.runs)
+        except ImportError as e:
+            print(f"TTS skipped: {e}")
+            results["tts"] = {"error": str(e)}
+    return results
@@ -0,0 +1,145 @@
+"""Latency statistics and the JSON result files shared by every benchmark suite."""
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+# Keys of a latency summary that are compared between two result files (lower is better)
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """q-th percentile (0-100) of already sorted values, interpolating between the two closest ranks."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def summarize(latencies: list, elapsed_seconds: float = None) -> dict:
+    """
+    Summary of per-call latencies (in seconds): count, mean, p50/p95/p99 and max in milliseconds.
+    Throughput is calls per second of wall time when elapsed_seconds is given (concurrent calls),
+    otherwise one over the mean latency (calls made one after another).
+    """
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    total = sum(values)
+    if elapsed_seconds is None:
+        throughput = len(values) / total if total else None
+    else:
+        throughput = len(values) / elapsed_seconds if elapsed_seconds else None
+    return {
+        "count": len(values),
+        "mean_ms": _ms(total / len(values)),
+        "p50_ms": _ms(percentile(values, 50)),
+        "p95_ms": _ms(percentile(values, 95)),
+        "p99_ms": _ms(percentile(values, 99)),
+        "max_ms": _ms(values[-1]),
+        "throughput_per_s": None if throughput is None else round(throughput, 2),
+    }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 4)
+
+
+def time_calls(func, inputs: list, repeat: int = 1, warmup: int = 1) -> list:
+    """Calls func(item) for every input, `repeat` times over, and returns the latency of each call in seconds."""
+    for item in inputs[:warmup]:
+        func(item)
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            started = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def environment() -> dict:
+    """Where the numbers came from: commit, interpreter, machine and library versions."""
+    import numpy
+    import pandas
+
+    return {
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+    }
+
+
+def _git(*args) -> str:
+    try:
+        output = subprocess.run(["git", *args], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() if output.returncode == 0 else None
+
+
+def write_results(path: str, suite: str, params: dict, results: dict) -> dict:
+    """
+    Writes one suite's results as JSON with sorted keys and one value per line, so two runs
+    diff cleanly (`git diff --no-index` or `python -m benchmarks compare`).
+    """
+    document = {
+        "suite": suite,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "params": params,
+        "results": results,
+    }
+    if path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as results_file:
+            json.dump(document, results_file, indent=2, sort_keys=True, ensure_ascii=False)
+            results_file.write("\n")
+        print(f"Saved {suite} results to: {path}")
+    return document
+
+
+def _latency_summaries(results: dict, prefix: str = ""):
+    """Yields (dotted name, summary) for every nested dict that holds latency percentiles."""
+    for name, value in sorted(results.items()):
+        if not isinstance(value, dict):
+            continue
+        if any(key in value for key in LATENCY_KEYS):
+            yield prefix + name, value
+        else:
+            yield from _latency_summaries(value, f"{prefix}{name}.")
+
+
+def compare_results(baseline: dict, candidate: dict, threshold: float = 0.10, min_delta_ms: float = 0.1) -> list:
+    """
+    Compares the latency percentiles of two result documents of the same suite.
+    Returns one row per benchmark present in both: (name, key, baseline ms, candidate ms,
+    relative change, regressed), where regressed means slower by more than `threshold` and
+    by more than `min_delta_ms` (timer noise dominates calls of a few microseconds).
+    """
+    baseline_summaries = dict(_latency_summaries(baseline["results"]))
+    rows = []
+    for name, summary in _latency_summaries(candidate["results"]):
+        previous = baseline_summaries.get(name)
+        if previous is None:
+            continue
+        for key in LATENCY_KEYS:
+            old, new = previous.get(key), summary.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            rows.append((name, key, old, new, change, change > threshold and new - old > min_delta_ms))
+    return rows
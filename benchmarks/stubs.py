@@ -0,0 +1,70 @@
+"""
+Stand-ins for Whisper and Kokoro, so the HTTP and scheduling overhead can be measured on a
+CPU-only box without the models. They sleep (releasing the GIL, like torch does) for a
+configurable share of real time and return fixed text / a quiet tone of the right length.
+Everything else - decoding, resampling, batching, stage pools, caches, file writes - is real.
+"""
+import re
+import sys
+import time
+import types
+
+import numpy as np
+
+from speech_to_text import whisper_handler
+
+STUB_TRANSCRIPT = "do you have a wireless headphone in black"
+
+
+def install_stub_models(stt_seconds: float = 0.15, tts_rtf: float = 0.1, tts_chars_per_second: float = 15.0):
+    """
+    Replaces the Whisper load/generate functions and the kokoro package for this process.
+
+    stt_seconds: cost of one Whisper generate call (inputs are padded to a 30 s window, so the
+        cost hardly depends on the clip length, and a batch costs about as much as one input).
+    tts_rtf: synthesis time / audio duration of the fake Kokoro pipelines.
+    tts_chars_per_second: speaking rate that sets the duration of the fake audio.
+    """
+    def load_whisper_model(profile_name: str = None):
+        whisper_handler.processor = object()
+        whisper_handler.model = object()
+        whisper_handler.device = "stub"
+        whisper_handler.active_profile = {**whisper_handler.resolve_profile(profile_name), "model_name": "stub"}
+        whisper_handler.WHISPER_MODEL_NAME = "stub"
+
+    def transcribe_batch(audio_inputs: list, language: str = "persian", task: str = "transcribe") -> list:
+        time.sleep(stt_seconds)
+        return [STUB_TRANSCRIPT for _ in audio_inputs]
+
+    whisper_handler.load_whisper_model = load_whisper_model
+    whisper_handler.transcribe_batch = transcribe_batch
+    sys.modules["kokoro"] = _fake_kokoro(tts_rtf, tts_chars_per_second)
+
+
+def _fake_kokoro(tts_rtf: float, chars_per_second: float) -> types.ModuleType:
+    from text_to_speech.kokoro_handler import SAMPLE_RATE
+
+    class KModel:
+        def __init__(self, repo_id=None):
+            self.repo_id = repo_id
+
+        def eval(self):
+            return self
+
+    class KPipeline:
+        def __init__(self, lang_code, repo_id=None, model=None):
+            self.lang_code = lang_code
+
+        def __call__(self, text, voice=None, split_pattern=r"\n+"):
+            for segment in re.split(split_pattern, text) if split_pattern else [text]:
+                if not segment.strip():
+                    continue
+                seconds = len(segment) / chars_per_second
+                time.sleep(seconds * tts_rtf)
+                samples = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+                yield segment, segment, (0.1 * np.sin(2 * np.pi * 220 * samples)).astype(np.float32)
+
+    module = types.ModuleType("kokoro")
+    module.KModel = KModel
+    module.KPipeline = KPipeline
+    return module
@@ -0,0 +1,51 @@
+"""
+Synthetic, speech-like test audio generated on the fly (no recordings are shipped): a glottal
+pulse train with a drifting pitch, shaped by three vowel formants and cut into syllables and pauses.
+It has the spectrum and the on/off rhythm of speech, which is what the VAD, the decoder
+and the resampler react to, though no words are in it.
+"""
+import io
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import lfilter
+
+# (F1, F2, F3) in Hz of a few vowels
+VOWEL_FORMANTS = [(730, 1090, 2440), (270, 2290, 3010), (530, 1840, 2480), (300, 870, 2240), (640, 1190, 2390)]
+
+
+def _resonator(frequency: float, bandwidth: float, sample_rate: int):
+    radius = np.exp(-np.pi * bandwidth / sample_rate)
+    theta = 2 * np.pi * frequency / sample_rate
+    return [1 - radius], [1, -2 * radius * np.cos(theta), radius ** 2]
+
+
+def speech_like(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """`seconds` of speech-like float32 audio in [-1, 1] (deterministic for a seed)."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = np.zeros(total, dtype=np.float64)
+    position = 0
+    while position < total:
+        # A syllable of 120-300 ms, and a pause of 150-500 ms after every few of them
+        length = min(total - position, int(rng.uniform(0.12, 0.3) * sample_rate))
+        pitch = rng.uniform(95, 220) * (1 + 0.1 * np.sin(np.linspace(0, np.pi, length)))
+        phase = np.cumsum(pitch / sample_rate)
+        pulses = (np.diff(np.floor(phase), prepend=0) > 0).astype(np.float64) + rng.normal(0, 0.02, length)
+        syllable = np.zeros(length)
+        for frequency, bandwidth in zip(VOWEL_FORMANTS[rng.integers(len(VOWEL_FORMANTS))], (80, 100, 120)):
+            b, a = _resonator(frequency, bandwidth, sample_rate)
+            syllable += lfilter(b, a, pulses)
+        audio[position:position + length] = syllable * np.hanning(length)
+        position += length
+        if rng.random() < 0.3:
+            position += int(rng.uniform(0.15, 0.5) * sample_rate)
+    audio = audio / (np.abs(audio).max() or 1.0) * 0.5
+    return audio.astype(np.float32)
+
+
+def wav_bytes(audio: np.ndarray, sample_rate: int = 16000) -> bytes:
+    """The audio as an in-memory 16-bit WAV file (what a client uploads)."""
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
@@ -1,26 +1,33 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from nlp_engine.response_generator import generate_response
-from text_to_speech.kokoro_handler import synthesize_speech
-from pathlib import Path
-from bs4 import BeautifulSoup
-import uuid
-import os
+from nlp_engine.response_generator import build_cached_reply
+from nlp_engine.reply import ChatReply
+from text_to_speech.kokoro_handler import is_tts_ready, stream_speech, SAMPLE_RATE
+from text_to_speech.player import stream_wav
+from text_to_speech.tts_cache import tts_cache
+from utils.executors import search_executor, tts_executor, StageSaturated
+from utils.startup import startup_loader, ComponentNotReady
+from logs.store import log_chat_reply
+import logging
+import time
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(BASE_DIR)
-AUDIO_DIR = os.path.join(PROJECT_ROOT, "outputs", "audio")
+logger = logging.getLogger(__name__)
 
 templates = Jinja2Templates(directory="chat_interface/templates")
 router = APIRouter()
 
-def extract_tts_text(bot_response_text: str) -> str:
+def extract_tts_text(bot_response_text) -> str:
     """
     اگر پیام شامل کارت محصول بود، عنوان و قیمت محصول اصلی و محصولات مرتبط را برای TTS استخراج می‌کند.
     اگر نبود همان متن را بازمی‌گرداند.
+    برای ChatReply خلاصه مستقیماً از داده‌های ساخت‌یافته ساخته می‌شود و HTML دوباره parse نمی‌شود.
     """
+    if isinstance(bot_response_text, ChatReply):
+        return bot_response_text.spoken_text()
+
     if 'div class' in bot_response_text:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(bot_response_text, "html.parser")
         # محصول اصلی
         title_tag = soup.find("a", class_="product-title-link")
@@ -64,19 +71,48 @@ async def chat_endpoint(request: Request):
         if not user_message:
             return {"reply": "Please enter a message."}
 
-        bot_response_text = generate_response(user_message)
-        tts_text = extract_tts_text(bot_response_text)
+        # چت متنی به محض بارگذاری کاتالوگ سرویس می‌دهد (بدون انتظار برای مدل‌های گفتار)
+        startup_loader.require("catalog")
+        started = time.perf_counter()
+        bot_reply = await search_executor.run(build_cached_reply, user_message)
+        tts_text = extract_tts_text(bot_reply)
+
+        # تا وقتی pipelineهای TTS گرم نشده‌اند، پاسخ بدون صوت برگردانده می‌شود
+        # صوت هر متن فقط یک بار ساخته می‌شود و دفعات بعد از کش خوانده می‌شود
+        # اگر مرحله TTS اشباع باشد، متن پاسخ بدون صوت برگردانده می‌شود
+        audio_url = None
+        if is_tts_ready():
+            try:
+                audio_url = await tts_executor.run(tts_cache.get_audio_url, tts_text)
+            except StageSaturated:
+                logger.warning("TTS stage saturated; replying without audio")
 
-        os.makedirs(AUDIO_DIR, exist_ok=True)
-        audio_filename = f"{uuid.uuid4().hex}.wav"
-        audio_output_dir = Path(AUDIO_DIR)
-        audio_path = synthesize_speech(tts_text, audio_output_dir, file_name=audio_filename)
-        audio_url = f"/static/audio/{audio_filename}"
+        # ثبت گفتگو در صف نوشتن پس‌زمینه (بدون تأخیر برای پاسخ)
+        log_chat_reply("web_chat", user_message, bot_reply, latency_ms=(time.perf_counter() - started) * 1000, has_audio=audio_url is not None)
 
         return {
-            "reply": bot_response_text,
+            "reply": bot_reply.reply,
             "reply_audio_url": audio_url
         }
+    except (StageSaturated, ComponentNotReady):
+        raise
     except Exception as e:
-        print(f"Error in chat_endpoint: {e}")
-        return {"reply": "An error occurred while processing your message."}
\ No newline at end of file
+        logger.error("Error in chat_endpoint: %s", e)
+        return {"reply": "An error occurred while processing your message."}
+
+@router.get("/audio_stream")
+async def chat_audio_stream(text: str):
+    """
+    صوت پاسخ ربات به پیام text را به صورت WAV تکه‌تکه (chunked) استریم می‌کند.
+    هر بخش صوت به محض تولید توسط Kokoro ارسال می‌شود، پس پخش قبل از تمام شدن سنتز شروع می‌شود.
+    """
+    if not is_tts_ready():
+        raise HTTPException(status_code=503, detail="Text-to-speech engine is not ready yet.")
+
+    startup_loader.require("catalog")
+    tts_text = extract_tts_text(await search_executor.run(build_cached_reply, text))
+    return StreamingResponse(
+        tts_executor.open_stream(stream_wav(stream_speech(tts_text), SAMPLE_RATE)),
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-store"},
+    )
@@ -0,0 +1,156 @@
+import os
+
+# --- Chat response cache (nlp_engine.response_cache) ---
+# Maximum number of cached replies; 0 disables the cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+# Seconds a cached reply stays valid; 0 keeps replies until they are evicted or the catalog reloads
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+# --- Product catalog (nlp_engine.catalog_manager) ---
+PRODUCTS_CSV_PATH = os.getenv("PRODUCTS_CSV_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "products.csv"))
+# Prebuilt catalog + search index (Parquet + .npy, one subdirectory per CSV version); cold starts
+# load it instead of parsing and tokenizing the CSV ("" disables it)
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "outputs", "catalog", "snapshots"))
+# Seconds between checks of products.csv for changes (0 disables the watcher; /api/admin/catalog/reload still works)
+CATALOG_WATCH_INTERVAL_SECONDS = float(os.getenv("CATALOG_WATCH_INTERVAL_SECONDS", "5"))
+# Token expected in the X-Admin-Token header of /api/admin/* ("" disables the admin API)
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# --- Conversation log (logs.store) ---
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "conversations"))
+# Turns waiting for the background writer; beyond that CONVERSATION_LOG_OVERFLOW decides:
+# "drop" discards the record at once, "block" waits up to CONVERSATION_LOG_BLOCK_SECONDS first
+# (only in worker threads; on the event loop "block" drops too, so other requests never stall)
+CONVERSATION_LOG_QUEUE_SIZE = int(os.getenv("CONVERSATION_LOG_QUEUE_SIZE", "10000"))
+CONVERSATION_LOG_OVERFLOW = os.getenv("CONVERSATION_LOG_OVERFLOW", "drop")
+CONVERSATION_LOG_BLOCK_SECONDS = float(os.getenv("CONVERSATION_LOG_BLOCK_SECONDS", "0.05"))
+# Buffered lines are written and fsync'ed at least this often (the most a crash can lose)
+CONVERSATION_LOG_FLUSH_SECONDS = float(os.getenv("CONVERSATION_LOG_FLUSH_SECONDS", "1"))
+# The active file is rotated into a compressed segment when it reaches either limit
+CONVERSATION_LOG_MAX_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+CONVERSATION_LOG_ROTATE_SECONDS = float(os.getenv("CONVERSATION_LOG_ROTATE_SECONDS", str(24 * 3600)))
+# "gzip", "zstd" (needs the `zstandard` package, falls back to gzip) or "none"
+CONVERSATION_LOG_COMPRESSION = os.getenv("CONVERSATION_LOG_COMPRESSION", "gzip")
+
+# --- Conversation analytics (logs.analytics) ---
+# Columnar store built from the conversation log by `python -m logs.analytics ingest`
+ANALYTICS_STORE_DIR = os.getenv("ANALYTICS_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "analytics"))
+
+# --- Text-to-speech (text_to_speech.kokoro_handler) ---
+KOKORO_REPO_ID = os.getenv("KOKORO_REPO_ID", "hexgrad/Kokoro-82M")
+# Kokoro language codes loaded at startup ('a' = American English, 'b' = British English, ...)
+TTS_LANG_CODES = [code.strip() for code in os.getenv("TTS_LANG_CODES", "a").split(",") if code.strip()]
+TTS_DEFAULT_VOICE = os.getenv("TTS_DEFAULT_VOICE", "af_heart")
+# Pipeline instances per language code, i.e. how many syntheses can run at the same time
+TTS_POOL_SIZE = int(os.getenv("TTS_POOL_SIZE", "2"))
+# How long a request waits for a free pipeline before failing
+TTS_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("TTS_ACQUIRE_TIMEOUT_SECONDS", "30"))
+TTS_WARMUP_TEXT = "Hello! How can I assist you today?"
+
+# --- Audio output (text_to_speech.audio_store, text_to_speech.tts_cache) ---
+AUDIO_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outputs", "audio")
+AUDIO_URL_PREFIX = "/static/audio"
+# Disk budget of the stored replies; least recently used files are deleted above it
+# (per worker process: N uvicorn workers may use up to N times this)
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Files not requested for this long are deleted (0 keeps them until the byte budget needs the room)
+AUDIO_STORE_TTL_SECONDS = float(os.getenv("AUDIO_STORE_TTL_SECONDS", str(7 * 24 * 3600)))
+# How often the background sweeper applies the TTL and the byte budget
+AUDIO_STORE_SWEEP_SECONDS = float(os.getenv("AUDIO_STORE_SWEEP_SECONDS", "60"))
+# Temporary files younger than this are left alone at startup (another worker may still be writing them)
+AUDIO_STORE_TEMP_GRACE_SECONDS = float(os.getenv("AUDIO_STORE_TEMP_GRACE_SECONDS", "600"))
+# Stored format of synthesized replies: "wav" (16-bit PCM), "opus" (Ogg Opus) or "mp3"
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "wav")
+# Cache-Control max-age of served audio; files are content-addressed, so they never change
+AUDIO_HTTP_MAX_AGE_SECONDS = int(os.getenv("AUDIO_HTTP_MAX_AGE_SECONDS", str(24 * 3600)))
+
+# --- Audio uploads (api_interface.routes /api/process_audio) ---
+# Uploads are decoded from memory; larger ones are rejected with 413
+MAX_AUDIO_UPLOAD_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+# Only used for formats soundfile cannot decode from memory (e.g. WEBM, or MP3 on older libsndfile)
+TEMP_AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_audio_files")
+
+# --- Whisper inference profile (speech_to_text.whisper_handler) ---
+# quantize_int8: dynamic int8 quantization of the Linear layers (CPU only)
+# compile: torch.compile the encoder (its input shape is fixed, so it compiles once)
+# better_transformer: fused attention kernels via model.to_bettertransformer() (needs `optimum`)
+WHISPER_PROFILES = {
+    "accurate": {"model_name": "openai/whisper-medium", "quantize_int8": False, "compile": False, "better_transformer": False},
+    "balanced": {"model_name": "openai/whisper-small", "quantize_int8": True, "compile": False, "better_transformer": False},
+    "fast": {"model_name": "openai/whisper-base", "quantize_int8": True, "compile": False, "better_transformer": False},
+    "fastest": {"model_name": "openai/whisper-tiny", "quantize_int8": True, "compile": False, "better_transformer": False},
+}
+WHISPER_PROFILE = os.getenv("WHISPER_PROFILE", "accurate")
+# Optional overrides of single profile fields ("" keeps the profile's value)
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL_NAME", "")
+WHISPER_QUANTIZE_INT8 = os.getenv("WHISPER_QUANTIZE_INT8", "")
+WHISPER_COMPILE = os.getenv("WHISPER_COMPILE", "")
+WHISPER_BETTER_TRANSFORMER = os.getenv("WHISPER_BETTER_TRANSFORMER", "")
+
+# --- Speech-to-text batching (speech_to_text.batching) ---
+# Concurrent transcriptions are collected for up to WHISPER_BATCH_WINDOW_MS and decoded together
+WHISPER_BATCHING = os.getenv("WHISPER_BATCHING", "1") == "1"
+WHISPER_BATCH_MAX_SIZE = int(os.getenv("WHISPER_BATCH_MAX_SIZE", "8"))
+WHISPER_BATCH_WINDOW_MS = float(os.getenv("WHISPER_BATCH_WINDOW_MS", "15"))
+
+# --- Long-form transcription (speech_to_text.long_form) ---
+# Audio longer than one 30 s Whisper window is decoded as overlapping windows, LONG_FORM_BATCH_SIZE at a time
+LONG_FORM_OVERLAP_SECONDS = float(os.getenv("LONG_FORM_OVERLAP_SECONDS", "5"))
+# Cut windows at the quietest point of the overlap range instead of overlapping and de-duplicating text
+LONG_FORM_SPLIT_ON_SILENCE = os.getenv("LONG_FORM_SPLIT_ON_SILENCE", "0") == "1"
+LONG_FORM_BATCH_SIZE = int(os.getenv("LONG_FORM_BATCH_SIZE", "4"))
+
+# --- Streaming speech-to-text (speech_to_text.streaming, WebSocket /api/stt_stream) ---
+# Energy VAD: frames louder than STREAM_VAD_MIN_RMS (and well above the noise floor) are speech;
+# an utterance is final after STREAM_END_SILENCE_MS of silence
+STREAM_VAD_FRAME_MS = int(os.getenv("STREAM_VAD_FRAME_MS", "30"))
+STREAM_VAD_MIN_RMS = float(os.getenv("STREAM_VAD_MIN_RMS", "0.01"))
+STREAM_END_SILENCE_MS = int(os.getenv("STREAM_END_SILENCE_MS", "600"))
+# Audio kept from before the detected speech start, so the first syllable is not clipped
+STREAM_PRE_ROLL_MS = int(os.getenv("STREAM_PRE_ROLL_MS", "300"))
+# A partial transcript of the open utterance is sent at most this often (0 disables partials)
+STREAM_PARTIAL_INTERVAL_MS = int(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "1000"))
+# Longer utterances are finalized in pieces; this also bounds per-connection memory
+STREAM_MAX_UTTERANCE_SECONDS = float(os.getenv("STREAM_MAX_UTTERANCE_SECONDS", "30"))
+
+# --- Voice turn (api_interface.routes /api/voice_turn: speech in, spoken reply out) ---
+# Sentences synthesized ahead of the one being sent to the client
+VOICE_TURN_PREFETCH_SEGMENTS = int(os.getenv("VOICE_TURN_PREFETCH_SEGMENTS", "2"))
+
+# --- Phone calls (voice_interface, Twilio webhook /voice/twilio/incoming and media stream /voice/twilio/media) ---
+# When set, webhook requests must carry a valid X-Twilio-Signature
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
+# Public wss:// URL of the media stream given to Twilio (default: derived from the webhook request)
+TWILIO_STREAM_URL = os.getenv("TWILIO_STREAM_URL", "")
+# Whisper language of callers
+TELEPHONY_STT_LANGUAGE = os.getenv("TELEPHONY_STT_LANGUAGE", "english")
+# Replies kept in memory as rendered 8 kHz μ-law audio (about 8 KB per second of speech)
+TELEPHONY_AUDIO_CACHE_SIZE = int(os.getenv("TELEPHONY_AUDIO_CACHE_SIZE", "512"))
+
+# --- Request stages (utils.executors) ---
+# Each stage runs at most *_WORKERS jobs at once and queues at most *_QUEUE more; beyond that
+# requests are rejected immediately with 503 instead of piling up.
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+SEARCH_QUEUE = int(os.getenv("SEARCH_QUEUE", "64"))
+# With batching, STT workers mostly wait for the batcher, so allow one per batch slot
+STT_WORKERS = int(os.getenv("STT_WORKERS", str(WHISPER_BATCH_MAX_SIZE if WHISPER_BATCHING else 1)))
+STT_QUEUE = int(os.getenv("STT_QUEUE", "4"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", str(TTS_POOL_SIZE)))
+TTS_QUEUE = int(os.getenv("TTS_QUEUE", "8"))
+# Intra-op threads used by torch for Whisper/Kokoro inference (0 keeps torch's default)
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+# Inter-op threads of torch (0 keeps torch's default); can only be set before the first model runs
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+# Seconds a client should wait before retrying a rejected request
+OVERLOAD_RETRY_AFTER_SECONDS = int(os.getenv("OVERLOAD_RETRY_AFTER_SECONDS", "1"))
+
+# --- Metrics and profiling (utils.metrics on GET /metrics, utils.profiler on /api/admin/profiler) ---
+# Upper bounds in seconds of the latency histogram buckets
+METRICS_LATENCY_BUCKETS = [float(bound) for bound in os.getenv(
+    "METRICS_LATENCY_BUCKETS", "0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(",")]
+# Sampling profiler: stack samples are taken this often while a profile runs
+PROFILER_INTERVAL_MS = int(os.getenv("PROFILER_INTERVAL_MS", "10"))
+# A profile stops by itself after this long, so a forgotten one does not keep sampling
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+# Distinct stacks kept per profile; samples of further stacks are counted under "(other)"
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "5000"))
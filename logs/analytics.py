@@ -0,0 +1,358 @@
+"""
+Analytics over the conversation log (logs.store).
+
+    python -m logs.analytics ingest
+    python -m logs.analytics unanswered --top 20 --since 2025-06-01
+    python -m logs.analytics products --source voice
+    python -m logs.analytics fallback
+    python -m logs.analytics cache-warming --top 200 --output reports/cache_warming.json
+    python -m logs.analytics catalog-gaps --top 50
+
+`ingest` reads the rotated segments and the active file incrementally: every file is identified
+by a hash of its first line (which survives rotation and compression), and the checkpoint keeps
+how many bytes of each have been ingested, so each turn is read exactly once. Turns are stored
+as chunks of columns (categorical source/intent/query, timestamps, product id); a manifest keeps
+each chunk's time range and sources, so time- and source-filtered queries skip whole chunks.
+"""
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import config
+from logs.store import ACTIVE_FILE_NAME, SEGMENT_PREFIX
+from nlp_engine.response_cache import normalize_message
+
+STATE_FILE_NAME = "state.json"
+# Reply intents (nlp_engine.reply) that mean the bot could not answer the question
+UNANSWERED_INTENTS = ("fallback", "title_not_found")
+FALLBACK_INTENT = "fallback"
+# Small chunks left by frequent ingests are merged once there are more than this many
+MAX_SMALL_CHUNKS = 16
+SMALL_CHUNK_ROWS = 100000
+CHUNK_COLUMNS = ["time", "source", "intent", "query", "product_id", "n_products", "latency_ms"]
+
+
+def _open_segment(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    return open(path, "rb")
+
+
+def _segment_paths(log_dir: str) -> list:
+    """Rotated segments oldest first (their names carry the rotation time), then the active file."""
+    segments = glob.glob(os.path.join(log_dir, f"{SEGMENT_PREFIX}*.jsonl*"))
+    segments = [path for path in segments if not path.endswith(".tmp")]
+    # An uncompressed segment and its compressed copy can briefly coexist; read the uncompressed one
+    stems = {path for path in segments if path.endswith(".jsonl")}
+    segments = [path for path in segments if path.endswith(".jsonl") or path.rsplit(".", 1)[0] not in stems]
+    paths = sorted(segments)
+    active = os.path.join(log_dir, ACTIVE_FILE_NAME)
+    if os.path.exists(active):
+        paths.append(active)
+    return paths
+
+
+def _records_to_frame(records: list) -> pd.DataFrame:
+    product_ids = [record.get("product_ids") or [] for record in records]
+    frame = pd.DataFrame({
+        "time": pd.to_datetime([record.get("time") for record in records], errors="coerce", format="ISO8601"),
+        "source": pd.Categorical([record.get("source") or "unknown" for record in records]),
+        "intent": pd.Categorical([record.get("intent") or "unknown" for record in records]),
+        "query": pd.Categorical([normalize_message(str(record.get("user") or "")) for record in records]),
+        "product_id": np.array([ids[0] if ids else -1 for ids in product_ids], dtype=np.int64),
+        "n_products": np.array([len(ids) for ids in product_ids], dtype=np.int16),
+        "latency_ms": np.array([record.get("latency_ms") if record.get("latency_ms") is not None else np.nan for record in records], dtype=np.float32),
+    })
+    return frame.sort_values("time", kind="stable").reset_index(drop=True)
+
+
+class ConversationAnalytics:
+    """Incrementally ingested, chunked columnar store of conversation turns and the queries over it."""
+
+    def __init__(self, store_dir: str = config.ANALYTICS_STORE_DIR, log_dir: str = config.CONVERSATION_LOG_DIR):
+        self.store_dir = store_dir
+        self.log_dir = log_dir
+        self.state = self._load_state()
+
+    # --- storage ---
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.store_dir, STATE_FILE_NAME)
+
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as state_file:
+                return json.load(state_file)
+        return {"checkpoints": {}, "chunks": []}
+
+    def _save_state(self):
+        # Chunks are written before the state that references them, and the state is replaced
+        # atomically, so an interrupted ingest is simply redone from the previous checkpoint
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(self.state, state_file)
+        os.replace(temp_path, self.state_path)
+
+    def _write_chunk(self, frame: pd.DataFrame) -> dict:
+        name = f"chunk-{int(time.time())}-{uuid.uuid4().hex[:8]}.pkl"
+        frame.to_pickle(os.path.join(self.store_dir, name))
+        times = frame["time"].dropna()
+        return {
+            "name": name,
+            "rows": len(frame),
+            "min_time": times.min().isoformat() if len(times) else None,
+            "max_time": times.max().isoformat() if len(times) else None,
+            "sources": sorted(frame["source"].unique().tolist()),
+        }
+
+    # --- ingest ---
+
+    def ingest(self) -> dict:
+        """Reads every turn logged since the last ingest into new chunks."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        checkpoints = self.state["checkpoints"]
+        ingested = 0
+        for path in _segment_paths(self.log_dir):
+            with _open_segment(path) as segment:
+                first_line = segment.readline()
+                if not first_line.endswith(b"\n"):
+                    continue  # nothing complete yet
+                key = hashlib.sha1(first_line).hexdigest()
+                offset = checkpoints.get(key, 0)
+
+                if offset == 0:
+                    data = first_line + segment.read()
+                else:
+                    # Compressed streams cannot seek, so skip the already ingested prefix by reading it
+                    segment.read(offset - len(first_line))
+                    data = segment.read()
+
+            complete = data[:data.rfind(b"\n") + 1]
+            if not complete:
+                continue
+            records = []
+            for line in complete.splitlines():
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass
+            if records:
+                self.state["chunks"].append(self._write_chunk(_records_to_frame(records)))
+                ingested += len(records)
+            checkpoints[key] = offset + len(complete)
+            self._save_state()
+
+        small_chunks = [chunk for chunk in self.state["chunks"] if chunk["rows"] < SMALL_CHUNK_ROWS]
+        if len(small_chunks) > MAX_SMALL_CHUNKS:
+            self.compact(small_chunks)
+        return {"ingested": ingested, "rows": sum(chunk["rows"] for chunk in self.state["chunks"]), "chunks": len(self.state["chunks"])}
+
+    def compact(self, chunks: list = None):
+        """Merges chunks (by default all of them) into one, time-sorted."""
+        chunks = chunks if chunks is not None else list(self.state["chunks"])
+        if len(chunks) < 2:
+            return
+        merged = _concat([pd.read_pickle(os.path.join(self.store_dir, chunk["name"])) for chunk in chunks])
+        merged = merged.sort_values("time", kind="stable").reset_index(drop=True)
+        merged_chunk = self._write_chunk(merged)
+        names = {chunk["name"] for chunk in chunks}
+        self.state["chunks"] = [chunk for chunk in self.state["chunks"] if chunk["name"] not in names] + [merged_chunk]
+        self._save_state()
+        for name in names:
+            os.remove(os.path.join(self.store_dir, name))
+
+    # --- queries ---
+
+    def turns(self, since=None, until=None, source=None) -> pd.DataFrame:
+        """The stored turns in [since, until) from one source (all by default); non-matching chunks are not read."""
+        since = pd.Timestamp(since) if since is not None else None
+        until = pd.Timestamp(until) if until is not None else None
+        frames = []
+        for chunk in self.state["chunks"]:
+            if source is not None and source not in chunk["sources"]:
+                continue
+            if since is not None and chunk["max_time"] is not None and pd.Timestamp(chunk["max_time"]) < since:
+                continue
+            if until is not None and chunk["min_time"] is not None and pd.Timestamp(chunk["min_time"]) >= until:
+                continue
+            frame = pd.read_pickle(os.path.join(self.store_dir, chunk["name"]))
+            # Chunks are sorted by time, so the time range is two binary searches
+            times = frame["time"].values
+            start = np.searchsorted(times, since.to_datetime64()) if since is not None else 0
+            end = np.searchsorted(times, until.to_datetime64()) if until is not None else len(frame)
+            frame = frame.iloc[start:end]
+            if source is not None:
+                frame = frame[frame["source"] == source]
+            frames.append(frame)
+        if not frames:
+            return _records_to_frame([]).iloc[0:0]
+        return _concat(frames)
+
+    def top_unanswered(self, top: int = 20, **filters) -> pd.DataFrame:
+        """Most frequent normalized queries the bot could not answer (fallback / title not found)."""
+        turns = self.turns(**filters)
+        unanswered = turns[turns["intent"].isin(UNANSWERED_INTENTS)]
+        return _top_counts(unanswered["query"], top, "query")
+
+    def most_requested_products(self, top: int = 20, **filters) -> pd.DataFrame:
+        """Products most often returned as the main match, with their titles when the catalog has them."""
+        turns = self.turns(**filters)
+        counts = _top_counts(turns.loc[turns["product_id"] >= 0, "product_id"], top, "product_id")
+        try:
+            from nlp_engine.response_generator import catalog_manager, ensure_catalog_loaded
+            ensure_catalog_loaded()
+            catalog = catalog_manager.current
+            counts["title"] = [
+                catalog.index.product_at(position).get("title") if position is not None else None
+                for position in (catalog.index.position_for_id(int(product_id)) for product_id in counts["product_id"])
+            ]
+        except Exception:
+            pass
+        return counts
+
+    def fallback_rate_by_source(self, **filters) -> pd.DataFrame:
+        turns = self.turns(**filters)
+        grouped = turns.assign(fallback=turns["intent"] == FALLBACK_INTENT, unanswered=turns["intent"].isin(UNANSWERED_INTENTS))
+        grouped = grouped.groupby("source", observed=True).agg(
+            turns=("intent", "size"),
+            fallback_rate=("fallback", "mean"),
+            unanswered_rate=("unanswered", "mean"),
+            p50_latency_ms=("latency_ms", "median"),
+        )
+        return grouped.sort_values("turns", ascending=False).reset_index()
+
+    def cache_warming_report(self, top: int = 200, **filters) -> dict:
+        """
+        The most frequent answered queries, to pre-fill the response and TTS caches with,
+        and the share of all traffic they cover.
+        """
+        turns = self.turns(**filters)
+        answered = turns[~turns["intent"].isin(UNANSWERED_INTENTS)]
+        counts = _top_counts(answered["query"], top, "query")
+        return {
+            "turns": len(turns),
+            "coverage": float(counts["count"].sum() / len(turns)) if len(turns) else 0.0,
+            "queries": counts.to_dict("records"),
+        }
+
+    def catalog_gap_report(self, top: int = 50, **filters) -> dict:
+        """
+        Words of unanswered queries that no product in the catalog contains: what customers
+        ask for that we do not sell (or do not describe the way they ask for it).
+        """
+        from nlp_engine.catalog_index import RELATED_STOP_WORDS, get_keywords_from_text
+        from nlp_engine.intent_classifier import INTENT_RULES
+        from nlp_engine.response_generator import catalog_manager, ensure_catalog_loaded
+
+        ensure_catalog_loaded()
+        index = catalog_manager.current.index
+        # Words of the intent phrases ("do you have", "how much", ...) say how people ask, not what for
+        ignored_words = set(RELATED_STOP_WORDS)
+        for intent, priority, mode, phrases in INTENT_RULES:
+            for phrase in phrases:
+                ignored_words.update(get_keywords_from_text(phrase))
+        turns = self.turns(**filters)
+        unanswered = turns.loc[turns["intent"].isin(UNANSWERED_INTENTS), "query"]
+        # Tokenize each distinct query once, weighted by how often it was asked
+        word_counts = {}
+        example_queries = {}
+        for query, count in unanswered.value_counts().items():
+            if not count:
+                continue
+            for word in set(get_keywords_from_text(query)):
+                if word in ignored_words or word.isdigit() or len(word) < 3 or index.has_keyword(word):
+                    continue
+                word_counts[word] = word_counts.get(word, 0) + int(count)
+                example_queries.setdefault(word, query)
+        missing = sorted(word_counts.items(), key=lambda item: -item[1])[:top]
+        return {
+            "unanswered_turns": int(len(unanswered)),
+            "missing_terms": [{"term": word, "count": count, "example": example_queries[word]} for word, count in missing],
+        }
+
+
+def _concat(frames: list) -> pd.DataFrame:
+    if len(frames) == 1:
+        return frames[0]
+    # Every chunk has its own categories; union them so the result stays categorical
+    columns = {}
+    for column in CHUNK_COLUMNS:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([frame[column] for frame in frames])
+        else:
+            columns[column] = np.concatenate([frame[column].values for frame in frames])
+    return pd.DataFrame(columns)
+
+
+def _top_counts(values: pd.Series, top: int, name: str) -> pd.DataFrame:
+    counts = values.value_counts()
+    counts = counts[counts > 0].head(top)
+    return pd.DataFrame({name: counts.index.tolist(), "count": counts.values.astype(int)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversation log analytics.")
+    parser.add_argument("command", choices=["ingest", "compact", "unanswered", "products", "fallback", "cache-warming", "catalog-gaps"])
+    parser.add_argument("--store", default=config.ANALYTICS_STORE_DIR, help="Analytics store directory")
+    parser.add_argument("--logs", default=config.CONVERSATION_LOG_DIR, help="Conversation log directory")
+    parser.add_argument("--since", help="Only turns at or after this time (e.g. 2025-06-01)")
+    parser.add_argument("--until", help="Only turns before this time")
+    parser.add_argument("--source", help="Only turns from this source (chat, voice, web_chat, ...)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--no-ingest", action="store_true", help="Query the store as it is, without ingesting new turns first")
+    parser.add_argument("--output", help="Write the result as JSON to this file")
+    args = parser.parse_args(argv)
+
+    analytics = ConversationAnalytics(args.store, args.logs)
+    started = time.perf_counter()
+    if args.command == "ingest" or not args.no_ingest:
+        summary = analytics.ingest()
+        print(f"Ingested {summary['ingested']} new turns ({summary['rows']} stored in {summary['chunks']} chunks) "
+              f"in {time.perf_counter() - started:.2f} s")
+    if args.command == "ingest":
+        return
+    if args.command == "compact":
+        analytics.compact()
+        return
+
+    filters = {"since": args.since, "until": args.until, "source": args.source}
+    started = time.perf_counter()
+    if args.command == "unanswered":
+        result = analytics.top_unanswered(args.top, **filters)
+    elif args.command == "products":
+        result = analytics.most_requested_products(args.top, **filters)
+    elif args.command == "fallback":
+        result = analytics.fallback_rate_by_source(**filters)
+    elif args.command == "cache-warming":
+        result = analytics.cache_warming_report(args.top, **filters)
+    else:
+        result = analytics.catalog_gap_report(args.top, **filters)
+    elapsed = time.perf_counter() - started
+
+    if isinstance(result, pd.DataFrame):
+        print(result.to_string(index=False))
+        result = result.to_dict("records")
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    print(f"({elapsed:.2f} s)")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(result, output_file, ensure_ascii=False, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+from logs.store import log_conversation
+
+
 def log_interaction(user_message: str, response: str):
-    with open("logs/samples/chat_log.txt", "a", encoding="utf-8") as f:
-        f.write(f"User: {user_message}\nBot: {response}\n\n")
+    """Kept for older callers; turns go to the buffered conversation log (logs.store)."""
+    log_conversation("chat", user_message, response)
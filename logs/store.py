@@ -1,12 +1,256 @@
+import asyncio
+import gzip
 import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
 
-def log_conversation(source, user_msg, bot_msg):
+import config
+from utils.metrics import FILE_WRITE_BYTES, FILE_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE_NAME = "conversations.jsonl"
+SEGMENT_PREFIX = "conversations-"
+
+WRITE_SECONDS = FILE_WRITE_SECONDS.labels("conversation_log")
+FSYNC_SECONDS = FILE_WRITE_SECONDS.labels("conversation_log_fsync")
+WRITE_BYTES = FILE_WRITE_BYTES.labels("conversation_log")
+
+
+def _in_event_loop() -> bool:
+    """True when called from a thread that is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class ConversationLogWriter:
+    """
+    Appends conversation turns to a JSONL file from a background thread.
+
+    write() only puts the record on a bounded in-memory queue, so logging adds next to nothing
+    to a turn. The writer thread serializes records in batches, writes them to the active file
+    and flushes + fsyncs at least every flush_seconds, so a crash loses at most that much.
+    When the active file grows past max_bytes or gets older than rotate_seconds it is renamed
+    to a timestamped segment and compressed (gzip or zstd) on a separate thread.
+
+    When the queue is full, overflow="drop" discards the record immediately and overflow="block"
+    waits up to block_seconds for room first; either way dropped records are counted. "block"
+    only ever waits off the event loop: a write() from a coroutine never stalls the other requests
+    and behaves like "drop".
+    """
+
+    def __init__(self, directory: str, max_queue: int = 10000, overflow: str = "drop", block_seconds: float = 0.05,
+                 flush_seconds: float = 1.0, max_bytes: int = 64 * 1024 * 1024, rotate_seconds: float = 24 * 3600,
+                 compression: str = "gzip"):
+        self.directory = directory
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._file = None
+        self._file_opened_at = None
+        self._counter_lock = threading.Lock()  # dropped is counted by request threads and the writer
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+
+    @property
+    def active_path(self) -> str:
+        return os.path.join(self.directory, ACTIVE_FILE_NAME)
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._closed.clear()
+                self._worker = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+                self._worker.start()
+
+    def write(self, record: dict) -> bool:
+        """Queues one record; returns False if it was dropped because the writer is overloaded."""
+        if self._worker is None:
+            self.start()
+        try:
+            if self.overflow == "block" and not _in_event_loop():
+                self._queue.put(record, timeout=self.block_seconds)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._count_dropped(1)
+            return False
+
+    def _count_dropped(self, count: int):
+        with self._counter_lock:
+            self.dropped += count
+
+    def close(self, timeout: float = 5.0):
+        """Writes out everything still queued and stops the writer thread."""
+        worker = self._worker
+        if worker is None:
+            return
+        self._closed.set()
+        worker.join(timeout)
+        self._worker = None
+
+    def _run(self):
+        batch = []
+        next_flush = time.monotonic() + self.flush_seconds
+        while True:
+            timeout = max(0.0, next_flush - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                # Take whatever else is already waiting without blocking again
+                while len(batch) < 1000:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write_batch(batch)
+                batch = []
+
+            closing = self._closed.is_set() and self._queue.empty()
+            if time.monotonic() >= next_flush or closing:
+                self._flush()
+                next_flush = time.monotonic() + self.flush_seconds
+            if closing:
+                self._close_file()
+                return
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.active_path, "a", encoding="utf-8")
+            self._file_opened_at = time.time()
+
+    def _write_batch(self, batch):
+        try:
+            self._open()
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(json.dumps(record, ensure_ascii=False, default=str))
+                except Exception as e:
+                    logger.warning("Skipping unserializable conversation record: %s", e)
+            data = "\n".join(lines) + "\n"
+            with WRITE_SECONDS.time():
+                self._file.write(data)
+            WRITE_BYTES.inc(len(data.encode("utf-8")))
+            self.written += len(lines)
+            if self._file.tell() >= self.max_bytes or time.time() - self._file_opened_at >= self.rotate_seconds:
+                self._rotate()
+        except Exception as e:
+            self._count_dropped(len(batch))
+            logger.error("Could not write %d conversation records: %s", len(batch), e)
+
+    def _flush(self):
+        if self._file is None:
+            return
+        try:
+            with FSYNC_SECONDS.time():
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self.flushes += 1
+        except Exception as e:
+            logger.error("Could not flush the conversation log: %s", e)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        self._close_file()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        segment_path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{stamp}.jsonl")
+        os.replace(self.active_path, segment_path)
+        self.rotations += 1
+        if self.compression != "none":
+            threading.Thread(target=self._compress, args=(segment_path,), name="conversation-log-compress", daemon=True).start()
+
+    def _compress(self, segment_path: str):
+        compression = self.compression
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                logger.warning("zstandard is not installed; compressing conversation logs with gzip")
+                compression = "gzip"
+        try:
+            if compression == "zstd":
+                with open(segment_path, "rb") as source, open(segment_path + ".zst.tmp", "wb") as target:
+                    zstandard.ZstdCompressor(level=3).copy_stream(source, target)
+                os.replace(segment_path + ".zst.tmp", segment_path + ".zst")
+            else:
+                with open(segment_path, "rb") as source, gzip.open(segment_path + ".gz.tmp", "wb", compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(segment_path + ".gz.tmp", segment_path + ".gz")
+            os.remove(segment_path)
+        except Exception as e:
+            logger.error("Could not compress %s (kept uncompressed): %s", segment_path, e)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "overflow": self.overflow,
+        }
+
+
+conversation_log = ConversationLogWriter(
+    config.CONVERSATION_LOG_DIR,
+    max_queue=config.CONVERSATION_LOG_QUEUE_SIZE,
+    overflow=config.CONVERSATION_LOG_OVERFLOW,
+    block_seconds=config.CONVERSATION_LOG_BLOCK_SECONDS,
+    flush_seconds=config.CONVERSATION_LOG_FLUSH_SECONDS,
+    max_bytes=config.CONVERSATION_LOG_MAX_BYTES,
+    rotate_seconds=config.CONVERSATION_LOG_ROTATE_SECONDS,
+    compression=config.CONVERSATION_LOG_COMPRESSION,
+)
+
+
+def log_conversation(source, user_msg, bot_msg, **fields):
+    """
+    Records one conversation turn (non-blocking, see ConversationLogWriter).
+    Extra fields (intent, product_ids, latency_ms, ...) are stored with the turn.
+    """
     log = {
         "time": datetime.now().isoformat(),
         "source": source,
         "user": user_msg,
-        "bot": bot_msg
+        "bot": bot_msg,
+        **fields,
     }
-    with open("logs/conversations.jsonl", "a") as f:
-        f.write(json.dumps(log) + "\n")
+    return conversation_log.write(log)
+
+
+def log_chat_reply(source, user_msg, reply, latency_ms: float = None, **fields):
+    """Records a turn answered by the response engine (a nlp_engine.reply.ChatReply) with its intent and products."""
+    return log_conversation(
+        source, user_msg, reply.reply,
+        intent=reply.intent,
+        product_ids=reply.product_ids,
+        related_ids=reply.related_ids,
+        category=reply.category,
+        latency_ms=None if latency_ms is None else round(latency_ms, 2),
+        **fields,
+    )
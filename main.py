@@ -1,11 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from api_interface.routes import router as api_router
 from chat_interface.web_chat import router as chat_ui_router
-from speech_to_text.whisper_handler import load_whisper_model
+from speech_to_text import whisper_handler
+from text_to_speech.kokoro_handler import load_tts_pipelines, is_tts_ready
+from text_to_speech.tts_cache import prerender_canned_replies
+from voice_interface.webhook_routes import router as voice_router
+from voice_interface.twilio_handler import prerender_telephony_replies
+from text_to_speech.audio_store import audio_store
+from nlp_engine.response_generator import canned_replies, ensure_catalog_loaded, catalog_manager
 import os
 from api_interface.routes import TEMP_AUDIO_DIR
 import logging
+import config
+from utils.executors import StageSaturated
+from utils.metrics import MetricsMiddleware
+from utils.profiler import sampling_profiler
+from utils.startup import startup_loader, ComponentNotReady
+from logs.store import conversation_log
 
 # پیکربندی اولیه لاگینگ
 LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
@@ -26,27 +39,82 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# زمان هر درخواست HTTP (بر اساس مسیر و کد وضعیت) در /metrics
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(StageSaturated)
+async def stage_saturated_handler(request: Request, exc: StageSaturated):
+    """
+    وقتی یکی از مراحل (جستجو، STT، TTS) اشباع است، درخواست فوراً با 503 رد می‌شود.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "stage": exc.stage},
+        headers={"Retry-After": str(config.OVERLOAD_RETRY_AFTER_SECONDS)},
+    )
+
+@app.exception_handler(ComponentNotReady)
+async def component_not_ready_handler(request: Request, exc: ComponentNotReady):
+    """
+    تا وقتی بخش لازم (کاتالوگ، Whisper یا TTS) هنوز در حال بارگذاری است، درخواست با 503 رد می‌شود.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "component": exc.component, "state": exc.state},
+        headers={"Retry-After": str(config.OVERLOAD_RETRY_AFTER_SECONDS)},
+    )
+
 # مسیر UI چت
 app.include_router(chat_ui_router, prefix="/chat")
 
 # مسیرهای API
 app.include_router(api_router)
 
-# -- نکته: mount دقیق‌تر (audio) باید قبل از mount کلی‌تر (static) بیاید --
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # مسیر اصلی پروژه
-AUDIO_DIR = os.path.join(BASE_DIR, "outputs", "audio")
-os.makedirs(AUDIO_DIR, exist_ok=True)
-app.mount("/static/audio", StaticFiles(directory=AUDIO_DIR), name="audio")    # اول mount کن
-app.mount("/static", StaticFiles(directory="data"), name="static")            # بعد mount کن
+# تماس‌های تلفنی (Twilio)
+app.include_router(voice_router, prefix="/voice/twilio")
+
+# -- نکته: فایل‌های صوتی (/static/audio) از مسیر api_router و audio_store سرو می‌شوند (ETag، Range، Cache-Control)؛
+# این router باید قبل از mount کلی‌تر (static) ثبت شود --
+app.mount("/static", StaticFiles(directory="data"), name="static")
+
+def _load_catalog():
+    details = ensure_catalog_loaded()
+    # products.csv changes are picked up and swapped in without a restart
+    catalog_manager.start_watching(config.CATALOG_WATCH_INTERVAL_SECONDS)
+    return details
+
+def _load_whisper():
+    whisper_handler.load_whisper_model()
+    if whisper_handler.model is None:
+        raise RuntimeError("Whisper model failed to load (see the log above)")
+    return {"model": whisper_handler.WHISPER_MODEL_NAME, "device": whisper_handler.device}
+
+def _load_tts():
+    load_tts_pipelines()
+    if not is_tts_ready():
+        raise RuntimeError("TTS pipelines failed to load")
+    prerender_canned_replies(canned_replies())
+    prerender_telephony_replies(canned_replies())
+    return {"lang_codes": config.TTS_LANG_CODES, "pool_size": config.TTS_POOL_SIZE}
+
+# کاتالوگ برای چت متنی کافی است؛ مدل‌های گفتار در پس‌زمینه بارگذاری می‌شوند
+startup_loader.register("catalog", _load_catalog, required=True)
+startup_loader.register("whisper", _load_whisper)
+startup_loader.register("tts", _load_tts)
 
 @app.on_event("startup")
 async def startup_event():
     """
     این تابع در زمان شروع برنامه اجرا می‌شود.
-    مدل های LLM و Whisper را بارگذاری می کند و پوشه فایل های موقت را ایجاد می کند.
+    بارگذاری کاتالوگ، مدل Whisper و pipelineهای Kokoro را به صورت همزمان در پس‌زمینه شروع می کند
+    (وضعیت آن‌ها در /api/ready) و پوشه فایل های موقت را ایجاد می کند.
     """
-    logger.info("Application startup event: Loading all necessary AI models and setting up directories...")
-    load_whisper_model()
+    logger.info("Application startup event: Loading the catalog and AI models in the background...")
+    startup_loader.start()
+    # فایل‌های صوتی موجود یک بار در شروع برنامه فهرست می‌شوند (نه هنگام import)؛
+    # فایل‌های قدیمی و مازاد بر بودجه دیسک در پس‌زمینه حذف می‌شوند
+    audio_store.open()
+    audio_store.start_sweeper()
 
     # ایجاد پوشه موقت اگر وجود نداشته باشد
     if not os.path.exists(TEMP_AUDIO_DIR):
@@ -55,6 +123,15 @@ async def startup_event():
     else:
         logger.info(f"Temporary audio directory already exists: {TEMP_AUDIO_DIR}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    گفتگوهای باقی‌مانده در صف را قبل از خروج روی دیسک می‌نویسد و sweeper فایل‌های صوتی را متوقف می‌کند.
+    """
+    conversation_log.close()
+    audio_store.stop_sweeper()
+    sampling_profiler.stop()
+
 @app.get("/")
 def root():
     """
@@ -0,0 +1,452 @@
+import re
+import time
+import random
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# Score weights used by the general product search (step 6 of generate_response)
+TITLE_IN_MESSAGE_SCORE = 100
+VARIATION_IN_MESSAGE_SCORE = 50
+KEYWORD_OVERLAP_SCORE = 10
+
+# Score tiers used by the "I want a ..." best-title-match search (step 4 of generate_response)
+EXACT_TITLE_SCORE = 1000
+PREFIX_TITLE_SCORE = 500
+WORD_TITLE_SCORE = 300
+SUBSTRING_TITLE_SCORE = 100
+
+# Length of the character n-grams used to find substring title matches
+TITLE_NGRAM_SIZE = 3
+
+# Attributes mapping a token, text or n-gram to the sorted int32 positions of the products
+# containing it. They are what a catalog snapshot stores (see catalog_manager).
+POSTING_TABLES = ('_postings', '_title_texts', '_variation_texts', '_title_tokens', '_title_ngrams')
+
+# Words ignored when relating products by shared keywords
+RELATED_STOP_WORDS = {'a', 'an', 'the', 'is', 'it', 'for', 'with', 'and', 'or', 'of', 'in', 'on', 'to', 'from', 'by', 'as', 'are'}
+
+
+def get_keywords_from_text(text):
+    """Extracs alphanumeric words from a string and converts to lowercase."""
+    if pd.isna(text):
+        return []
+    return WORD_PATTERN.findall(str(text).lower())
+
+
+def _column_values(products_df, column):
+    if column in products_df.columns:
+        return products_df[column].tolist()
+    return [None] * len(products_df)
+
+
+class CatalogIndex:
+    """
+    Search structures derived once from the products DataFrame.
+
+    Products are addressed by their position in the DataFrame (iloc), so the
+    order of the catalog is also the tie-break order of every search.
+    """
+
+    def __init__(self, products_df: pd.DataFrame, posting_tables: dict = None):
+        """
+        posting_tables: the tables returned by posting_tables() for this same DataFrame
+        (e.g. read back from a catalog snapshot); the tokenizing passes are then skipped.
+        """
+        self.df = products_df
+        self.size = len(products_df)
+
+        ids = _column_values(products_df, 'id')
+        self._positions_by_id = {}
+        for position, product_id in enumerate(ids):
+            if pd.notna(product_id):
+                self._positions_by_id.setdefault(product_id, position)
+
+        if posting_tables is None:
+            self._build_postings(products_df)
+        else:
+            for name in POSTING_TABLES:
+                setattr(self, name, posting_tables[name])
+        self._title_lengths = sorted({len(text) for text in self._title_texts})
+        self._variation_lengths = sorted({len(text) for text in self._variation_texts})
+
+        self._build_title_index(products_df, build_postings=posting_tables is None)
+        self._build_related_index(products_df, ids)
+
+    def _build_postings(self, products_df):
+        titles = _column_values(products_df, 'title')
+        descriptions = _column_values(products_df, 'description')
+        variations = _column_values(products_df, 'variation')
+
+        postings = {}
+        title_texts = {}
+        variation_texts = {}
+
+        for position in range(self.size):
+            keywords = set()
+
+            if pd.notna(titles[position]):
+                title_lower = str(titles[position]).lower()
+                title_texts.setdefault(title_lower, []).append(position)
+                keywords.update(get_keywords_from_text(title_lower))
+
+            if pd.notna(descriptions[position]):
+                keywords.update(get_keywords_from_text(descriptions[position]))
+
+            if pd.notna(variations[position]):
+                variation_lower = str(variations[position]).lower()
+                variation_texts.setdefault(variation_lower, []).append(position)
+                keywords.update(get_keywords_from_text(variation_lower))
+
+            for keyword in keywords:
+                postings.setdefault(keyword, []).append(position)
+
+        # token -> sorted array of product positions containing that token
+        self._postings = {token: np.array(positions, dtype=np.int32) for token, positions in postings.items()}
+        self._title_texts = {text: np.array(positions, dtype=np.int32) for text, positions in title_texts.items()}
+        self._variation_texts = {text: np.array(positions, dtype=np.int32) for text, positions in variation_texts.items()}
+
+    def _build_title_index(self, products_df, build_postings: bool = True):
+        """
+        Builds the structures behind best_title_match.
+        Titles are normalized exactly like the original loop did (str(title).lower()).
+        """
+        if 'title' in products_df.columns:
+            self._normalized_titles = [str(title).lower() for title in products_df['title'].tolist()]
+        else:
+            self._normalized_titles = [''] * self.size
+
+        self._exact_titles = {}
+        for position, title in enumerate(self._normalized_titles):
+            self._exact_titles.setdefault(title, position)
+
+        # Sorted array of titles for prefix lookups with bisect
+        order = sorted(range(self.size), key=lambda position: self._normalized_titles[position])
+        self._sorted_titles = [self._normalized_titles[position] for position in order]
+        self._sorted_title_positions = order
+
+        if not build_postings:
+            return
+        title_tokens = {}
+        title_ngrams = {}
+        for position, title in enumerate(self._normalized_titles):
+            for token in set(WORD_PATTERN.findall(title)):
+                title_tokens.setdefault(token, []).append(position)
+            grams = set()
+            for size in range(2, TITLE_NGRAM_SIZE + 1):
+                grams.update(title[start:start + size] for start in range(len(title) - size + 1))
+            for gram in grams:
+                title_ngrams.setdefault(gram, []).append(position)
+
+        self._title_tokens = {token: np.array(positions, dtype=np.int32) for token, positions in title_tokens.items()}
+        self._title_ngrams = {gram: np.array(positions, dtype=np.int32) for gram, positions in title_ngrams.items()}
+
+    def _build_related_index(self, products_df, ids):
+        """Category buckets for find_related_products; keyword neighbours are computed lazily."""
+        self._ids = ids
+        self._categories = _column_values(products_df, 'category')
+        self._category_buckets = {}
+        for position, category in enumerate(self._categories):
+            if isinstance(category, str):
+                self._category_buckets.setdefault(category.lower(), []).append(position)
+        # (position, num_results) -> related product positions
+        self._related_cache = {}
+
+    def posting_tables(self) -> dict:
+        """The tokenized tables (text -> int32 positions) that are expensive to rebuild; see POSTING_TABLES."""
+        return {name: getattr(self, name) for name in POSTING_TABLES}
+
+    def has_keyword(self, word: str) -> bool:
+        """True if any product's title, description or variation contains this (lowercase) word."""
+        return word in self._postings
+
+    def position_for_id(self, product_id):
+        """Returns the position of the first product with this id, or None."""
+        return self._positions_by_id.get(product_id)
+
+    def product_at(self, position):
+        return self.df.iloc[position]
+
+    def position_of(self, product_row):
+        """Returns the position of a row taken from this catalog (looked up by its index label)."""
+        position = self.df.index.get_indexer([product_row.name])[0]
+        return int(position) if position >= 0 else None
+
+    def related_positions(self, position: int, num_results: int = 6):
+        """
+        Returns the positions of the products related to the product at position.
+
+        Products of the same category come first, in catalog order. If there are fewer
+        than num_results of them, the list is filled with the products sharing the most
+        keywords with this one. Products with the same id are excluded. The result is
+        computed once per product and then served from the table.
+        """
+        key = (position, num_results)
+        related = self._related_cache.get(key)
+        if related is None:
+            related = self._compute_related(position, num_results)
+            self._related_cache[key] = related
+        return related
+
+    def _compute_related(self, position, num_results):
+        main_id = self._ids[position]
+        related = []
+
+        category = self._categories[position]
+        if pd.notna(category):
+            bucket = self._category_buckets.get(str(category).lower(), [])
+            related = [candidate for candidate in bucket if self._ids[candidate] != main_id][:num_results]
+
+        if len(related) < num_results:
+            related_ids = {self._ids[candidate] for candidate in related}
+            for candidate in self._keyword_neighbours(position):
+                if len(related) >= num_results:
+                    break
+                if self._ids[candidate] not in related_ids:
+                    related.append(candidate)
+                    related_ids.add(self._ids[candidate])
+
+        unique_related = []
+        seen_ids = set()
+        for candidate in related:
+            if self._ids[candidate] not in seen_ids:
+                unique_related.append(candidate)
+                seen_ids.add(self._ids[candidate])
+        return unique_related[:num_results]
+
+    def _keyword_neighbours(self, position):
+        """
+        Yields products sharing keywords with the product at position, most shared first
+        (catalog order on ties). This is one row of the sparse product x product
+        co-occurrence matrix, computed from the keyword postings.
+        """
+        row = self.df.iloc[position]
+        keywords = set()
+        for column in ('title', 'description', 'variation'):
+            if pd.notna(row.get(column)):
+                keywords.update(get_keywords_from_text(row[column]))
+        keywords = [word for word in keywords if word not in RELATED_STOP_WORDS and len(word) > 2]
+
+        postings = [self._postings[word] for word in keywords if word in self._postings]
+        if not postings:
+            return
+
+        candidates, overlap = np.unique(np.concatenate(postings), return_counts=True)
+        main_id = self._ids[position]
+        for best in np.argsort(-overlap, kind='stable'):
+            candidate = int(candidates[best])
+            if self._ids[candidate] != main_id:
+                yield candidate
+
+    def best_keyword_match(self, message_lower: str, message_words=None):
+        """
+        Scores every product against the message and returns (position, score) of the best one.
+
+        The scores are the same as the title/variation/keyword-overlap rules of the
+        general product search: +100 if the whole title appears in the message, +50 for
+        the whole variation, and +10 for every distinct word shared with the message.
+        Only products that share something with the message are touched.
+        Returns (None, 0) when nothing matches.
+        """
+        if message_words is None:
+            message_words = get_keywords_from_text(message_lower)
+
+        hit_positions = []
+        hit_weights = []
+
+        for word in set(message_words):
+            positions = self._postings.get(word)
+            if positions is not None:
+                hit_positions.append(positions)
+                hit_weights.append(np.full(len(positions), KEYWORD_OVERLAP_SCORE, dtype=np.int64))
+
+        for positions in self._texts_in_message(message_lower, self._title_texts, self._title_lengths):
+            hit_positions.append(positions)
+            hit_weights.append(np.full(len(positions), TITLE_IN_MESSAGE_SCORE, dtype=np.int64))
+
+        for positions in self._texts_in_message(message_lower, self._variation_texts, self._variation_lengths):
+            hit_positions.append(positions)
+            hit_weights.append(np.full(len(positions), VARIATION_IN_MESSAGE_SCORE, dtype=np.int64))
+
+        if not hit_positions:
+            return None, 0
+
+        candidates, inverse = np.unique(np.concatenate(hit_positions), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_weights))
+        # candidates are sorted, so argmax keeps the first product in catalog order on ties
+        best = int(np.argmax(scores))
+        return int(candidates[best]), int(scores[best])
+
+    def best_title_match(self, requested_name: str):
+        """
+        Finds the product whose title best matches the requested name and returns (position, score).
+
+        Tiers, from best to worst: exact title, title starts with the name, name appears
+        as a whole word, name appears as a substring. Within a tier the shorter title wins,
+        then the earlier product. Only the first non-empty tier is examined, and each tier
+        only looks at titles that can possibly match. Returns (None, -1) when nothing matches.
+        """
+        if not requested_name:
+            return None, -1
+
+        # 1. Exact title match
+        position = self._exact_titles.get(requested_name)
+        if position is not None:
+            return position, EXACT_TITLE_SCORE
+
+        # 2. Title starts with the requested name
+        candidates = []
+        start = bisect_left(self._sorted_titles, requested_name)
+        while start < len(self._sorted_titles) and self._sorted_titles[start].startswith(requested_name):
+            candidates.append(self._sorted_title_positions[start])
+            start += 1
+        if candidates:
+            return self._shortest_title(candidates, requested_name, PREFIX_TITLE_SCORE, 100)
+
+        # 3. Requested name appears as a whole word. Every word of the name must then be a
+        # complete word of the title, so the rarest of them bounds the candidates.
+        word_pattern = re.compile(r'\b' + re.escape(requested_name) + r'\b')
+        name_tokens = WORD_PATTERN.findall(requested_name)
+        if name_tokens:
+            candidates = self._rarest(self._title_tokens, name_tokens)
+        else:
+            candidates = self._substring_candidates(requested_name)
+        candidates = [position for position in candidates if word_pattern.search(self._normalized_titles[position])]
+        if candidates:
+            return self._shortest_title(candidates, requested_name, WORD_TITLE_SCORE, 50)
+
+        # 4. Requested name appears anywhere in the title
+        candidates = [
+            position for position in self._substring_candidates(requested_name)
+            if requested_name in self._normalized_titles[position]
+        ]
+        if candidates:
+            return self._shortest_title(candidates, requested_name, SUBSTRING_TITLE_SCORE, 20)
+
+        return None, -1
+
+    def _substring_candidates(self, text):
+        """Positions of titles that contain every n-gram of text (a superset of the real matches)."""
+        if len(text) < 2:
+            return range(self.size)
+        size = min(len(text), TITLE_NGRAM_SIZE)
+        grams = {text[start:start + size] for start in range(len(text) - size + 1)}
+        return self._rarest(self._title_ngrams, grams)
+
+    @staticmethod
+    def _rarest(postings, keys):
+        """Returns the shortest postings list among keys (empty if any key is missing)."""
+        rarest = None
+        for key in keys:
+            positions = postings.get(key)
+            if positions is None:
+                return []
+            if rarest is None or len(positions) < len(rarest):
+                rarest = positions
+        return rarest.tolist() if rarest is not None else []
+
+    def _shortest_title(self, candidates, requested_name, base_score, length_weight):
+        position = min(candidates, key=lambda candidate: (len(self._normalized_titles[candidate]), candidate))
+        title_length = len(self._normalized_titles[position])
+        return position, base_score + (len(requested_name) / max(1, title_length)) * length_weight
+
+    @staticmethod
+    def _texts_in_message(message_lower, texts, lengths):
+        """Yields the positions of every indexed text that occurs as a substring of the message."""
+        found = set()
+        message_length = len(message_lower)
+        for length in lengths:
+            if length > message_length:
+                break
+            for start in range(message_length - length + 1):
+                candidate = message_lower[start:start + length]
+                if candidate in texts and candidate not in found:
+                    found.add(candidate)
+                    yield texts[candidate]
+
+
+def _scan_best_match(products_df, message_lower):
+    """Reference implementation: the original per-message iterrows() scan."""
+    message_words = get_keywords_from_text(message_lower)
+    best_position = None
+    max_score = 0
+    for position, (index, row) in enumerate(products_df.iterrows()):
+        current_score = 0
+        product_keywords_for_scoring = []
+        if pd.notna(row.get('title')):
+            title_lower = str(row['title']).lower()
+            if title_lower in message_lower:
+                current_score += TITLE_IN_MESSAGE_SCORE
+            product_keywords_for_scoring.extend(get_keywords_from_text(title_lower))
+        if pd.notna(row.get('description')):
+            product_keywords_for_scoring.extend(get_keywords_from_text(row['description']))
+        if pd.notna(row.get('variation')):
+            variation_lower = str(row['variation']).lower()
+            if variation_lower in message_lower:
+                current_score += VARIATION_IN_MESSAGE_SCORE
+            product_keywords_for_scoring.extend(get_keywords_from_text(variation_lower))
+        current_score += len(set(message_words) & set(product_keywords_for_scoring)) * KEYWORD_OVERLAP_SCORE
+        if current_score > max_score:
+            max_score = current_score
+            best_position = position
+    return best_position, max_score
+
+
+def make_synthetic_catalog(num_products: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a random products DataFrame with the same columns as products.csv."""
+    rng = random.Random(seed)
+    nouns = ["shaver", "watch", "lamp", "chair", "speaker", "earbuds", "headphone", "charger", "cable",
+             "monitor", "keyboard", "mouse", "camera", "tablet", "phone", "router", "printer", "console"]
+    adjectives = ["smart", "wireless", "portable", "classic", "pro", "mini", "ultra", "compact", "digital", "premium"]
+    colors = ["black", "white", "silver", "blue", "red", "green", "gold"]
+    categories = ["Electronics", "Beauty", "Smart Home", "Furniture", "Audio", "Computing", "Gaming"]
+    filler = [f"w{i}" for i in range(2000)]
+    description_words = filler + nouns + adjectives
+
+    rows = []
+    for product_id in range(1000, 1000 + num_products):
+        title = f"{rng.choice(adjectives)} {rng.choice(nouns)} {rng.choice(filler)}"
+        rows.append({
+            "id": product_id,
+            "title": title.title(),
+            "description": " ".join(rng.choice(description_words) for _ in range(25)),
+            "variation": rng.choice(colors) if rng.random() < 0.7 else None,
+            "category": rng.choice(categories),
+            "price": round(rng.uniform(5, 500), 2),
+            "url": f"https://example.com/p/{product_id}",
+            "image-url": f"https://example.com/i/{product_id}.jpg",
+        })
+    return pd.DataFrame(rows)
+
+
+# Benchmark: per-query latency of the index against the original scan (python -m nlp_engine.catalog_index)
+if __name__ == "__main__":
+    queries = [
+        "do you have a wireless headphone in black",
+        "how much is the smart lamp",
+        "i am looking for something for my desk",
+        "portable speaker w17 blue",
+    ]
+    print(f"{'products':>10} {'build (s)':>10} {'index (ms/query)':>17} {'scan (ms/query)':>16}")
+    for num_products in (1000, 5000, 20000, 50000):
+        catalog = make_synthetic_catalog(num_products)
+
+        started = time.perf_counter()
+        index = CatalogIndex(catalog)
+        build_seconds = time.perf_counter() - started
+
+        rounds = 50
+        started = time.perf_counter()
+        for _ in range(rounds):
+            index_results = [index.best_keyword_match(query) for query in queries]
+        index_ms = (time.perf_counter() - started) * 1000 / (rounds * len(queries))
+
+        started = time.perf_counter()
+        scan_results = [_scan_best_match(catalog, query) for query in queries]
+        scan_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        assert index_results == scan_results, (index_results, scan_results)
+        print(f"{num_products:>10} {build_seconds:>10.2f} {index_ms:>17.3f} {scan_ms:>16.1f}")
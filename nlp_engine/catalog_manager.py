@@ -0,0 +1,331 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from nlp_engine.catalog_index import POSTING_TABLES, CatalogIndex, make_synthetic_catalog
+from utils.metrics import FILE_WRITE_BYTES, FILE_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of CatalogIndex changes, so older snapshots are rebuilt
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_META_FILE = "meta.json"
+SNAPSHOT_PRODUCTS_FILE = "products.parquet"
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One loaded catalog: the products and every search structure derived from them."""
+    version: int
+    df: pd.DataFrame
+    index: CatalogIndex
+    source: str = None  # "csv", "snapshot" or None (nothing loaded)
+    source_sha256: str = None
+    load_seconds: float = 0.0
+    loaded_at: float = None
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "products": len(self.df),
+            "source": self.source,
+            "source_sha256": self.source_sha256,
+            "load_seconds": round(self.load_seconds, 3),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def read_catalog_csv(csv_path: str) -> pd.DataFrame:
+    """Reads products.csv and normalizes its column names and ids."""
+    loaded_df = pd.read_csv(csv_path)
+    loaded_df.columns = [col.lower().replace(' ', '_') for col in loaded_df.columns]
+    if 'id' in loaded_df.columns:
+        loaded_df['id'] = pd.to_numeric(loaded_df['id'], errors='coerce').fillna(0).astype(int)
+    return loaded_df
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_posting_table(directory: str, name: str, table: dict):
+    """
+    Stores a text -> positions table as four flat arrays: the keys as one UTF-8 blob with
+    their character offsets, and all positions concatenated with each key's offsets.
+    """
+    keys = list(table)
+    key_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(key) for key in keys], out=key_offsets[1:])
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(table[key]) for key in keys], out=offsets[1:])
+    positions = np.concatenate([table[key] for key in keys]) if keys else np.empty(0, dtype=np.int32)
+
+    np.save(os.path.join(directory, f"{name}.keys.npy"), np.frombuffer(''.join(keys).encode('utf-8'), dtype=np.uint8))
+    np.save(os.path.join(directory, f"{name}.key_offsets.npy"), key_offsets)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}.positions.npy"), positions.astype(np.int32, copy=False))
+
+
+def _read_posting_table(directory: str, name: str) -> dict:
+    """Reverse of _write_posting_table. The positions stay memory-mapped; each key gets a read-only view."""
+    text = np.load(os.path.join(directory, f"{name}.keys.npy")).tobytes().decode('utf-8')
+    key_offsets = np.load(os.path.join(directory, f"{name}.key_offsets.npy")).tolist()
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy")).tolist()
+    positions = np.asarray(np.load(os.path.join(directory, f"{name}.positions.npy"), mmap_mode="r"))
+    if len(key_offsets) != len(offsets) or offsets[-1] != len(positions) or key_offsets[-1] != len(text):
+        raise ValueError(f"inconsistent posting table {name}")
+    return {
+        text[key_offsets[i]:key_offsets[i + 1]]: positions[offsets[i]:offsets[i + 1]]
+        for i in range(len(offsets) - 1)
+    }
+
+
+def _directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class CatalogManager:
+    """
+    Owns the current catalog and replaces it without stopping the app.
+
+    A (re)load parses the CSV and builds the CatalogIndex on the calling thread (the watcher
+    thread or the admin request), then publishes the result by swapping a single
+    CatalogSnapshot reference. Readers take `current` once per request and never see a
+    half-built catalog. on_swap(snapshot) runs after every swap (e.g. to invalidate caches).
+
+    After a CSV parse a snapshot is written to snapshot_dir/<CSV SHA-256>/: the products as
+    Parquet and the index's posting tables as .npy arrays. The next cold start reads that
+    instead (the positions memory-mapped) as long as the CSV's SHA-256 still matches.
+    Nothing in it is unpickled, so a snapshot directory cannot run code when it is loaded.
+    """
+
+    def __init__(self, csv_path: str, snapshot_dir: str = None, on_swap=None):
+        self.csv_path = csv_path
+        self.snapshot_dir = snapshot_dir
+        self.on_swap = on_swap
+        self._current = CatalogSnapshot(version=0, df=pd.DataFrame(), index=CatalogIndex(pd.DataFrame()))
+        self._load_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.last_error = None
+        self.reloads = 0
+
+    @property
+    def current(self) -> CatalogSnapshot:
+        return self._current
+
+    @property
+    def loaded(self) -> bool:
+        return self._current.version > 0
+
+    def ensure_loaded(self) -> dict:
+        """
+        Loads the catalog (from the snapshot when it is fresh) unless it has been loaded already.
+        Raises if the CSV cannot be read; the catalog then stays unloaded.
+        """
+        with self._load_lock:
+            if not self.loaded:
+                self._load(use_snapshot=True, keep_current_on_error=False)
+        return self._current.info()
+
+    def reload(self, csv_path: str = None) -> dict:
+        """
+        Re-reads the CSV and swaps the new catalog in. If the CSV cannot be read,
+        the catalog in use is kept and the error is raised.
+        """
+        with self._load_lock:
+            if csv_path:
+                self.csv_path = csv_path
+            self._load(use_snapshot=False, keep_current_on_error=True)
+            self.reloads += 1
+        return self._current.info()
+
+    def _load(self, use_snapshot: bool, keep_current_on_error: bool):
+        started = time.perf_counter()
+        try:
+            source_sha256 = file_sha256(self.csv_path)
+            loaded = self._read_snapshot(source_sha256) if use_snapshot else None
+            if loaded is not None:
+                df, index = loaded
+                source = "snapshot"
+            else:
+                df = read_catalog_csv(self.csv_path)
+                index = CatalogIndex(df)
+                source = "csv"
+                self._write_snapshot(source_sha256, df, index)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            if keep_current_on_error:
+                logger.error("Catalog reload from %s failed, keeping version %d: %s", self.csv_path, self._current.version, e)
+            elif isinstance(e, FileNotFoundError):
+                logger.error("products.csv not found at %s. Please ensure the file exists.", self.csv_path)
+            else:
+                logger.error("An error occurred while loading products.csv: %s", e)
+            # Nothing is published: an empty catalog must not count as loaded (startup stays failed, /api/ready 503)
+            raise
+
+        snapshot = self._publish(df, index, source, source_sha256, time.perf_counter() - started)
+        logger.info("Products loaded successfully from: %s (%s, %d products, version %d)", self.csv_path, source, len(df), snapshot.version)
+
+    def _publish(self, df: pd.DataFrame, index: CatalogIndex, source, source_sha256, load_seconds: float) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(
+            version=self._current.version + 1,
+            df=df,
+            index=index,
+            source=source,
+            source_sha256=source_sha256,
+            load_seconds=load_seconds,
+            loaded_at=time.time(),
+        )
+        self._current = snapshot
+        if self.on_swap is not None:
+            self.on_swap(snapshot)
+        return snapshot
+
+    def load_dataframe(self, df: pd.DataFrame) -> dict:
+        """Swaps in a catalog built in memory (e.g. a synthetic one for benchmarks) instead of the CSV."""
+        with self._load_lock:
+            started = time.perf_counter()
+            self._publish(df, CatalogIndex(df), "dataframe", None, time.perf_counter() - started)
+        return self._current.info()
+
+    def _read_snapshot(self, source_sha256: str):
+        if not self.snapshot_dir:
+            return None
+        path = os.path.join(self.snapshot_dir, source_sha256)
+        if not os.path.exists(os.path.join(path, SNAPSHOT_META_FILE)):
+            return None
+        try:
+            with open(os.path.join(path, SNAPSHOT_META_FILE), encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            if meta.get("format") != SNAPSHOT_FORMAT or meta.get("source_sha256") != source_sha256:
+                return None
+            df = pd.read_parquet(os.path.join(path, SNAPSHOT_PRODUCTS_FILE))
+            tables = {name: _read_posting_table(path, name) for name in POSTING_TABLES}
+            return df, CatalogIndex(df, posting_tables=tables)
+        except Exception as e:
+            logger.warning("Ignoring unreadable catalog snapshot %s: %s", path, e)
+            return None
+
+    def _write_snapshot(self, source_sha256: str, df: pd.DataFrame, index: CatalogIndex):
+        if not self.snapshot_dir:
+            return
+        path = os.path.join(self.snapshot_dir, source_sha256)
+        temp_path = os.path.join(self.snapshot_dir, f".{source_sha256}.{os.getpid()}.tmp")
+        try:
+            os.makedirs(temp_path, exist_ok=True)
+            with FILE_WRITE_SECONDS.labels("catalog_snapshot").time():
+                df.to_parquet(os.path.join(temp_path, SNAPSHOT_PRODUCTS_FILE), index=False)
+                for name, table in index.posting_tables().items():
+                    _write_posting_table(temp_path, name, table)
+                # Written last: a directory without it is never read
+                with open(os.path.join(temp_path, SNAPSHOT_META_FILE), 'w', encoding='utf-8') as meta_file:
+                    json.dump({"format": SNAPSHOT_FORMAT, "source_sha256": source_sha256, "products": len(df)}, meta_file)
+            FILE_WRITE_BYTES.labels("catalog_snapshot").inc(_directory_size(temp_path))
+            if os.path.exists(path):
+                shutil.rmtree(path)  # an older format, or a partial copy from another process
+            os.rename(temp_path, path)
+        except Exception as e:
+            logger.warning("Could not write catalog snapshot %s: %s", path, e)
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return
+        self._remove_stale_snapshots(keep=source_sha256)
+
+    def _remove_stale_snapshots(self, keep: str):
+        """Removes the snapshots of earlier CSV versions (temporary directories of running writes are left alone)."""
+        for name in os.listdir(self.snapshot_dir):
+            stale = os.path.join(self.snapshot_dir, name)
+            if name == keep or name.startswith('.') or not os.path.isdir(stale):
+                continue
+            try:
+                shutil.rmtree(stale)
+            except OSError as e:
+                logger.warning("Could not remove stale catalog snapshot %s: %s", stale, e)
+
+    def start_watching(self, interval_seconds: float):
+        """Polls the CSV every interval_seconds and reloads when its size or mtime changes."""
+        if interval_seconds <= 0 or self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval_seconds,), name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.csv_path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def _watch(self, interval_seconds: float):
+        seen = self._stat()
+        while not self._stop_watching.wait(interval_seconds):
+            stat = self._stat()
+            if stat is None or stat == seen:
+                continue
+            # Wait until the file stops changing, so a copy in progress is not loaded half-written
+            time.sleep(min(interval_seconds, 1.0))
+            if self._stat() != stat:
+                continue
+            try:
+                source_sha256 = file_sha256(self.csv_path)
+            except Exception as e:
+                # Replaced or removed meanwhile; the next poll looks again
+                logger.warning("Could not read catalog file %s: %s", self.csv_path, e)
+                continue
+            seen = stat
+            if self._current.source_sha256 == source_sha256:
+                continue
+            logger.info("Catalog file %s changed, reloading", self.csv_path)
+            try:
+                self.reload()
+            except Exception:
+                pass  # logged by _load; the previous catalog stays in use
+
+    def stats(self) -> dict:
+        return {
+            **self._current.info(),
+            "csv_path": self.csv_path,
+            "watching": self._watcher is not None,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+# Benchmark: cold start from the CSV (parse + index build) against loading the snapshot
+# (python -m nlp_engine.catalog_manager)
+if __name__ == "__main__":
+    import tempfile
+
+    print(f"{'products':>10} {'csv + build (s)':>16} {'snapshot (s)':>13} {'snapshot MB':>12}")
+    for num_products in (1000, 10000, 50000):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "products.csv")
+            snapshot_dir = os.path.join(directory, "snapshots")
+            make_synthetic_catalog(num_products).to_csv(csv_path, index=False)
+
+            cold = CatalogManager(csv_path, snapshot_dir)
+            cold.ensure_loaded()  # no snapshot yet: parses the CSV and writes one
+            warm = CatalogManager(csv_path, snapshot_dir)
+            warm.ensure_loaded()
+            assert warm.current.source == "snapshot"
+            snapshot_bytes = _directory_size(os.path.join(snapshot_dir, warm.current.source_sha256))
+            print(f"{num_products:>10} {cold.current.load_seconds:>16.2f} {warm.current.load_seconds:>13.2f} "
+                  f"{snapshot_bytes / 1e6:>12.1f}")
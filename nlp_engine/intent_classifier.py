@@ -0,0 +1,171 @@
+import re
+import time
+
+# Matching modes of a rule phrase:
+#   WORD   - the phrase must be a whole word/phrase ("hi" matches "hi there", not "this")
+#   PREFIX - the phrase must start a word but may be followed by more letters ("headphone" matches "headphones")
+WORD = "word"
+PREFIX = "prefix"
+
+# Intent names
+GREETING = "greeting"
+FAREWELL = "farewell"
+THANKS = "thanks"
+HOW_ARE_YOU = "how_are_you"
+JOKE = "joke"
+BOT_IDENTITY = "bot_identity"
+CAPABILITIES = "capabilities"
+WEATHER = "weather"
+NEWS = "news"
+ACKNOWLEDGEMENT = "acknowledgement"
+LIST_PRODUCTS = "list_products"
+GENERAL_KNOWLEDGE = "general_knowledge"
+PRODUCT_INDICATOR = "product_indicator"
+
+# (intent, priority, mode, phrases) - a lower priority number wins when several intents match
+INTENT_RULES = [
+    (GREETING, 1, WORD, ["hello", "hi", "hey"]),
+    (FAREWELL, 2, WORD, ["bye", "goodbye", "see you"]),
+    (THANKS, 3, WORD, ["thank you", "thanks", "i appreciate it"]),
+    (HOW_ARE_YOU, 4, WORD, ["how are you", "what's up"]),
+    (JOKE, 5, WORD, ["tell me a joke", "make me laugh"]),
+    (BOT_IDENTITY, 6, WORD, ["what is your name", "who are you"]),
+    (CAPABILITIES, 7, WORD, ["what can you do", "how can you help"]),
+    (WEATHER, 8, WORD, ["weather"]),
+    (NEWS, 9, WORD, ["news"]),
+    (ACKNOWLEDGEMENT, 10, WORD, ["ok", "okay", "alright", "sure", "fine"]),
+    (LIST_PRODUCTS, 11, PREFIX, ["what do you sell", "what products", "list products"]),
+    (GENERAL_KNOWLEDGE, 20, PREFIX, [
+        "what is the capital of", "tell me about", "who is", "what is", "where is", "when is",
+        "define", "explain", "meaning of", "about", "information about", "general knowledge",
+        "history of", "how does", "why does", "what are", "how do i", "can you tell me",
+        "tell me something about", "can you explain", "give me details on", "facts about",
+        "meaning of life", "universe", "science", "mathematics", "philosophy", "art", "music",
+        "geography", "politics", "current events", "celebrity", "biography", "recipe", "tutorial",
+        "how to make", "what should i do", "advice", "opinion on", "what about", "is it true",
+        "how far", "how many", "what year", "what kind of animal", "who invented", "what's the weather", "latest news",
+    ]),
+    (PRODUCT_INDICATOR, 21, PREFIX, [
+        "product", "item", "device", "gadget", "appliance", "tool", "accessory", "component", "part",
+        "shaver", "watch", "lamp", "chair", "speaker", "earbuds", "headphone", "charger", "cable",
+        "monitor", "keyboard", "mouse", "camera", "tablet", "phone", "tv", "router", "printer",
+        "console", "game", "software", "application", "program", "operating system",
+        "subscription", "service", "plan", "membership", "license",
+        "price", "cost", "value", "rate", "fee", "buy", "sell", "purchase", "order", "acquire", "obtain", "checkout",
+        "available", "stock", "in stock", "out of stock", "shipping", "delivery", "return", "refund", "exchange",
+        "category", "section", "department", "type of", "kind of", "line of", "collection",
+        "electronics", "beauty", "health", "smart home", "furniture", "audio", "video", "computing", "gaming",
+        "apparel", "clothing", "shoes", "jewelry", "fashion", "accessories", "wearable",
+        "home goods", "kitchen", "outdoor", "sports", "fitness", "books", "media", "entertainment",
+        "show me", "looking for", "need a", "do you have", "find me", "recommend", "suggest",
+        "details about", "information on", "specifications", "features", "description", "dimensions", "weight", "material", "color", "size",
+        "how much", "what is the price", "can i buy", "where can i find", "want to buy", "looking to buy",
+        "model", "brand", "version", "series", "type", "compatible with", "warranty", "guarantee", "support",
+    ]),
+]
+
+_WORD_CHAR = re.compile(r'\w')
+
+
+class IntentClassifier:
+    """
+    Matches a message against every rule phrase in a single pass.
+
+    All phrases are compiled into one regex shaped like a trie, so at each word start the
+    regex follows at most one branch and captures the longest phrase that matches there.
+    Shorter phrases matching at the same position are always prefixes of that longest
+    phrase, so they are looked up from a precomputed table instead of rescanning.
+    """
+
+    def __init__(self, rules=INTENT_RULES):
+        self.priorities = {}
+        self._rules_by_phrase = {}
+        for intent, priority, mode, phrases in rules:
+            self.priorities[intent] = priority
+            for phrase in phrases:
+                self._rules_by_phrase.setdefault(phrase.lower(), []).append((intent, mode))
+
+        phrases = list(self._rules_by_phrase)
+        # phrase -> every rule phrase that is a prefix of it (itself included)
+        self._phrases_at_same_start = {
+            phrase: [other for other in phrases if phrase.startswith(other)]
+            for phrase in phrases
+        }
+        self._pattern = re.compile(r'\b(?=(' + self._trie_pattern(self._build_trie(phrases)) + '))')
+
+    def _build_trie(self, phrases):
+        root = {}
+        for phrase in phrases:
+            node = root
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[None] = phrase
+        return root
+
+    def _trie_pattern(self, node):
+        alternatives = [re.escape(char) + self._trie_pattern(child) for char, child in sorted(node.items(), key=lambda item: item[0] or '') if char is not None]
+        if None in node:
+            modes = {mode for intent, mode in self._rules_by_phrase[node[None]]}
+            # Longer phrases are tried first; the phrase itself is the last alternative
+            alternatives.append('' if PREFIX in modes else r'\b')
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return '(?:' + '|'.join(alternatives) + ')'
+
+    def match(self, message_lower: str) -> dict:
+        """Returns {intent: priority} for every rule class that matches the (lowercased) message."""
+        matched = {}
+        for found in self._pattern.finditer(message_lower):
+            start = found.start(1)
+            for phrase in self._phrases_at_same_start[found.group(1)]:
+                end = start + len(phrase)
+                whole_word = end == len(message_lower) or not _WORD_CHAR.match(message_lower, end)
+                for intent, mode in self._rules_by_phrase[phrase]:
+                    if intent not in matched and (mode == PREFIX or whole_word):
+                        matched[intent] = self.priorities[intent]
+        return matched
+
+    def classify(self, message_lower: str) -> list:
+        """Returns the matched intents, highest priority (lowest number) first."""
+        matched = self.match(message_lower)
+        return sorted(matched, key=matched.get)
+
+
+intent_classifier = IntentClassifier()
+
+
+def classify_intents(message_lower: str) -> list:
+    return intent_classifier.classify(message_lower)
+
+
+def _substring_scan(message_lower, rules=INTENT_RULES):
+    """The previous approach: an `in` test per phrase, with no word boundaries."""
+    return [intent for intent, priority, mode, phrases in rules if any(phrase in message_lower for phrase in phrases)]
+
+
+# Micro-benchmark: messages/sec of the compiled matcher against per-phrase substring tests
+# (python -m nlp_engine.intent_classifier)
+if __name__ == "__main__":
+    messages = [
+        "hi there",
+        "this book is ok",
+        "what do you sell",
+        "how much is the wireless headphone",
+        "tell me about the history of rome",
+        "i am looking for a smart lamp for my kitchen",
+        "do you have the black leather office chair in stock",
+        "can you explain the warranty on the 4k monitor",
+        "thanks, that is all for today",
+        "what is the price of the premium noise cancelling earbuds with charging case",
+    ]
+    rounds = 20000
+    for name, function in (("substring scan", _substring_scan), ("compiled matcher", intent_classifier.classify)):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for message in messages:
+                function(message)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>17}: {rounds * len(messages) / elapsed:,.0f} messages/sec")
+
+    for message in messages:
+        print(f"{message!r}: {classify_intents(message)}")
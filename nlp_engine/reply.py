@@ -0,0 +1,96 @@
+from dataclasses import dataclass, asdict
+
+import pandas as pd
+
+# Reply intents produced by the response engine, in addition to the rule intents of intent_classifier
+PRODUCT_MATCH = "product_match"
+TITLE_MATCH = "title_match"
+TITLE_NOT_FOUND = "title_not_found"
+NEEDS_DETAILS = "needs_details"
+CATEGORY_LISTING = "category_listing"
+GENERAL_KNOWLEDGE_REFUSAL = "general_knowledge_refusal"
+FALLBACK = "fallback"
+
+# Number of related products read out by the spoken summary (kept short for TTS)
+SPOKEN_RELATED_PRODUCTS = 2
+
+
+def _plain(value):
+    """Converts numpy scalars to Python values and missing values to None (JSON- and hash-friendly)."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+@dataclass(frozen=True)
+class ProductSummary:
+    """The fields of a catalog product that replies show or speak."""
+    id: int
+    title: str
+    price: object
+    category: str = None
+    url: str = None
+    image_url: str = None
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            id=_plain(row.get('id')),
+            title=_plain(row.get('title')) or '',
+            price=_plain(row.get('price')),
+            category=_plain(row.get('category')),
+            url=_plain(row.get('url')),
+            image_url=_plain(row.get('image-url')),
+        )
+
+    def spoken(self) -> str:
+        text = f"{self.title}"
+        if self.price is not None:
+            text += f", price {self.price} dollars"
+        return text
+
+
+@dataclass(frozen=True)
+class ChatReply:
+    """
+    Result of the response engine.
+    `reply` is what the chat shows (an HTML card for product results, plain text otherwise);
+    the structured fields let callers build speech or JSON without parsing that HTML.
+    """
+    intent: str
+    reply: str
+    products: tuple = ()
+    related: tuple = ()
+    category: str = None
+
+    @property
+    def product_ids(self) -> list:
+        return [product.id for product in self.products]
+
+    @property
+    def related_ids(self) -> list:
+        return [product.id for product in self.related]
+
+    def spoken_text(self) -> str:
+        """Short summary of the reply for text-to-speech."""
+        if self.intent == CATEGORY_LISTING:
+            items = "; ".join(product.spoken() for product in self.products[:SPOKEN_RELATED_PRODUCTS])
+            return f"In the {self.category} category, we have {items}."
+
+        if not self.products:
+            return self.reply
+
+        summary = self.products[0].spoken() + "."
+        related = [product.spoken() for product in self.related[:SPOKEN_RELATED_PRODUCTS] if product.title]
+        if related:
+            summary += " Related products: " + "; ".join(related) + "."
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "intent": self.intent,
+            "reply": self.reply,
+            "products": [asdict(product) for product in self.products],
+            "related": [asdict(product) for product in self.related],
+            "category": self.category,
+        }
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_message(message: str) -> str:
+    """Lowercases the message and collapses whitespace, so trivially different messages share a cache entry."""
+    return " ".join(message.lower().split())
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live for generated replies.
+    Keeps hit/miss/eviction counters for monitoring.
+    """
+
+    def __init__(self, capacity: int = 2048, ttl_seconds: float = 0):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,67 +1,141 @@
 import pandas as pd
-import os
 import re
 import random
-
-PRODUCTS_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data/products.csv')
+from functools import lru_cache
+
+from nlp_engine.catalog_index import CatalogIndex, get_keywords_from_text
+from nlp_engine.catalog_manager import CatalogManager
+from nlp_engine import intent_classifier as intents
+from nlp_engine.response_cache import ResponseCache, normalize_message
+from nlp_engine.reply import (
+    ChatReply, ProductSummary, PRODUCT_MATCH, TITLE_MATCH, TITLE_NOT_FOUND, NEEDS_DETAILS,
+    CATEGORY_LISTING, GENERAL_KNOWLEDGE_REFUSAL, FALLBACK,
+)
+import config
+from utils.metrics import CHAT_REPLIES, STAGE_SECONDS
+
+PRODUCTS_CSV_PATH = config.PRODUCTS_CSV_PATH
+
+# Whole uncached reply / index lookups only / product card and related list
+NLP_REPLY_SECONDS = STAGE_SECONDS.labels("nlp_reply")
+CATALOG_SEARCH_SECONDS = STAGE_SECONDS.labels("catalog_search")
+RESPONSE_FORMAT_SECONDS = STAGE_SECONDS.labels("response_format")
+
+# Normalized message -> reply, shared by the /chat endpoints
+response_cache = ResponseCache(capacity=config.RESPONSE_CACHE_SIZE, ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS)
+
+# The catalog in use. build_reply reads catalog_manager.current once per message, so a reload
+# never mixes two catalogs in one reply; these module names mirror it for other callers.
 products_df = pd.DataFrame()
+catalog_index = CatalogIndex(products_df)
+# Incremented on every catalog load; cached replies of older versions are never served
+catalog_version = 0
 
-try:
-    products_df = pd.read_csv(PRODUCTS_CSV_PATH)
-    print(f"Products loaded successfully from: {PRODUCTS_CSV_PATH}")
-    products_df.columns = [col.lower().replace(' ', '_') for col in products_df.columns]
-    if 'id' in products_df.columns:
-        products_df['id'] = pd.to_numeric(products_df['id'], errors='coerce').fillna(0).astype(int)
-
-except FileNotFoundError:
-    print(f"Error: products.csv not found at {PRODUCTS_CSV_PATH}. Please ensure the file exists.")
-except Exception as e:
-    print(f"An error occurred while loading products.csv: {e}")
-
-def get_keywords_from_text(text):
-    """Extracs alphanumeric words from a string and converts to lowercase."""
-    if pd.isna(text):
-        return []
-    return re.findall(r'\b\w+\b', str(text).lower())
+
+def _on_catalog_swap(snapshot):
+    global products_df, catalog_index, catalog_version
+    products_df = snapshot.df
+    catalog_index = snapshot.index
+    catalog_version = snapshot.version
+    response_cache.clear()
+
+
+catalog_manager = CatalogManager(PRODUCTS_CSV_PATH, config.CATALOG_SNAPSHOT_DIR, on_swap=_on_catalog_swap)
+
+
+def load_products_catalog(csv_path: str = PRODUCTS_CSV_PATH) -> dict:
+    """
+    Reads products.csv, rebuilds the catalog index, swaps it in and invalidates cached replies.
+    If the file cannot be read the catalog in use is kept and the error is raised.
+    """
+    return catalog_manager.reload(csv_path)
+
+
+def ensure_catalog_loaded() -> dict:
+    """
+    Loads the catalog unless it has been loaded already (from the prebuilt snapshot when it is fresh).
+    The app loads it in the background at startup (see main.py); scripts get it on first use.
+    """
+    return catalog_manager.ensure_loaded()
+
+# Fixed replies of the rule-based conversational intents
+RULE_REPLIES = {
+    intents.GREETING: "Hello! How can I assist you with our products today?",
+    intents.FAREWELL: "Goodbye! Feel free to ask if you have more questions later.",
+    intents.THANKS: "You're most welcome! Is there anything else I can help you with regarding our products?",
+    intents.HOW_ARE_YOU: "I'm just a bot, but I'm ready to help you with product information! How can I assist you today!",
+    intents.JOKE: "Why don't scientists trust atoms? Because they make up everything!",
+    intents.BOT_IDENTITY: "I am an AI Assistant designed to help you with product inquiries. How can I assist you today?",
+    intents.CAPABILITIES: "I can provide information about our products, including their prices, categories, descriptions, images, and links. Just ask me about a product!",
+    intents.WEATHER: "I'm sorry, I don't have access to real-time weather information. My focus is on product assistance.",
+    intents.NEWS: "I don't have access to current news. I'm here to help with our products. Is there anything I can assist you with?",
+    intents.ACKNOWLEDGEMENT: "Okay. Is there something specific you're looking for?",
+}
+GENERAL_KNOWLEDGE_REPLY = "I'm sorry, I specialize in providing information about our products and services. I cannot answer general knowledge questions. Is there anything product-related I can assist you with?"
+NEEDS_DETAILS_REPLY = "Could you please be more specific about the product you are looking for?"
+FALLBACK_REPLY = "I'm sorry, I don't have information about that. I can help with product-related questions. Can you tell me what product you're interested in?"
+
+def canned_replies() -> list:
+    """Every fixed reply text the engine can return (used to pre-render their audio)."""
+    return list(RULE_REPLIES.values()) + [GENERAL_KNOWLEDGE_REPLY, NEEDS_DETAILS_REPLY, FALLBACK_REPLY]
+
+def build_cached_reply(message: str) -> ChatReply:
+    """
+    Same as build_reply, but repeated messages are answered from the response cache.
+    Messages are normalized (lowercase, single spaces) and keyed together with the catalog version.
+
+    The reply is built from the normalized message too, i.e. it equals
+    build_reply(normalize_message(message)). build_reply only looks at the lowercased text, but
+    its phrase and category checks are sensitive to spacing; building from the original message
+    would make the cached reply depend on which spelling of the message happened to come first.
+    """
+    if not catalog_manager.loaded:
+        ensure_catalog_loaded()
+
+    catalog = catalog_manager.current
+    normalized_message = normalize_message(message)
+    cache_key = (catalog.version, normalized_message)
+    reply = response_cache.get(cache_key)
+    if reply is None:
+        with NLP_REPLY_SECONDS.time():
+            reply = build_reply(normalized_message, catalog)
+        response_cache.put(cache_key, reply)
+    CHAT_REPLIES.labels(reply.intent).inc()
+    return reply
 
 def generate_response(message: str) -> str:
+    """Returns the text (or product card HTML) the chat shows for a message."""
+    return build_reply(message).reply
+
+def build_reply(message: str, catalog=None) -> ChatReply:
+    if catalog is None:
+        if not catalog_manager.loaded:
+            ensure_catalog_loaded()
+        catalog = catalog_manager.current
+    # One consistent catalog for the whole reply, even if a reload swaps in a new one meanwhile
+    products_df, catalog_index = catalog.df, catalog.index
+
     message_lower = message.lower()
     message_words = get_keywords_from_text(message_lower)
 
-    # --- 1. Handle General Greetings and Farewell messages ---
-    if "hello" in message_lower or "hi" in message_lower or "hey" in message_lower:
-        return "Hello! How can I assist you with our products today?"
-    if "bye" in message_lower or "goodbye" in message_lower or "see you" in message_lower:
-        return "Goodbye! Feel free to ask if you have more questions later."
-
-    # --- 2. Handle simple Conversational / Non-Product-Related messages (prioritize these) ---
-    if "thank you" in message_lower or "thanks" in message_lower or "i appreciate it" in message_lower:
-        return "You're most welcome! Is there anything else I can help you with regarding our products?"
-    if "how are you" in message_lower or "what's up" in message_lower:
-        return "I'm just a bot, but I'm ready to help you with product information! How can I assist you today!"
-    if "tell me a joke" in message_lower or "make me laugh" in message_lower:
-        return "Why don't scientists trust atoms? Because they make up everything!"
-    if "what is your name" in message_lower or "who are you" in message_lower:
-        return "I am an AI Assistant designed to help you with product inquiries. How can I assist you today?"
-    if "what can you do" in message_lower or "how can you help" in message_lower:
-        return "I can provide information about our products, including their prices, categories, descriptions, images, and links. Just ask me about a product!"
-    if "weather" in message_lower:
-        return "I'm sorry, I don't have access to real-time weather information. My focus is on product assistance."
-    if "news" in message_lower:
-        return "I don't have access to current news. I'm here to help with our products. Is there anything I can assist you with?"
-    if "ok" in message_lower or "okay" in message_lower or "alright" in message_lower or "sure" in message_lower or "fine" in message_lower:
-        return "Okay. Is there something specific you're looking for?"
+    # Every rule class is matched in one pass; the highest priority class decides steps 1-3
+    matched_intents = intents.classify_intents(message_lower)
+    top_intent = matched_intents[0] if matched_intents else None
+
+    # --- 1-2. Handle Greetings, Farewells and simple Conversational / Non-Product-Related messages ---
+    if top_intent in RULE_REPLIES:
+        return ChatReply(intent=top_intent, reply=RULE_REPLIES[top_intent])
 
     # --- 3. Handle explicit "list products" requests ---
-    if "what do you sell" in message_lower or "what products" in message_lower or "list products" in message_lower:
+    if top_intent == intents.LIST_PRODUCTS:
         if not products_df.empty:
             categories = products_df['category'].dropna().unique().tolist()
             if categories:
-                return f"We sell a variety of products, including items in categories like: {', '.join(categories)}. What are you interested in?"
+                return ChatReply(intent=top_intent, reply=f"We sell a variety of products, including items in categories like: {', '.join(categories)}. What are you interested in?")
             else:
-                return "I don't have categories defined, but I can tell you about specific products if you ask."
+                return ChatReply(intent=top_intent, reply="I don't have categories defined, but I can tell you about specific products if you ask.")
         else:
-            return "I'm sorry, I don't have product information available at the moment."
+            return ChatReply(intent=top_intent, reply="I'm sorry, I don't have product information available at the moment.")
     
     # --- 4. Handle Specific "I want/need a [Product Name]" Intent (Title Only Search with Best Match) ---
     product_request_phrases = ["i want a ", "i need a ", "i'm looking for a ", "find me a "] # Expanded phrases
@@ -80,82 +154,31 @@ def generate_response(message: str) -> str:
     if is_specific_title_search_intent and requested_product_name:
         common_nouns_that_could_be_product_names = {"item", "product", "device", "thing", "something", "any"} # Expanded
         if requested_product_name in common_nouns_that_could_be_product_names:
-            return "Could you please be more specific about the product you are looking for?"
+            return ChatReply(intent=NEEDS_DETAILS, reply=NEEDS_DETAILS_REPLY)
 
+        # Exact / prefix / whole-word / substring tiers over the precomputed title index
         best_title_match_product = None
-        highest_title_match_score = -1
-
-        escaped_requested_name = re.escape(requested_product_name)
-        # Try to find the best match based on title
-        for index, row in products_df.iterrows():
-            product_title_lower = str(row.get('title', '')).lower()
-            current_score = 0
-
-            # 1. Exact title match (highest score)
-            if product_title_lower == requested_product_name:
-                current_score = 1000
-            # 2. Starts with the requested name
-            elif product_title_lower.startswith(requested_product_name):
-                current_score = 500 + (len(requested_product_name) / max(1, len(product_title_lower))) * 100 # Closer to full title is better
-            # 3. Contains as a whole word
-            elif re.search(r'\b' + escaped_requested_name + r'\b', product_title_lower):
-                current_score = 300 + (len(requested_product_name) / max(1, len(product_title_lower))) * 50 # Longer match in shorter title
-            # 4. Contains as a substring
-            elif requested_product_name in product_title_lower:
-                current_score = 100 + (len(requested_product_name) / max(1, len(product_title_lower))) * 20 # Basic substring match
-
-            if current_score > highest_title_match_score:
-                highest_title_match_score = current_score
-                best_title_match_product = row
-            # If scores are equal, prefer shorter title (often more direct)
-            elif current_score == highest_title_match_score and best_title_match_product is not None:
-                if len(product_title_lower) < len(str(best_title_match_product.get('title', '')).lower()):
-                    best_title_match_product = row
-
+        with CATALOG_SEARCH_SECONDS.time():
+            best_title_position, highest_title_match_score = catalog_index.best_title_match(requested_product_name)
+        if best_title_position is not None:
+            best_title_match_product = catalog_index.product_at(best_title_position)
 
         if best_title_match_product is not None and highest_title_match_score >= 100: # Minimum score to consider a good title match
             # If a best match is found, use the standard product formatting function
-            return format_product_response(best_title_match_product, products_df, message_lower)
+            with RESPONSE_FORMAT_SECONDS.time():
+                return format_product_response(best_title_match_product, catalog_index, TITLE_MATCH)
         else:
             # If no good title match found, provide a specific fallback
-            return f"I'm sorry, I couldn't find a direct match for '{requested_product_name}' in our product titles. Please try a different name or a more general search, or specify an ID if you know it."
+            return ChatReply(intent=TITLE_NOT_FOUND, reply=f"I'm sorry, I couldn't find a direct match for '{requested_product_name}' in our product titles. Please try a different name or a more general search, or specify an ID if you know it.")
 
     # --- 5. General Knowledge Query Check (with rule-based fallback) ---
-    general_knowledge_phrases = [
-        "what is the capital of", "tell me about", "who is", "what is", "where is", "when is",
-        "define", "explain", "meaning of", "about", "information about", "general knowledge",
-        "history of", "how does", "why does", "what are", "how do i", "can you tell me",
-        "tell me something about", "can you explain", "give me details on", "facts about",
-        "meaning of life", "universe", "science", "mathematics", "philosophy", "art", "music",
-        "geography", "politics", "current events", "celebrity", "biography", "recipe", "tutorial",
-        "how to make", "what should i do", "advice", "opinion on", "what about", "is it true",
-        "how far", "how many", "what year", "what kind of animal", "who invented", "what's the weather", "latest news"
-    ]
-    is_general_knowledge_query = any(phrase in message_lower for phrase in general_knowledge_phrases)
-
-    product_indicators = [
-        "product", "item", "device", "gadget", "appliance", "tool", "accessory", "component", "part",
-        "shaver", "watch", "lamp", "chair", "speaker", "earbuds", "headphone", "charger", "cable",
-        "monitor", "keyboard", "mouse", "camera", "tablet", "phone", "tv", "router", "printer",
-        "console", "game", "software", "application", "program", "operating system",
-        "subscription", "service", "plan", "membership", "license",
-        "price", "cost", "value", "rate", "fee", "buy", "sell", "purchase", "order", "acquire", "obtain", "checkout",
-        "available", "stock", "in stock", "out of stock", "shipping", "delivery", "return", "refund", "exchange",
-        "category", "section", "department", "type of", "kind of", "line of", "collection",
-        "electronics", "beauty", "health", "smart home", "furniture", "audio", "video", "computing", "gaming",
-        "apparel", "clothing", "shoes", "jewelry", "fashion", "accessories", "wearable",
-        "home goods", "kitchen", "outdoor", "sports", "fitness", "books", "media", "entertainment",
-        "show me", "looking for", "need a", "do you have", "find me", "recommend", "suggest",
-        "details about", "information on", "specifications", "features", "description", "dimensions", "weight", "material", "color", "size",
-        "how much", "what is the price", "can I buy", "where can I find", "want to buy", "looking to buy",
-        "model", "brand", "version", "series", "type", "compatible with", "warranty", "guarantee", "support"
-    ]
-    has_strong_product_indicator = any(indicator in message_lower for indicator in product_indicators)
+    is_general_knowledge_query = intents.GENERAL_KNOWLEDGE in matched_intents
+    has_strong_product_indicator = intents.PRODUCT_INDICATOR in matched_intents
 
     # If it's a general knowledge query AND lacks strong product indicators, provide rule-based fallback
     if is_general_knowledge_query and not has_strong_product_indicator:
         # Fallback to a rule-based response for general knowledge questions
-        return "I'm sorry, I specialize in providing information about our products and services. I cannot answer general knowledge questions. Is there anything product-related I can assist you with?"
+        return ChatReply(intent=GENERAL_KNOWLEDGE_REFUSAL, reply=GENERAL_KNOWLEDGE_REPLY)
 
 
     # --- 6. General Product Search (by ID, Title, Description, Variation scoring) ---
@@ -167,83 +190,71 @@ def generate_response(message: str) -> str:
     if id_match:
         try:
             product_id = int(id_match.group(1))
-            found_by_id = products_df[products_df['id'] == product_id]
-            if not found_by_id.empty:
-                best_match_product = found_by_id.iloc[0]
+            id_position = catalog_index.position_for_id(product_id)
+            if id_position is not None:
+                best_match_product = catalog_index.product_at(id_position)
                 max_score = 1000 # Very high score for exact ID match
         except ValueError:
             pass
 
     # Score based on keyword overlap (Title, Description, Variation) if no strong ID match yet
     if best_match_product is None:
-        for index, row in products_df.iterrows():
-            current_score = 0
-            product_keywords_for_scoring = []
-
-            if pd.notna(row.get('title')):
-                title_lower = str(row['title']).lower()
-                if title_lower in message_lower:
-                    current_score += 100
-                product_keywords_for_scoring.extend(get_keywords_from_text(title_lower))
-
-            if pd.notna(row.get('description')):
-                product_keywords_for_scoring.extend(get_keywords_from_text(row['description']))
-
-            if pd.notna(row.get('variation')):
-                variation_lower = str(row['variation']).lower()
-                if variation_lower in message_lower:
-                    current_score += 50
-                product_keywords_for_scoring.extend(get_keywords_from_text(variation_lower))
-            
-            overlap_words = set(message_words) & set(product_keywords_for_scoring)
-            current_score += len(overlap_words) * 10
-
-            if current_score > max_score:
-                max_score = current_score
-                best_match_product = row
+        with CATALOG_SEARCH_SECONDS.time():
+            best_position, max_score = catalog_index.best_keyword_match(message_lower, message_words)
+        if best_position is not None:
+            best_match_product = catalog_index.product_at(best_position)
 
     # --- Generate response based on found product or related products from general search ---
     if best_match_product is not None and max_score >= 20: # Adjusted threshold for stronger product relevance
-        return format_product_response(best_match_product, products_df, message_lower)
+        with RESPONSE_FORMAT_SECONDS.time():
+            return format_product_response(best_match_product, catalog_index, PRODUCT_MATCH)
     
     # --- 7. Search by Category (if no specific product found with high score) ---
     for category in products_df['category'].dropna().unique():
         if category.lower() in message_lower:
             category_products = products_df[products_df['category'].str.lower() == category.lower()]
             if not category_products.empty:
-                top_category_products = category_products.head(6) # Display up to 6 products
+                top_category_products = tuple(ProductSummary.from_row(prod) for i, prod in category_products.head(6).iterrows()) # Display up to 6 products
                 response_html_parts = [f"<p class='category-heading'>In the '{category}' category, we have several items. Here are a few:</p>"]
                 response_html_parts.append("<div class='product-list'>")
-                for i, prod in top_category_products.iterrows():
-                    prod_title_html = ""
-                    if pd.notna(prod.get('url')):
-                        prod_title_html = f"<a href='{prod['url']}' target='_blank' class='product-item-title'>{prod['title']}</a>"
-                    else:
-                        prod_title_html = f"<span class='product-item-title'>{prod['title']}</span>"
-                    
-                    prod_image_html = ""
-                    if pd.notna(prod.get('image-url')): # Changed from 'image-url' to 'image-url'
-                        prod_image_html = f"<img src='{prod['image-url']}' alt='{prod['title']}' class='product-thumbnail'>"
-                    else:
-                        prod_image_html = f"<img src='https://placehold.co/90x90/E0E0E0/6C757D?text=No+Image' alt='No image' class='product-thumbnail'>"
-                    
-                    prod_info_html = (
-                        f"<div class='product-item'>"
-                        f"{prod_image_html}"
-                        f"{prod_title_html}"
-                        f"<p class='product-item-price'>${prod['price']}</p>"
-                        f"</div>"
-                    )
-                    response_html_parts.append(prod_info_html)
+                response_html_parts.extend(render_product_item(prod) for prod in top_category_products)
                 response_html_parts.append("</div>")
-                return "\n".join(response_html_parts).strip()
+                return ChatReply(
+                    intent=CATEGORY_LISTING,
+                    reply="\n".join(response_html_parts).strip(),
+                    products=top_category_products,
+                    category=category,
+                )
     
     # --- 8. Final Fallback for unhandled queries ---
-    return "I'm sorry, I don't have information about that. I can help with product-related questions. Can you tell me what product you're interested in?"
+    return ChatReply(intent=FALLBACK, reply=FALLBACK_REPLY)
+
+
+@lru_cache(maxsize=4096)
+def render_product_item(prod: ProductSummary) -> str:
+    """HTML fragment of a product in a product list. Cached per product summary."""
+    if prod.url is not None:
+        prod_title_html = f"<a href='{prod.url}' target='_blank' class='product-item-title'>{prod.title}</a>"
+    else:
+        prod_title_html = f"<span class='product-item-title'>{prod.title}</span>"
+
+    if prod.image_url is not None:
+        prod_image_html = f"<img src='{prod.image_url}' alt='{prod.title}' class='product-thumbnail'>"
+    else:
+        prod_image_html = f"<img src='https://placehold.co/90x90/E0E0E0/6C757D?text=No+Image' alt='No image' class='product-thumbnail'>"
 
+    return (
+        f"<div class='product-item'>"
+        f"{prod_image_html}"
+        f"{prod_title_html}"
+        f"<p class='product-item-price'>${prod.price}</p>"
+        f"</div>"
+    )
 
-def format_product_response(product_row, all_products_df, message_lower):
-    """Helper function to format the response for a found product."""
+
+@lru_cache(maxsize=4096)
+def render_product_card(product: ProductSummary) -> str:
+    """HTML fragment of the main product card. Cached per product summary."""
     response_html_parts = []
     
     # Product Card for the main found product
@@ -251,116 +262,54 @@ def format_product_response(product_row, all_products_df, message_lower):
     response_html_parts.append("<p class='product-card-main-heading'>We found:</p>")
     response_html_parts.append("<div class='product-main-details'>")
 
-    if pd.notna(product_row.get('image-url')): # Changed from 'image-url' to 'image-url'
-        response_html_parts.append(f"<img src='{product_row['image-url']}' alt='{product_row['title']}' class='product-main-image'>")
+    if product.image_url is not None:
+        response_html_parts.append(f"<img src='{product.image_url}' alt='{product.title}' class='product-main-image'>")
     else:
         response_html_parts.append(f"<img src='https://placehold.co/120x120/E0E0E0/6C757D?text=No+Image' alt='No image' class='product-main-image'>")
 
     response_html_parts.append("<div class='main-product-info'>")
     
-    if pd.notna(product_row.get('url')):
-        response_html_parts.append(f"<a href='{product_row['url']}' target='_blank' class='product-title-link'>{product_row['title']}</a>")
+    if product.url is not None:
+        response_html_parts.append(f"<a href='{product.url}' target='_blank' class='product-title-link'>{product.title}</a>")
     else:
-        response_html_parts.append(f"<span class='product-title-text'>{product_row['title']}</span>")
+        response_html_parts.append(f"<span class='product-title-text'>{product.title}</span>")
     
-    response_html_parts.append(f"<p class='product-price'>${product_row['price']}</p>")
-    response_html_parts.append(f"<p class='product-category'>Category: {product_row['category']}</p>")
+    response_html_parts.append(f"<p class='product-price'>${product.price}</p>")
+    response_html_parts.append(f"<p class='product-category'>Category: {product.category}</p>")
     response_html_parts.append("</div></div></div>")
+    return "\n".join(response_html_parts)
+
+
+def format_product_response(product_row, catalog_index, intent=PRODUCT_MATCH) -> ChatReply:
+    """Helper function to build the reply for a found product of catalog_index (the reply's catalog snapshot)."""
+    product = ProductSummary.from_row(product_row)
+    response_html_parts = [render_product_card(product)]
 
     # Find related products
-    related_products = find_related_products(product_row, all_products_df, num_results=6) # Display up to 6 related products
+    related_products = tuple(ProductSummary.from_row(prod) for prod in find_related_products(product_row, catalog_index, num_results=6)) # Display up to 6 related products
     
     if related_products:
         response_html_parts.append("<p class='related-products-heading'>Perhaps you'd also be interested in these related items:</p>")
         response_html_parts.append("<div class='product-list'>")
-        
-        for i, prod in enumerate(related_products):
-            prod_title_html = ""
-            if pd.notna(prod.get('url')):
-                prod_title_html = f"<a href='{prod['url']}' target='_blank' class='product-item-title'>{prod['title']}</a>"
-            else:
-                prod_title_html = f"<span class='product-item-title'>{prod['title']}</span>"
-            
-            prod_image_html = ""
-            if pd.notna(prod.get('image-url')): # Changed from 'image-url' to 'image-url'
-                prod_image_html = f"<img src='{prod['image-url']}' alt='{prod['title']}' class='product-thumbnail'>"
-            else:
-                prod_image_html = f"<img src='https://placehold.co/90x90/E0E0E0/6C757D?text=No+Image' alt='No image' class='product-thumbnail'>"
-            
-            prod_info_html = (
-                f"<div class='product-item'>"
-                f"{prod_image_html}"
-                f"{prod_title_html}"
-                f"<p class='product-item-price'>${prod['price']}</p>"
-                f"</div>"
-            )
-            response_html_parts.append(prod_info_html)
+        response_html_parts.extend(render_product_item(prod) for prod in related_products)
         response_html_parts.append("</div>")
     
-    return "\n".join(response_html_parts).strip()
+    return ChatReply(
+        intent=intent,
+        reply="\n".join(response_html_parts).strip(),
+        products=(product,),
+        related=related_products,
+    )
 
 
-def find_related_products(main_product, all_products_df, num_results=6): # Adjusted num_results to 6
+def find_related_products(main_product, catalog_index, num_results=6): # Adjusted num_results to 6
     """
     Finds related products based on category, and then by shared keywords.
     Excludes the main_product itself.
+    The related list of each product is computed once by the catalog index and reused, so callers
+    pass the index of the snapshot the main product came from (never a freshly built one).
     """
-    related = []
-    
-    # Try to find products in the same category first
-    if pd.notna(main_product.get('category')):
-        same_category_products = all_products_df[
-            (all_products_df['category'].str.lower() == main_product['category'].lower()) &
-            (all_products_df['id'] != main_product['id'])
-        ]
-        related.extend(same_category_products.head(num_results).to_dict('records'))
-
-    # If not enough, try to find based on shared keywords in title/description/variation
-    if len(related) < num_results:
-        main_product_keywords = set()
-        if pd.notna(main_product.get('title')):
-            main_product_keywords.update(get_keywords_from_text(main_product['title']))
-        if pd.notna(main_product.get('description')):
-            main_product_keywords.update(get_keywords_from_text(main_product['description']))
-        if pd.notna(main_product.get('variation')):
-            main_product_keywords.update(get_keywords_from_text(main_product['variation']))
-        
-        common_words = {'a', 'an', 'the', 'is', 'it', 'for', 'with', 'and', 'or', 'of', 'in', 'on', 'to', 'from', 'by', 'as', 'are'}
-        main_product_keywords = {word for word in main_product_keywords if word not in common_words and len(word) > 2}
-
-        if main_product_keywords:
-            scored_products = []
-            for index, row in all_products_df.iterrows():
-                if row['id'] == main_product['id']:
-                    continue
-                
-                product_keywords = set()
-                if pd.notna(row.get('title')):
-                    product_keywords.update(get_keywords_from_text(row['title']))
-                if pd.notna(row.get('description')):
-                    product_keywords.update(get_keywords_from_text(row['description']))
-                if pd.notna(row.get('variation')):
-                    product_keywords.update(get_keywords_from_text(row['variation']))
-                
-                overlap_score = len(main_product_keywords.intersection(product_keywords))
-                if overlap_score > 0:
-                    scored_products.append((overlap_score, row))
-            
-            scored_products.sort(key=lambda x: x[0], reverse=True)
-            for score, prod in scored_products:
-                if len(related) < num_results and prod['id'] not in [p['id'] for p in related]:
-                    unique_related.append(prod)
-                    # Add to related list only if not already there, to avoid duplicates
-                    # This check is actually handled by 'seen_ids' at the end, but keeping here for clarity
-                    # related.append(prod.to_dict())
-
-    unique_related = []
-    seen_ids = set()
-    for prod in related:
-        if prod['id'] not in seen_ids:
-            unique_related.append(prod)
-            seen_ids.add(prod['id'])
-            if len(unique_related) >= num_results:
-                break
-    
-    return unique_related
\ No newline at end of file
+    position = catalog_index.position_of(main_product)
+    if position is None:
+        return []
+    return catalog_index.df.iloc[catalog_index.related_positions(position, num_results)].to_dict('records')
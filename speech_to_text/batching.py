@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import config
+from speech_to_text import whisper_handler
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("audio", "language", "task", "future")
+
+    def __init__(self, audio, language, task):
+        self.audio = audio
+        self.language = language
+        self.task = task
+        self.future = Future()
+
+
+class WhisperBatcher:
+    """
+    Dynamic micro-batching in front of the global Whisper model.
+
+    Callers submit 16 kHz audio and wait on a future. A single worker thread takes the
+    first waiting request, keeps collecting for up to max_wait_ms (or until max_batch_size
+    requests are waiting), groups the requests by their (language, task) decoder prompt,
+    runs one model.generate per group and hands each caller its own text.
+    """
+
+    def __init__(self, max_batch_size: int = 8, max_wait_ms: float = 15):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, audio, language: str = "persian", task: str = "transcribe") -> Future:
+        self._ensure_worker()
+        request = _Request(audio, language, task)
+        self._queue.put(request)
+        return request.future
+
+    def transcribe(self, audio, language: str = "persian", task: str = "transcribe", timeout: float = None) -> str:
+        """Blocking helper: submits the audio and waits for its transcription."""
+        return self.submit(audio, language, task).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="whisper-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.language, request.task), []).append(request)
+
+            for (language, task), requests in groups.items():
+                try:
+                    texts = whisper_handler.transcribe_batch([request.audio for request in requests], language=language, task=task)
+                except Exception as e:
+                    logger.exception("Batched transcription failed")
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                for request, text in zip(requests, texts):
+                    request.future.set_result(text)
+                self.batches += 1
+                self.requests += len(requests)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "waiting": self._queue.qsize(),
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": self.requests / self.batches if self.batches else None,
+        }
+
+
+whisper_batcher = WhisperBatcher(config.WHISPER_BATCH_MAX_SIZE, config.WHISPER_BATCH_WINDOW_MS)
+
+
+# Benchmark: throughput and p95 latency per (batch size, window) setting (python -m speech_to_text.batching)
+if __name__ == "__main__":
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+
+    whisper_handler.load_whisper_model()
+    rng = np.random.default_rng(0)
+    # 5 s clips of low-level noise; the decoder stops early, which is enough to compare settings
+    clips = [rng.normal(0, 0.01, 16000 * 5).astype(np.float32) for _ in range(32)]
+
+    def timed_call(batcher, clip):
+        started = time.perf_counter()
+        batcher.transcribe(clip, language="english")
+        return time.perf_counter() - started
+
+    print(f"{'batch':>6} {'window ms':>10} {'req/s':>8} {'p50 s':>8} {'p95 s':>8}")
+    for max_batch_size, max_wait_ms in ((1, 0), (4, 10), (8, 15), (8, 50), (16, 50)):
+        batcher = WhisperBatcher(max_batch_size, max_wait_ms)
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            started = time.perf_counter()
+            latencies = sorted(pool.map(lambda clip: timed_call(batcher, clip), clips))
+            elapsed = time.perf_counter() - started
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{max_batch_size:>6} {max_wait_ms:>10} {len(clips) / elapsed:>8.2f} {p50:>8.2f} {p95:>8.2f}")
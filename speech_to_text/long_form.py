@@ -0,0 +1,198 @@
+import re
+
+import numpy as np
+import soundfile as sf
+
+import config
+from speech_to_text import whisper_handler
+from utils.audio_utils import resample, to_mono
+
+SAMPLE_RATE = 16000
+# Whisper sees at most 30 seconds of audio per forward pass
+WHISPER_WINDOW_SECONDS = 30
+# Frame length used to look for the quietest cut point near a window end
+SILENCE_FRAME_SECONDS = 0.05
+
+_WORD_NORMALIZE = re.compile(r"[^\w']+")
+
+
+def find_quiet_cut(audio: np.ndarray, search_start: int, search_end: int, sample_rate: int = SAMPLE_RATE) -> int:
+    """Returns the sample index of the lowest-energy frame between search_start and search_end."""
+    frame = int(SILENCE_FRAME_SECONDS * sample_rate)
+    region = audio[search_start:search_end]
+    usable = len(region) // frame * frame
+    if usable == 0:
+        return search_end
+    energy = np.square(region[:usable].reshape(-1, frame)).mean(axis=1)
+    quietest = int(np.argmin(energy))
+    return search_start + quietest * frame + frame // 2
+
+
+def iter_windows(audio: np.ndarray, window_seconds: float, overlap_seconds: float, split_on_silence: bool,
+                 sample_rate: int = SAMPLE_RATE):
+    """
+    Yields (start_sample, end_sample, window_audio) covering the audio (16 kHz unless sample_rate says otherwise).
+
+    Consecutive windows overlap by overlap_seconds. With split_on_silence, each window
+    instead ends at the quietest point of its last overlap_seconds and the next window
+    starts exactly there, so no word is cut in half and no overlap needs stitching.
+    Raises ValueError unless 0 <= overlap_seconds < window_seconds (windows must move forward).
+    """
+    window = int(window_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    if window <= 0 or not 0 <= overlap < window:
+        raise ValueError(f"Long-form windows need 0 <= overlap < window, got overlap={overlap_seconds}s, window={window_seconds}s")
+    start = 0
+    total = len(audio)
+    while start < total:
+        end = min(start + window, total)
+        if end == total:
+            yield start, end, audio[start:end]
+            return
+        if split_on_silence and overlap > 0:
+            end = find_quiet_cut(audio, end - overlap, end, sample_rate)
+            yield start, end, audio[start:end]
+            start = end
+        else:
+            yield start, end, audio[start:end]
+            start = end - overlap
+
+
+def iter_file_windows(audio_path: str, window_seconds: float, overlap_seconds: float, split_on_silence: bool):
+    """
+    Same as iter_windows, but reads the file block by block, so only about one window of
+    audio is in memory at a time (for files soundfile can seek in: WAV, FLAC, OGG, ...).
+
+    Windows are cut at the file's own rate and each one is resampled to 16 kHz as a whole:
+    resampling the blocks instead would leave a filter edge (a click) inside every window
+    that spans a block boundary. Yielded positions are in 16 kHz samples.
+    """
+    if not 0 <= overlap_seconds < window_seconds:
+        raise ValueError(f"Long-form windows need 0 <= overlap < window, got overlap={overlap_seconds}s, window={window_seconds}s")
+    with sf.SoundFile(audio_path) as audio_file:
+        file_rate = audio_file.samplerate
+        block_frames = int((window_seconds + overlap_seconds) * file_rate)
+        offset = 0  # position in file samples of buffer[0]
+        buffer = np.zeros(0, dtype=np.float32)
+        finished = False
+
+        def to_output_rate(position: int) -> int:
+            return round(position * SAMPLE_RATE / file_rate)
+
+        while True:
+            if not finished:
+                block = to_mono(audio_file.read(block_frames, dtype="float32", always_2d=True))
+                finished = len(block) < block_frames
+                buffer = np.concatenate([buffer, block])
+
+            # Only emit windows that are complete, unless the file is exhausted
+            last = None
+            for start, end, window_audio in iter_windows(buffer, window_seconds, overlap_seconds, split_on_silence, file_rate):
+                if not finished and end == len(buffer):
+                    break
+                yield to_output_rate(offset + start), to_output_rate(offset + end), resample(window_audio, file_rate, SAMPLE_RATE)
+                last = (start, end)
+
+            if finished:
+                return
+            if last is not None:
+                # Keep the unconsumed tail (including the overlap) for the next block
+                keep_from = last[1] if split_on_silence else last[1] - int(overlap_seconds * file_rate)
+                buffer = buffer[keep_from:]
+                offset += keep_from
+
+
+def _normalized_words(text: str) -> list:
+    return [word for word in _WORD_NORMALIZE.sub(" ", text.lower()).split() if word]
+
+
+def merge_overlap(previous_text: str, next_text: str, max_overlap_words: int = 30) -> str:
+    """
+    Returns next_text without the words that repeat the end of previous_text.
+    The longest run of (normalized) words that ends previous_text and starts next_text is dropped.
+    """
+    previous_words = _normalized_words(previous_text)[-max_overlap_words:]
+    next_words_raw = next_text.split()
+    next_words = [" ".join(_normalized_words(word)) for word in next_words_raw]
+    for size in range(min(len(previous_words), len(next_words)), 0, -1):
+        if previous_words[-size:] == next_words[:size]:
+            return " ".join(next_words_raw[size:])
+    return next_text
+
+
+def transcribe_long_audio(
+    audio,
+    language: str = "persian",
+    task: str = "transcribe",
+    sampling_rate: int = None,
+    file_extension: str = None,
+    window_seconds: float = WHISPER_WINDOW_SECONDS,
+    overlap_seconds: float = None,
+    split_on_silence: bool = None,
+    batch_size: int = None,
+) -> dict:
+    """
+    Transcribes audio of any length by decoding 30-second windows in batches.
+    Args:
+        audio: A file path, raw file bytes / BytesIO, or a NumPy array (see whisper_handler.load_audio).
+               Seekable files (WAV/FLAC/OGG paths) are read window by window with bounded memory.
+        language (str): Expected output language.
+        task (str): "transcribe" or "translate".
+        window_seconds (float): Window length (at most 30 s, Whisper's input size).
+        overlap_seconds (float): Overlap between windows, or the search range for a quiet cut point.
+        split_on_silence (bool): Cut windows at the quietest point instead of overlapping them.
+        batch_size (int): Windows decoded per model.generate call.
+    Returns:
+        dict: {"text": full transcription, "segments": [{"start", "end", "text"}, ...]} with times in seconds.
+    """
+    overlap_seconds = config.LONG_FORM_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+    split_on_silence = config.LONG_FORM_SPLIT_ON_SILENCE if split_on_silence is None else split_on_silence
+    batch_size = batch_size or config.LONG_FORM_BATCH_SIZE
+    window_seconds = min(window_seconds, WHISPER_WINDOW_SECONDS)
+
+    if whisper_handler.model is None:
+        whisper_handler.load_whisper_model()
+        if whisper_handler.model is None:
+            raise RuntimeError("Speech-to-Text model not loaded. Cannot transcribe audio.")
+
+    if isinstance(audio, str) and _is_seekable_audio_file(audio):
+        windows = iter_file_windows(audio, window_seconds, overlap_seconds, split_on_silence)
+    else:
+        audio_input = whisper_handler.load_audio(audio, sampling_rate=sampling_rate, file_extension=file_extension)
+        windows = iter_windows(audio_input, window_seconds, overlap_seconds, split_on_silence)
+
+    segments = []
+    previous_text = ""
+    batch = []
+
+    def flush():
+        nonlocal previous_text
+        texts = whisper_handler.transcribe_batch([window_audio for _, _, window_audio in batch], language=language, task=task)
+        for (start, end, _), text in zip(batch, texts):
+            if segments and not split_on_silence:
+                text = merge_overlap(previous_text, text)
+                # The overlapping audio was already covered by the previous segment
+                start = max(start, int(segments[-1]["end"] * SAMPLE_RATE))
+            previous_text = text or previous_text
+            segments.append({"start": round(start / SAMPLE_RATE, 2), "end": round(end / SAMPLE_RATE, 2), "text": text})
+        batch.clear()
+
+    for window in windows:
+        batch.append(window)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return {
+        "text": " ".join(segment["text"] for segment in segments if segment["text"]),
+        "segments": segments,
+    }
+
+
+def _is_seekable_audio_file(audio_path: str) -> bool:
+    try:
+        sf.info(audio_path)
+        return True
+    except Exception:
+        return False
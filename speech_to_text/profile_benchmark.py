@@ -0,0 +1,142 @@
+"""
+Benchmarks the Whisper inference profiles on a reference clip.
+
+    python -m speech_to_text.profile_benchmark --audio test.wav --reference "expected transcript"
+    python -m speech_to_text.profile_benchmark --audio test.wav --reference-file test.txt --profiles fast,fastest --threads 4
+
+For each profile it reports load time, real-time factor (transcription time / audio duration,
+median over --runs after one warm-up run), peak resident memory and word error rate against the
+reference. Every profile runs in a fresh process so memory and thread settings do not leak
+between them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import resource
+import statistics
+import sys
+import time
+
+import config
+
+_WORD_NORMALIZE = re.compile(r"[^\w']+")
+
+
+def normalize_words(text: str) -> list:
+    return _WORD_NORMALIZE.sub(" ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """(substitutions + deletions + insertions) / reference words, on normalized words."""
+    reference_words = normalize_words(reference)
+    hypothesis_words = normalize_words(hypothesis)
+    if not reference_words:
+        return 0.0 if not hypothesis_words else 1.0
+
+    previous = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, 1):
+        current = [i]
+        for j, hypothesis_word in enumerate(hypothesis_words, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (reference_word != hypothesis_word),
+            ))
+        previous = current
+    return previous[-1] / len(reference_words)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_profile(profile_name: str, audio_path: str, language: str, runs: int, threads: int) -> dict:
+    """Runs in a child process: loads one profile and times it on the clip."""
+    if threads:
+        config.TORCH_NUM_THREADS = threads
+    config.WHISPER_BATCHING = False  # time the model itself, not the batching window
+
+    from speech_to_text import whisper_handler
+
+    started = time.perf_counter()
+    whisper_handler.load_whisper_model(profile_name)
+    load_seconds = time.perf_counter() - started
+    if whisper_handler.model is None:
+        return {"profile": profile_name, "error": "model failed to load"}
+
+    audio = whisper_handler.load_audio(audio_path)
+    duration = len(audio) / 16000
+
+    text = whisper_handler.transcribe_audio(audio, language=language)  # warm-up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = whisper_handler.transcribe_audio(audio, language=language)
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    import torch
+    return {
+        "profile": profile_name,
+        "model": whisper_handler.active_profile["model_name"],
+        "quantize_int8": whisper_handler.active_profile["quantize_int8"],
+        "compile": whisper_handler.active_profile["compile"],
+        "better_transformer": whisper_handler.active_profile["better_transformer"],
+        "device": whisper_handler.device,
+        "threads": torch.get_num_threads(),
+        "load_seconds": round(load_seconds, 2),
+        "audio_seconds": round(duration, 2),
+        "transcribe_seconds": round(median, 3),
+        "rtf": round(median / duration, 3) if duration else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "text": text,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Whisper inference profiles (RTF, memory, WER).")
+    parser.add_argument("--audio", default="test.wav", help="Reference clip")
+    parser.add_argument("--reference", default="", help="Expected transcript of the clip")
+    parser.add_argument("--reference-file", help="File containing the expected transcript")
+    parser.add_argument("--profiles", default=",".join(config.WHISPER_PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--language", default="persian")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per profile (after one warm-up)")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = TORCH_NUM_THREADS / torch default)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.audio):
+        parser.error(f"Reference clip not found: {args.audio}")
+    reference = args.reference
+    if args.reference_file:
+        with open(args.reference_file, encoding="utf-8") as reference_file:
+            reference = reference_file.read()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for profile_name in [name.strip() for name in args.profiles.split(",") if name.strip()]:
+        with context.Pool(1) as pool:
+            result = pool.apply(_run_profile, (profile_name, args.audio, args.language, args.runs, args.threads))
+        if reference and "text" in result:
+            result["wer"] = round(word_error_rate(reference, result["text"]), 3)
+        results.append(result)
+        if not args.json:
+            if "error" in result:
+                print(f"{profile_name:>10}: {result['error']}")
+                continue
+            wer = f"{result['wer']:.1%}" if "wer" in result else "n/a"
+            print(f"{profile_name:>10}: {result['model']:<24} int8={result['quantize_int8']!s:<5} "
+                  f"threads={result['threads']:<3} load={result['load_seconds']:>6.1f}s  RTF={result['rtf']:.3f}  "
+                  f"peak RSS={result['peak_rss_mb']:>7.0f} MB  WER={wer}")
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+import config
+from speech_to_text.utils import STREAM_SAMPLE_RATE, EnergyVAD, RingBuffer
+from utils.audio_utils import pcm16_to_float32
+from speech_to_text.whisper_handler import transcribe_audio
+from utils.executors import stt_executor, StageSaturated
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingSession:
+    """
+    Incremental transcription of one live PCM stream (16 kHz, 16-bit little-endian, mono),
+    or of float samples at any sample_rate through feed_samples (e.g. 8 kHz phone audio, which
+    is resampled once per utterance when it is transcribed).
+
+    Incoming audio is cut into VAD frames. While the caller speaks, the utterance is kept in a
+    fixed-size ring buffer and a partial transcript is sent every STREAM_PARTIAL_INTERVAL_MS;
+    once the VAD sees enough trailing silence the utterance is transcribed once more and sent
+    as final. Transcription runs on the STT stage, so receiving never waits for the model.
+    With partials=False only finals are transcribed (callers that act on whole utterances).
+
+    Messages sent through `send` (an async callable taking a dict):
+        {"type": "partial", "utterance": n, "text": ...}
+        {"type": "final", "utterance": n, "text": ..., "start": s, "end": s, "latency_ms": ms}
+        {"type": "error", "utterance": n, "detail": ...}
+    """
+
+    def __init__(self, send, language: str = "persian", task: str = "transcribe", sample_rate: int = STREAM_SAMPLE_RATE,
+                 partials: bool = True):
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self.language = language
+        self.task = task
+        self.sample_rate = sample_rate
+        self.vad = EnergyVAD(
+            sample_rate=sample_rate,
+            frame_ms=config.STREAM_VAD_FRAME_MS,
+            min_rms=config.STREAM_VAD_MIN_RMS,
+            end_silence_ms=config.STREAM_END_SILENCE_MS,
+        )
+        self.utterance = RingBuffer(int(config.STREAM_MAX_UTTERANCE_SECONDS * sample_rate))
+        self.pre_roll = RingBuffer(max(self.vad.frame_size, config.STREAM_PRE_ROLL_MS * sample_rate // 1000))
+        self._partial_samples = config.STREAM_PARTIAL_INTERVAL_MS * sample_rate // 1000 if partials else 0
+        self._leftover = b""
+        self._pending = np.zeros(0, dtype=np.float32)
+        self.samples_received = 0
+        self.utterance_index = 0
+        self._utterance_start = 0
+        self._last_voiced_at = None
+        self._samples_since_partial = 0
+        self._partial_task = None
+        self._final_task = None
+        self._tasks = set()
+
+    async def feed(self, data: bytes):
+        """Processes a chunk of PCM bytes of any length."""
+        data = self._leftover + data
+        usable = len(data) - len(data) % 2
+        self._leftover = data[usable:]
+        if usable:
+            await self.feed_samples(pcm16_to_float32(data[:usable]))
+
+    async def feed_samples(self, samples: np.ndarray):
+        """Processes float32 samples (at sample_rate) of any length."""
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+        usable = len(samples) - len(samples) % self.vad.frame_size
+        self._pending = samples[usable:]
+        for frame in samples[:usable].reshape(-1, self.vad.frame_size):
+            self._process_frame(frame)
+
+    def _process_frame(self, frame: np.ndarray):
+        self.samples_received += len(frame)
+        if not self.vad.in_speech:
+            self.pre_roll.append(frame)
+            if self.vad.process(frame) == EnergyVAD.SPEECH_START:
+                self.utterance.clear()
+                self.utterance.append(self.pre_roll.read())
+                self.pre_roll.clear()
+                self._utterance_start = self.samples_received - len(self.utterance)
+                self._samples_since_partial = 0
+                self._last_voiced_at = time.perf_counter()
+            return
+
+        self.utterance.append(frame)
+        self._samples_since_partial += len(frame)
+        event = self.vad.process(frame)
+        if self.vad.trailing_silence_ms == 0:
+            self._last_voiced_at = time.perf_counter()
+
+        if event == EnergyVAD.SPEECH_END:
+            self._finalize()
+        elif self.utterance.full:
+            # Too long for one Whisper window: finalize this piece and keep listening
+            self._finalize()
+            self._utterance_start = self.samples_received
+        elif self._partial_samples and self._samples_since_partial >= self._partial_samples:
+            self._samples_since_partial = 0
+            if self._partial_task is None or self._partial_task.done():
+                self._partial_task = self._start(self._send_partial(self.utterance_index, self.utterance.read()))
+
+    def _start(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _finalize(self):
+        audio = self.utterance.read()
+        self.utterance.clear()
+        start = self._utterance_start / self.sample_rate
+        end = self.samples_received / self.sample_rate
+        self._final_task = self._start(
+            self._send_final(self.utterance_index, audio, start, end, self._last_voiced_at, self._final_task)
+        )
+        self.utterance_index += 1
+        self._samples_since_partial = 0
+
+    async def _transcribe(self, audio: np.ndarray) -> str:
+        # Raises TranscriptionError (or StageSaturated) instead of returning an error string
+        return await stt_executor.run(transcribe_audio, audio, language=self.language, task=self.task, sampling_rate=self.sample_rate)
+
+    async def _send_partial(self, index: int, audio: np.ndarray):
+        try:
+            text = await self._transcribe(audio)
+        except StageSaturated:
+            return  # partials are best-effort; the final transcript still follows
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {e}")
+            return
+        if index == self.utterance_index:
+            await self._emit({"type": "partial", "utterance": index, "text": text})
+
+    async def _send_final(self, index: int, audio: np.ndarray, start: float, end: float, last_voiced_at: float, previous):
+        try:
+            text = await self._transcribe(audio)
+            message = {"type": "final", "utterance": index, "text": text, "start": round(start, 2), "end": round(end, 2)}
+        except StageSaturated as e:
+            text = None
+            message = {"type": "error", "utterance": index, "detail": str(e)}
+        except Exception as e:
+            logger.error(f"Final transcription failed: {e}")
+            text = None
+            message = {"type": "error", "utterance": index, "detail": "Speech-to-text failed for this utterance."}
+
+        if previous is not None:
+            # Finals are delivered in utterance order
+            await asyncio.gather(previous, return_exceptions=True)
+        if text is not None:
+            latency_ms = (time.perf_counter() - last_voiced_at) * 1000
+            message["latency_ms"] = round(latency_ms, 1)
+            logger.info(f"Utterance {index} ({end - start:.2f}s audio): end of speech to final transcript {latency_ms:.0f} ms")
+        await self._emit(message)
+
+    async def _emit(self, message: dict):
+        async with self._send_lock:
+            await self._send(message)
+
+    async def finish(self):
+        """Finalizes an utterance still in progress and waits until every final has been sent."""
+        if self.vad.in_speech and len(self.utterance):
+            self.vad.reset()
+            self._finalize()
+        if self._final_task is not None:
+            await asyncio.gather(self._final_task, return_exceptions=True)
+
+    def close(self):
+        """Drops pending work when the client has gone away."""
+        for task in list(self._tasks):
+            task.cancel()
@@ -0,0 +1,108 @@
+import numpy as np
+
+# Streaming audio is 16-bit little-endian mono PCM at Whisper's sampling rate
+STREAM_SAMPLE_RATE = 16000
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float32 sample buffer; once full, new samples overwrite the oldest ones.
+    Memory is allocated once, so a connection can stream for hours without growing.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._end = 0  # total samples ever written
+        self._start = 0  # total-sample position of the oldest sample kept
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def full(self) -> bool:
+        return len(self) == self.capacity
+
+    def append(self, samples: np.ndarray):
+        samples = samples[-self.capacity:]
+        position = self._end % self.capacity
+        first = min(len(samples), self.capacity - position)
+        self._data[position:position + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self._end += len(samples)
+        self._start = max(self._start, self._end - self.capacity)
+
+    def read(self, count: int = None) -> np.ndarray:
+        """Returns a copy of the last `count` samples (all kept samples by default), oldest first."""
+        count = len(self) if count is None else min(count, len(self))
+        position = (self._end - count) % self.capacity
+        if position + count <= self.capacity:
+            return self._data[position:position + count].copy()
+        return np.concatenate([self._data[position:], self._data[:position + count - self.capacity]])
+
+    def clear(self):
+        self._start = self._end
+
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detection over fixed-size frames.
+
+    A frame is voiced when its RMS level is above both `min_rms` and `speech_ratio` times the
+    running noise floor (tracked on unvoiced frames). An utterance starts after `min_speech_ms` of
+    voiced frames and ends after `end_silence_ms` of unvoiced frames.
+    """
+
+    SPEECH_START = "speech_start"
+    SPEECH_END = "speech_end"
+
+    def __init__(self, sample_rate: int = STREAM_SAMPLE_RATE, frame_ms: int = 30, min_rms: float = 0.01,
+                 speech_ratio: float = 3.0, min_speech_ms: int = 90, end_silence_ms: int = 600,
+                 noise_adaptation: float = 0.05):
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self.min_rms = min_rms
+        self.speech_ratio = speech_ratio
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.end_silence_frames = max(1, end_silence_ms // frame_ms)
+        self.noise_adaptation = noise_adaptation
+        self.noise_floor = min_rms / speech_ratio
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+
+    def is_voiced(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(np.square(frame))))
+        voiced = rms > max(self.min_rms, self.noise_floor * self.speech_ratio)
+        if not voiced:
+            self.noise_floor += self.noise_adaptation * (rms - self.noise_floor)
+        return voiced
+
+    def process(self, frame: np.ndarray):
+        """Feeds one frame of `frame_size` samples; returns SPEECH_START, SPEECH_END or None."""
+        voiced = self.is_voiced(frame)
+        if not self.in_speech:
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.min_speech_frames:
+                self.in_speech = True
+                self._silent_run = 0
+                return self.SPEECH_START
+            return None
+
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run >= self.end_silence_frames:
+            self.in_speech = False
+            self._voiced_run = 0
+            return self.SPEECH_END
+        return None
+
+    def reset(self):
+        """Ends any open utterance; the noise floor estimate is kept."""
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+
+    @property
+    def trailing_silence_ms(self) -> int:
+        """Length of the unvoiced run at the end of the current utterance."""
+        return self._silent_run * self.frame_ms
@@ -1,111 +1,290 @@
-import torch
-from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
+# torch, transformers and librosa are imported where they are used, so importing this module
+# (e.g. from main.py) stays fast and the model can load in the background
 import soundfile as sf
-import librosa
+import logging
 import os
 import io
+import tempfile
+import threading
+import numpy as np
 
-# Whisper model name
+import config
+from utils.audio_utils import resample, to_mono
+from utils.metrics import AUDIO_SECONDS, STAGE_SECONDS, WHISPER_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Whisper model name (set from the inference profile when the model loads)
 WHISPER_MODEL_NAME = "openai/whisper-medium" 
+# Whisper decodes at most 30 seconds of 16 kHz audio per pass; longer audio goes through long_form
+WHISPER_WINDOW_SAMPLES = 30 * 16000
 
 # Global variables to store the processor and model
 # These are loaded only once to prevent reloading on every request
 processor = None
 model = None
 device = None # For storing the active device (cuda or cpu)
+active_profile = None # The resolved inference profile of the loaded model
+_load_lock = threading.Lock() # Startup loads in the background; a request must not start a second load
+
+AUDIO_DECODE_SECONDS = STAGE_SECONDS.labels("audio_decode")
+WHISPER_FEATURES_SECONDS = STAGE_SECONDS.labels("whisper_features")
+WHISPER_GENERATE_SECONDS = STAGE_SECONDS.labels("whisper_generate")
+TRANSCRIBED_AUDIO_SECONDS = AUDIO_SECONDS.labels("transcribed")
+
+class TranscriptionError(RuntimeError):
+    """transcribe_audio could not produce a transcript (model not loaded, file missing, decoding or inference failed)."""
 
-def load_whisper_model():
+def resolve_profile(profile_name: str = None) -> dict:
     """
-    Loads the Whisper model and its processor.
-    This function should only be called once when the program starts (e.g., in main.py).
+    Returns the inference profile `profile_name` (default config.WHISPER_PROFILE)
+    with the WHISPER_* environment overrides applied.
     """
-    global processor, model, device
+    profile_name = profile_name or config.WHISPER_PROFILE
+    if profile_name not in config.WHISPER_PROFILES:
+        raise ValueError(f"Unknown Whisper profile '{profile_name}'. Available: {', '.join(config.WHISPER_PROFILES)}")
+
+    profile = dict(config.WHISPER_PROFILES[profile_name], name=profile_name)
+    if config.WHISPER_MODEL_NAME:
+        profile["model_name"] = config.WHISPER_MODEL_NAME
+    for key, override in (("quantize_int8", config.WHISPER_QUANTIZE_INT8), ("compile", config.WHISPER_COMPILE),
+                          ("better_transformer", config.WHISPER_BETTER_TRANSFORMER)):
+        if override:
+            profile[key] = override == "1"
+    return profile
+
+def configure_torch_threads():
+    """Applies TORCH_NUM_THREADS / TORCH_INTEROP_THREADS before the model is loaded."""
+    import torch
+    if config.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(config.TORCH_NUM_THREADS)
+    if config.TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(config.TORCH_INTEROP_THREADS)
+        except RuntimeError:
+            # torch only allows this before any inter-op parallel work has started
+            logger.warning("Could not set torch inter-op threads: torch has already started parallel work.")
+
+def load_whisper_model(profile_name: str = None):
+    """
+    Loads the Whisper model and its processor with an inference profile (see config.WHISPER_PROFILES).
+    This function should only be called once when the program starts (e.g., in main.py);
+    calling it with a different profile replaces the loaded model.
+    """
+    global processor, model, device, active_profile, WHISPER_MODEL_NAME
+
+    with _load_lock:
+        profile = resolve_profile(profile_name)
+        if processor is not None and model is not None and active_profile == profile:
+            print("Whisper model already loaded.")
+            return
+
+        WHISPER_MODEL_NAME = profile["model_name"]
+        print(f"Loading Whisper model: {WHISPER_MODEL_NAME} (profile '{profile['name']}')...")
+        try:
+            import torch
+            from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
+
+            configure_torch_threads()
+
+            # Determine device for model loading (cuda for GPU, cpu for CPU)
+            device = "cuda:0" if torch.cuda.is_available() else "cpu"
+            torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+
+            # Load processor and model from Hugging Face
+            processor = AutoProcessor.from_pretrained(WHISPER_MODEL_NAME)
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                WHISPER_MODEL_NAME,
+                torch_dtype=torch_dtype,
+                low_cpu_mem_usage=True,
+                use_safetensors=True
+            ).to(device)
+
+            model.eval()
 
-    if processor is not None and model is not None:
-        print("Whisper model already loaded.")
-        return
+            if profile["better_transformer"]:
+                try:
+                    model = model.to_bettertransformer()
+                except Exception as e:
+                    logger.warning("BetterTransformer not applied: %s", e)
 
-    print(f"Loading Whisper model: {WHISPER_MODEL_NAME}...")
+            if profile["quantize_int8"]:
+                if device == "cpu":
+                    # Weights of every Linear layer become int8; activations are quantized on the fly
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                else:
+                    logger.info("Int8 dynamic quantization only runs on CPU; keeping the float16 GPU model.")
+
+            if profile["compile"]:
+                try:
+                    model.model.encoder = torch.compile(model.model.encoder)
+                except Exception as e:
+                    logger.warning("torch.compile not applied: %s", e)
+
+            active_profile = profile
+            print(f"Whisper model loaded successfully on device: {device}")
+        except Exception as e:
+            print(f"Error loading Whisper model: {e}")
+            processor = None
+            model = None
+            device = None
+            active_profile = None
+
+def load_audio(audio, sampling_rate: int = None, file_extension: str = None):
+    """
+    Returns the audio as a 16 kHz mono float32 array.
+    Args:
+        audio: A file path, raw file bytes (bytes/bytearray/memoryview/BytesIO) or a NumPy array.
+        sampling_rate (int): Sampling rate of a NumPy array input (default 16000). Ignored for paths and bytes.
+        file_extension (str): Format hint for bytes input (e.g. ".webm"), used by the disk fallback.
+    Returns:
+        np.ndarray: 16 kHz mono float32 audio.
+    """
+    if isinstance(audio, np.ndarray):
+        audio_input = audio.astype(np.float32, copy=False)
+        sampling_rate = sampling_rate or 16000
+    elif isinstance(audio, (bytes, bytearray, memoryview, io.BytesIO)):
+        with AUDIO_DECODE_SECONDS.time():
+            audio_input, sampling_rate = _decode_audio_bytes(audio, file_extension)
+    else:
+        with AUDIO_DECODE_SECONDS.time():
+            try:
+                # WAV/FLAC/OGG (and MP3) decode directly; librosa handles everything else
+                audio_input, sampling_rate = sf.read(audio, dtype="float32")
+            except Exception:
+                import librosa
+                audio_input, sampling_rate = librosa.load(audio, sr=None)
+
+    # soundfile returns (frames, channels)
+    audio_input = to_mono(audio_input)
+
+    if sampling_rate != 16000:
+        # Polyphase filter cached per rate pair (8 kHz telephony, 44.1/48 kHz browser recordings)
+        audio_input = resample(audio_input, sampling_rate, 16000)
+    return audio_input
+
+def _decode_audio_bytes(data, file_extension: str = None):
+    """
+    Decodes an in-memory audio file. WAV/FLAC/OGG (and MP3 with libsndfile >= 1.1) are read
+    straight from the buffer; other formats are written to a temporary file for librosa.
+    """
+    buffer = data if isinstance(data, io.BytesIO) else io.BytesIO(data)
     try:
-        # Determine device for model loading (cuda for GPU, cpu for CPU)
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-
-        # Load processor and model from Hugging Face
-        processor = AutoProcessor.from_pretrained(WHISPER_MODEL_NAME)
-        model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            WHISPER_MODEL_NAME,
-            torch_dtype=torch_dtype,
-            low_cpu_mem_usage=True,
-            use_safetensors=True
-        ).to(device)
-
-        model.eval()
-
-        print(f"Whisper model loaded successfully on device: {device}")
-    except Exception as e:
-        print(f"Error loading Whisper model: {e}")
-        processor = None
-        model = None
-        device = None
+        audio_input, sampling_rate = sf.read(buffer, dtype="float32")
+        return audio_input, sampling_rate
+    except Exception:
+        pass
 
-def transcribe_audio_file(audio_path: str, language: str = "persian", task: str = "transcribe") -> str:
+    os.makedirs(config.TEMP_AUDIO_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=config.TEMP_AUDIO_DIR, suffix=file_extension or "", delete=False) as temp_file:
+        temp_file.write(buffer.getvalue())
+    try:
+        import librosa
+        return librosa.load(temp_file.name, sr=None)
+    finally:
+        os.remove(temp_file.name)
+
+def transcribe_audio(audio, language: str = "persian", task: str = "transcribe", sampling_rate: int = None, file_extension: str = None) -> str:
     """
-    Converts an audio file to text.
-    The audio file should be in .flac, .wav, .mp3, or other formats supported by librosa.
+    Converts audio to text.
     Args:
-        audio_path (str): Path to the audio file.
+        audio: A file path, raw file bytes / BytesIO, or a NumPy array (see load_audio).
         language (str): Expected output language (e.g., "english", "persian", "french").
                        Used for multilingual models.
                        Check Whisper documentation for supported languages.
         task (str): Desired task ("transcribe" for speech-to-text, "translate" for translation to English).
+        sampling_rate (int): Sampling rate of a NumPy array input (default 16000).
+        file_extension (str): Format hint for bytes input (e.g. ".mp3").
     Returns:
-        str: Transcribed text from the audio file.
+        str: Transcribed text from the audio.
+    Raises:
+        TranscriptionError: If the audio could not be transcribed.
     """
     global processor, model, device
 
     if processor is None or model is None or device is None:
         load_whisper_model()
         if processor is None or model is None or device is None:
-            return "Error: Speech-to-Text model not loaded. Cannot transcribe audio."
+            raise TranscriptionError("Speech-to-Text model not loaded. Cannot transcribe audio.")
 
     try:
-        audio_input, sampling_rate = librosa.load(audio_path, sr=None)
+        audio_input = load_audio(audio, sampling_rate=sampling_rate, file_extension=file_extension)
+
+        if len(audio_input) > WHISPER_WINDOW_SAMPLES:
+            # A single Whisper pass would silently drop everything after the first 30 seconds
+            from speech_to_text.long_form import transcribe_long_audio
+            return transcribe_long_audio(audio_input, language=language, task=task)["text"]
 
-        if sampling_rate != 16000:
-            print(f"Resampling audio from {sampling_rate} Hz to 16000 Hz...")
-            audio_input = librosa.resample(audio_input, orig_sr=sampling_rate, target_sr=16000)
-            sampling_rate = 16000
+        if config.WHISPER_BATCHING:
+            # Decoded together with other requests arriving in the same few milliseconds
+            from speech_to_text.batching import whisper_batcher
+            return whisper_batcher.transcribe(audio_input, language=language, task=task)
+        return transcribe_batch([audio_input], language=language, task=task)[0]
+
+    except FileNotFoundError as e:
+        raise TranscriptionError("Audio file not found at the specified path.") from e
+    except Exception as e:
+        print(f"Error during audio transcription: {e}")
+        raise TranscriptionError(f"An unexpected error occurred during audio transcription: {e}") from e
 
+def transcribe_audio_file(audio_path: str, language: str = "persian", task: str = "transcribe") -> str:
+    """
+    Converts an audio file to text.
+    The audio file should be in .flac, .wav, .mp3, or other formats supported by librosa.
+    Args:
+        audio_path (str): Path to the audio file.
+        language (str): Expected output language (e.g., "english", "persian", "french").
+        task (str): Desired task ("transcribe" for speech-to-text, "translate" for translation to English).
+    Returns:
+        str: Transcribed text from the audio file, or a message starting with "Error:" if it could not be transcribed.
+    """
+    try:
+        return transcribe_audio(audio_path, language=language, task=task)
+    except TranscriptionError as e:
+        return f"Error: {e}"
+
+def transcribe_batch(audio_inputs: list, language: str = "persian", task: str = "transcribe") -> list:
+    """
+    Transcribes several 16 kHz mono audio arrays with a single model.generate call.
+    All inputs share the same language/task decoder prompt.
+    Args:
+        audio_inputs (list): 16 kHz float audio arrays.
+        language (str): Expected output language.
+        task (str): "transcribe" or "translate".
+    Returns:
+        list: Transcribed text of each input, in the same order.
+    """
+    import torch
+
+    WHISPER_BATCH_SIZE.observe(len(audio_inputs))
+    TRANSCRIBED_AUDIO_SECONDS.inc(sum(len(audio_input) for audio_input in audio_inputs) / 16000)
+
+    # The processor pads (or trims) every input to Whisper's 30 s window, so the features stack into one batch
+    with WHISPER_FEATURES_SECONDS.time():
         input_features = processor(
-            audio_input,
-            sampling_rate=sampling_rate,
+            audio_inputs,
+            sampling_rate=16000,
             return_tensors="pt"
-        ).input_features.to(device)
+        ).input_features.to(device, dtype=model.dtype)
 
-        forced_decoder_ids = processor.get_decoder_prompt_ids(
-            language=language,
-            task=task,
-            no_timestamps=True
-        )
-        
-        # Generate output tokens (the text)
+    forced_decoder_ids = processor.get_decoder_prompt_ids(
+        language=language,
+        task=task,
+        no_timestamps=True
+    )
+    
+    # Generate output tokens (the text)
+    with torch.inference_mode(), WHISPER_GENERATE_SECONDS.time():
         generated_ids = model.generate(
             input_features=input_features,
             forced_decoder_ids=forced_decoder_ids,
             max_new_tokens=256,
         )
 
-        # Decode tokens to readable text
-        # skip_special_tokens=True to remove context tokens like <|startoftranscript|>
-        transcription = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-        return transcription.strip()
-
-    except FileNotFoundError:
-        return "Error: Audio file not found at the specified path."
-    except Exception as e:
-        print(f"Error during audio transcription: {e}")
-        return f"An unexpected error occurred during audio transcription: {e}"
+    # Decode tokens to readable text
+    # skip_special_tokens=True to remove context tokens like <|startoftranscript|>
+    transcriptions = processor.batch_decode(generated_ids, skip_special_tokens=True)
+    return [transcription.strip() for transcription in transcriptions]
 
 # Example usage (for testing)
 if __name__ == "__main__":
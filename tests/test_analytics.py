@@ -0,0 +1,81 @@
+import json
+import os
+
+from logs.analytics import ConversationAnalytics
+from logs.store import ACTIVE_FILE_NAME, SEGMENT_PREFIX, ConversationLogWriter
+
+
+def _record(number: int) -> dict:
+    return {
+        "time": f"2025-06-01T10:{number // 60:02d}:{number % 60:02d}",
+        "source": "web_chat" if number % 2 else "voice",
+        "user": f"question {number}",
+        "intent": "fallback" if number % 3 == 0 else "product_match",
+        "product_ids": [1000 + number],
+        "latency_ms": float(number),
+    }
+
+
+def _append(log_dir: str, numbers, partial: str = ""):
+    with open(os.path.join(log_dir, ACTIVE_FILE_NAME), "a", encoding="utf-8") as log_file:
+        for number in numbers:
+            log_file.write(json.dumps(_record(number)) + "\n")
+        log_file.write(partial)
+
+
+def _rotate(log_dir: str, stamp: str):
+    """What ConversationLogWriter._rotate does, with the compression run inline."""
+    segment_path = os.path.join(log_dir, f"{SEGMENT_PREFIX}{stamp}.jsonl")
+    os.replace(os.path.join(log_dir, ACTIVE_FILE_NAME), segment_path)
+    ConversationLogWriter(log_dir, compression="gzip")._compress(segment_path)
+    assert os.path.exists(segment_path + ".gz")
+
+
+def _ingested_queries(analytics) -> list:
+    return sorted(analytics.turns()["query"].astype(str).tolist())
+
+
+def test_ingest_reads_each_turn_once_across_rotation_and_gzip(tmp_path):
+    log_dir, store_dir = str(tmp_path / "log"), str(tmp_path / "store")
+    os.makedirs(log_dir)
+    analytics = ConversationAnalytics(store_dir=store_dir, log_dir=log_dir)
+
+    # A half-written last line is left for the next ingest
+    partial = json.dumps(_record(3))
+    _append(log_dir, range(3), partial[:10])
+    assert analytics.ingest()["ingested"] == 3
+    assert analytics.ingest()["ingested"] == 0
+
+    with open(os.path.join(log_dir, ACTIVE_FILE_NAME), "a", encoding="utf-8") as log_file:
+        log_file.write(partial[10:] + "\n")
+    _append(log_dir, range(4, 6))
+    assert analytics.ingest()["ingested"] == 3
+
+    # The ingested file is rotated and compressed, and a new active file starts
+    _append(log_dir, range(6, 8))
+    _rotate(log_dir, "20250601-110000-000000")
+    _append(log_dir, range(8, 10))
+    assert analytics.ingest()["ingested"] == 4
+    assert analytics.ingest()["ingested"] == 0
+
+    # A fresh instance resumes from the saved checkpoints
+    _rotate(log_dir, "20250601-120000-000000")
+    reopened = ConversationAnalytics(store_dir=store_dir, log_dir=log_dir)
+    assert reopened.ingest()["ingested"] == 0
+    _append(log_dir, range(10, 12))
+    assert reopened.ingest()["ingested"] == 2
+
+    assert _ingested_queries(reopened) == sorted(f"question {number}" for number in range(12))
+
+
+def test_compaction_keeps_every_turn(tmp_path):
+    log_dir, store_dir = str(tmp_path / "log"), str(tmp_path / "store")
+    os.makedirs(log_dir)
+    analytics = ConversationAnalytics(store_dir=store_dir, log_dir=log_dir)
+    for number in range(5):
+        _append(log_dir, [number])
+        analytics.ingest()
+    analytics.compact()
+    assert len(analytics.state["chunks"]) == 1
+    assert _ingested_queries(analytics) == sorted(f"question {number}" for number in range(5))
+    assert len(analytics.turns(source="voice")) == 3
@@ -0,0 +1,46 @@
+import io
+import tempfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from speech_to_text.whisper_handler import load_audio
+
+
+def _wav_bytes(audio: np.ndarray, sampling_rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sampling_rate, format="WAV", subtype="FLOAT")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def no_temp_files(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("in-memory decode wrote a temporary file")
+    monkeypatch.setattr(tempfile, "NamedTemporaryFile", fail)
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview, io.BytesIO])
+def test_wav_uploads_decode_from_memory(no_temp_files, wrap):
+    left = np.linspace(-0.5, 0.5, 1600, dtype=np.float32)
+    stereo = np.stack([left, -left], axis=1)
+    # Both channels average to silence
+    assert np.allclose(load_audio(wrap(_wav_bytes(stereo))), 0.0)
+
+    mono = load_audio(wrap(_wav_bytes(left)))
+    assert mono.dtype == np.float32
+    assert np.allclose(mono, left)
+
+
+def test_arrays_pass_through_without_decoding(no_temp_files):
+    audio = np.arange(10, dtype=np.float64)
+    decoded = load_audio(audio, sampling_rate=16000)
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, audio)
+
+
+def test_other_rates_are_resampled_to_16_khz(no_temp_files):
+    audio = np.zeros(48000, dtype=np.float32)
+    assert len(load_audio(_wav_bytes(audio, 48000))) == 16000
+    assert len(load_audio(audio[:8000], sampling_rate=8000)) == 16000
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import time
+
+from text_to_speech import audio_store as audio_store_module
+from text_to_speech.audio_store import AudioStore, shard_of
+
+
+def _name(text: str) -> str:
+    return f"tts_{hashlib.sha256(text.encode('utf-8')).hexdigest()}.wav"
+
+
+def _add(store: AudioStore, text: str, size: int = 100, pin: bool = False) -> str:
+    name = _name(text)
+    temp_path = store.temp_path(".wav")
+    temp_path.write_bytes(b"\0" * size)
+    store.add(name, temp_path, pin=pin)
+    return name
+
+
+def test_files_are_sharded_and_served_only_by_their_own_path(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=10_000)
+    name = _add(store, "hello")
+    shard = shard_of(name)
+    assert store.path(name) == tmp_path / shard / name
+    assert store.url(name) == f"{store.url_prefix}/{shard}/{name}"
+
+    path, entry = store.lookup(f"{shard}/{name}")
+    assert path.read_bytes() == b"\0" * 100 and entry.size == 100
+    other_shard = "00" if shard != "00" else "01"
+    for relative_path in (f"{other_shard}/{name}", name, f"{shard}/../{name}", f"{shard}/{_name('missing')}",
+                          "../config.py", f"{shard}/tts_notahexdigest.wav"):
+        assert store.lookup(relative_path) is None
+
+
+def test_least_recently_used_unpinned_files_are_evicted(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=300)
+    pinned = _add(store, "canned", pin=True)
+    old = _add(store, "old")
+    recent = _add(store, "recent")
+    assert store.touch(old)
+    _add(store, "newest")
+    # "recent" is now the least recently used unpinned file
+    assert not store.touch(recent) and not store.path(recent).exists()
+    assert store.touch(pinned) and store.touch(old)
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 300, 1)
+
+
+def test_sweep_expires_files_not_accessed_within_the_ttl(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(audio_store_module.time, "time", lambda: now[0])
+    store = AudioStore(str(tmp_path), max_bytes=10_000, ttl_seconds=60)
+    pinned = _add(store, "canned", pin=True)
+    stale = _add(store, "stale")
+    now[0] += 50
+    fresh = _add(store, "fresh")
+    now[0] += 30
+    assert store.sweep() == 1
+    assert not store.touch(stale) and not store.path(stale).exists()
+    assert store.touch(fresh) and store.touch(pinned)
+    assert store.stats()["expirations"] == 1
+
+
+def test_restart_reindexes_and_moves_flat_files_into_shards(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=10_000)
+    kept = _add(store, "kept")
+    legacy = _name("legacy")
+    (tmp_path / legacy).write_bytes(b"\0" * 40)
+    (tmp_path / "notes.txt").write_text("not audio")
+
+    reopened = AudioStore(str(tmp_path), max_bytes=10_000)
+    assert reopened.touch(kept)
+    assert reopened.lookup(f"{shard_of(legacy)}/{legacy}") is not None
+    assert not (tmp_path / legacy).exists()
+    assert reopened.stats()["bytes"] == 140
+
+
+def test_open_indexes_once_and_keeps_young_temporary_files(tmp_path):
+    directory = tmp_path / "audio"
+    store = AudioStore(str(directory), max_bytes=10_000)
+    assert not directory.exists()  # constructing (at import time) does not touch the disk
+
+    directory.mkdir()
+    young, old = directory / ".young.wav", directory / ".old.wav"
+    young.write_bytes(b"partial")
+    old.write_bytes(b"partial")
+    an_hour_ago = time.time() - 3600
+    os.utime(old, (an_hour_ago, an_hour_ago))
+    store.open()
+    # Another worker may still be writing the young one
+    assert young.exists() and not old.exists()
+
+
+def test_a_file_deleted_by_another_worker_is_forgotten(tmp_path):
+    store = AudioStore(str(tmp_path), max_bytes=10_000)
+    name = _add(store, "shared")
+    os.remove(store.path(name))
+    assert store.lookup(f"{shard_of(name)}/{name}") is None
+    assert not store.touch(name)
+    assert store.stats()["entries"] == 0
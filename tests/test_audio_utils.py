@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+
+from utils.audio_utils import _polyphase_filter, float32_to_int16, pcm16_to_float32, resample, to_mono
+
+
+def _tone(rate: int, seconds: float = 1.0) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (0.5 * np.sin(2 * np.pi * 440 * t) + 0.25 * np.sin(2 * np.pi * 3000 * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize("orig_sr, target_sr", [(8000, 16000), (22050, 16000), (48000, 16000), (24000, 8000)])
+def test_resample_matches_resample_poly(orig_sr, target_sr):
+    audio = _tone(orig_sr)
+    resampled = resample(audio, orig_sr, target_sr)
+    reference = resample_poly(audio, target_sr, orig_sr)
+    assert resampled.dtype == np.float32
+    assert len(resampled) == len(reference)
+    assert np.max(np.abs(resampled - reference)) < 1e-4
+
+
+def test_resample_edge_cases():
+    audio = _tone(16000, 0.01)
+    assert resample(audio, 16000, 16000) is audio
+    # Inputs shorter than the filter still get the full output length
+    assert len(resample(audio[:3], 48000, 16000)) == 1
+    assert len(resample(np.zeros(0, dtype=np.float32), 8000, 16000)) == 0
+
+
+def test_filter_is_designed_once_per_rate_pair():
+    _polyphase_filter.cache_clear()
+    for _ in range(3):
+        resample(_tone(8000, 0.1), 8000, 16000)
+    info = _polyphase_filter.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+    taps, _ = _polyphase_filter(2, 1)
+    assert not taps.flags.writeable
+
+
+def test_pcm16_conversions_and_downmix():
+    samples = np.array([-32768, -1, 0, 1, 32767], dtype='<i2')
+    audio = pcm16_to_float32(samples.tobytes())
+    assert audio.dtype == np.float32 and audio[0] == -1.0 and audio[2] == 0.0
+    assert np.array_equal(float32_to_int16(np.array([-2.0, 0.0, 0.5, 2.0], dtype=np.float32)), [-32767, 0, 16383, 32767])
+
+    stereo = np.array([[0.2, 0.4], [-1.0, 1.0]], dtype=np.float32)
+    assert np.allclose(to_mono(stereo), [0.3, 0.0])
+    assert to_mono(stereo[:, :1]).tolist() == pytest.approx([0.2, -1.0])
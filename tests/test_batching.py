@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+import pytest
+
+from speech_to_text import whisper_handler
+from speech_to_text.batching import WhisperBatcher
+
+
+def test_requests_are_grouped_by_decoder_prompt(monkeypatch):
+    calls = []
+    first_batch_started, release = threading.Event(), threading.Event()
+
+    def transcribe_batch(audio_inputs, language="persian", task="transcribe"):
+        calls.append((language, task, len(audio_inputs)))
+        if len(calls) == 1:
+            first_batch_started.set()
+            release.wait(5)
+        return [f"{language}/{task}/{int(audio[0])}" for audio in audio_inputs]
+
+    monkeypatch.setattr(whisper_handler, "transcribe_batch", transcribe_batch)
+    batcher = WhisperBatcher(max_batch_size=8, max_wait_ms=100)
+
+    # The worker is busy with the first request while the others queue up
+    blocker = batcher.submit(np.zeros(10, dtype=np.float32), "english")
+    assert first_batch_started.wait(5)
+    requests = [
+        (number, language, task)
+        for number, (language, task) in enumerate([("english", "transcribe"), ("persian", "transcribe"),
+                                                    ("english", "transcribe"), ("english", "translate")], start=1)
+    ]
+    futures = [batcher.submit(np.full(10, number, dtype=np.float32), language, task) for number, language, task in requests]
+    release.set()
+
+    assert blocker.result(timeout=5) == "english/transcribe/0"
+    assert [future.result(timeout=5) for future in futures] == [
+        f"{language}/{task}/{number}" for number, language, task in requests
+    ]
+    assert sorted(calls[1:]) == [("english", "transcribe", 2), ("english", "translate", 1), ("persian", "transcribe", 1)]
+    assert batcher.stats()["requests"] == 5
+
+
+def test_a_failed_batch_fails_only_its_callers(monkeypatch):
+    def transcribe_batch(audio_inputs, language="persian", task="transcribe"):
+        if language == "persian":
+            raise RuntimeError("decoder failed")
+        return ["ok"] * len(audio_inputs)
+
+    monkeypatch.setattr(whisper_handler, "transcribe_batch", transcribe_batch)
+    batcher = WhisperBatcher(max_batch_size=8, max_wait_ms=50)
+    failing = batcher.submit(np.zeros(10, dtype=np.float32), "persian")
+    working = batcher.submit(np.zeros(10, dtype=np.float32), "english")
+    with pytest.raises(RuntimeError):
+        failing.result(timeout=5)
+    assert working.result(timeout=5) == "ok"
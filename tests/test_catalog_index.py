@@ -0,0 +1,116 @@
+import random
+import re
+
+import pandas as pd
+import pytest
+
+from nlp_engine.catalog_index import CatalogIndex, _scan_best_match, get_keywords_from_text, make_synthetic_catalog
+
+
+def _scan_best_title(products_df, requested_name):
+    """The original "I want a ..." loop of generate_response, kept as the reference."""
+    best_position = None
+    best_title = None
+    highest_score = -1
+    word_pattern = re.compile(r'\b' + re.escape(requested_name) + r'\b')
+    for position, (_, row) in enumerate(products_df.iterrows()):
+        title = str(row.get('title', '')).lower()
+        score = 0
+        if title == requested_name:
+            score = 1000
+        elif title.startswith(requested_name):
+            score = 500 + (len(requested_name) / max(1, len(title))) * 100
+        elif word_pattern.search(title):
+            score = 300 + (len(requested_name) / max(1, len(title))) * 50
+        elif requested_name in title:
+            score = 100 + (len(requested_name) / max(1, len(title))) * 20
+        if score > highest_score:
+            highest_score, best_position, best_title = score, position, title
+        elif score == highest_score and best_position is not None and len(title) < len(best_title):
+            best_position, best_title = position, title
+    return best_position, highest_score
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    df = make_synthetic_catalog(200, seed=3)
+    # A few hand-made rows: duplicate titles, missing fields and a title inside another one
+    extra = pd.DataFrame([
+        {"id": 9001, "title": "Smart Lamp", "description": "a lamp", "variation": "white", "category": "Smart Home"},
+        {"id": 9002, "title": "Smart Lamp Pro", "description": None, "variation": None, "category": "Smart Home"},
+        {"id": 9003, "title": "Lamp", "description": "desk lamp", "variation": "black", "category": None},
+        {"id": 9004, "title": "Smart Lamp", "description": "duplicate title", "variation": "red", "category": "Beauty"},
+    ])
+    return pd.concat([df, extra], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def index(catalog):
+    return CatalogIndex(catalog)
+
+
+def _messages(catalog, rng, count):
+    vocabulary = sorted({word for text in catalog["description"].dropna() for word in get_keywords_from_text(text)})
+    titles = catalog["title"].str.lower().tolist()
+    variations = catalog["variation"].dropna().str.lower().unique().tolist()
+    messages = []
+    for _ in range(count):
+        words = rng.sample(vocabulary, rng.randint(0, 4))
+        if rng.random() < 0.5:
+            words.append(rng.choice(titles))
+        if rng.random() < 0.3:
+            words.append(rng.choice(variations))
+        rng.shuffle(words)
+        messages.append(" ".join(["do you have"] + words))
+    return messages
+
+
+def test_keyword_match_equals_scan(catalog, index):
+    rng = random.Random(0)
+    for message in _messages(catalog, rng, 120) + ["", "nothing matches here zzz", "smart lamp in white"]:
+        assert index.best_keyword_match(message) == _scan_best_match(catalog, message), message
+
+
+def test_title_match_equals_scan(catalog, index):
+    rng = random.Random(1)
+    titles = catalog["title"].str.lower().tolist()
+    names = ["smart lamp", "lamp", "smart", "amp", "lamp pro", "zzz", "a", "mp pr"]
+    for _ in range(80):
+        title = rng.choice(titles)
+        start = rng.randrange(len(title))
+        names.append(title[start:start + rng.randint(1, 12)].strip() or title)
+        names.append(title)
+        names.append(" ".join(title.split()[:2]))
+    for name in names:
+        expected_position, expected_score = _scan_best_title(catalog, name)
+        position, score = index.best_title_match(name)
+        if expected_score <= 0:
+            assert position is None, name
+            continue
+        assert position == expected_position, name
+        assert score == pytest.approx(expected_score), name
+
+
+def test_position_for_id_returns_first_product(index, catalog):
+    assert index.position_for_id(9001) == catalog.index[catalog["id"] == 9001][0]
+    assert index.position_for_id(123456789) is None
+
+
+def test_related_positions_exclude_product_and_prefer_category(index, catalog):
+    position = index.position_for_id(9001)
+    related = index.related_positions(position, 6)
+    assert len(related) == 6
+    assert len({catalog.iloc[candidate]["id"] for candidate in related}) == 6
+    assert all(catalog.iloc[candidate]["id"] != 9001 for candidate in related)
+    same_category = [candidate for candidate in range(len(catalog))
+                     if catalog.iloc[candidate]["category"] == "Smart Home" and candidate != position]
+    assert related == same_category[:6]
+    # Served from the memo table afterwards
+    assert index.related_positions(position, 6) is related
+
+
+def test_related_positions_fill_from_keywords_without_category(index):
+    position = index.position_for_id(9003)
+    related = index.related_positions(position, 3)
+    assert 0 < len(related) <= 3
+    assert position not in related
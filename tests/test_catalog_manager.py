@@ -0,0 +1,147 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from nlp_engine import catalog_manager as catalog_manager_module
+from nlp_engine.catalog_index import make_synthetic_catalog
+from nlp_engine.catalog_manager import CatalogManager, file_sha256
+
+
+@pytest.fixture
+def catalog_paths(tmp_path):
+    csv_path = str(tmp_path / "products.csv")
+    make_synthetic_catalog(50, seed=1).to_csv(csv_path, index=False)
+    return csv_path, str(tmp_path / "snapshots")
+
+
+def _rewrite_csv(csv_path: str, num_products: int, seed: int):
+    make_synthetic_catalog(num_products, seed=seed).to_csv(csv_path, index=False)
+    # A later mtime even on file systems with coarse timestamps
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+
+
+def test_cold_start_uses_the_snapshot_while_the_csv_is_unchanged(catalog_paths):
+    csv_path, snapshot_dir = catalog_paths
+    first = CatalogManager(csv_path, snapshot_dir)
+    assert first.ensure_loaded()["source"] == "csv"
+
+    second = CatalogManager(csv_path, snapshot_dir)
+    assert second.ensure_loaded()["source"] == "snapshot"
+    assert second.current.df.equals(first.current.df)
+    query = "do you have a wireless headphone"
+    assert second.current.index.best_keyword_match(query) == first.current.index.best_keyword_match(query)
+    assert second.current.index.related_positions(0) == first.current.index.related_positions(0)
+
+    _rewrite_csv(csv_path, 60, seed=2)
+    third = CatalogManager(csv_path, snapshot_dir)
+    info = third.ensure_loaded()
+    assert (info["source"], info["products"]) == ("csv", 60)
+
+
+def test_snapshot_holds_no_pickles_and_only_the_current_version(catalog_paths):
+    csv_path, snapshot_dir = catalog_paths
+    first = CatalogManager(csv_path, snapshot_dir)
+    first.ensure_loaded()
+    _rewrite_csv(csv_path, 60, seed=2)
+    first.reload()
+    assert os.listdir(snapshot_dir) == [first.current.source_sha256]
+
+    path = os.path.join(snapshot_dir, first.current.source_sha256)
+    assert all(name.endswith((".json", ".parquet", ".npy")) for name in os.listdir(path))
+    second = CatalogManager(csv_path, snapshot_dir)
+    assert second.ensure_loaded()["source"] == "snapshot"
+    built, loaded = first.current.index.posting_tables(), second.current.index.posting_tables()
+    for name, table in built.items():
+        assert table.keys() == loaded[name].keys()
+        assert all(np.array_equal(table[key], loaded[name][key]) for key in table)
+
+
+def test_a_damaged_snapshot_falls_back_to_the_csv(catalog_paths, caplog):
+    csv_path, snapshot_dir = catalog_paths
+    CatalogManager(csv_path, snapshot_dir).ensure_loaded()
+    positions_file = os.path.join(snapshot_dir, file_sha256(csv_path), "_postings.positions.npy")
+    np.save(positions_file, np.zeros(3, dtype=np.int32))
+
+    manager = CatalogManager(csv_path, snapshot_dir)
+    assert manager.ensure_loaded()["source"] == "csv"
+    assert "Ignoring unreadable catalog snapshot" in caplog.text
+    # Rewritten from the CSV, so the next start uses it again
+    assert CatalogManager(csv_path, snapshot_dir).ensure_loaded()["source"] == "snapshot"
+
+
+def test_reload_swaps_in_a_new_version(catalog_paths):
+    csv_path, snapshot_dir = catalog_paths
+    swaps = []
+    manager = CatalogManager(csv_path, snapshot_dir, on_swap=swaps.append)
+    manager.ensure_loaded()
+    before = manager.current
+
+    _rewrite_csv(csv_path, 70, seed=3)
+    info = manager.reload()
+    assert (info["version"], info["products"], info["source"]) == (2, 70, "csv")
+    assert [snapshot.version for snapshot in swaps] == [1, 2]
+    # Readers holding the previous snapshot keep a consistent catalog
+    assert len(before.df) == 50 and len(before.index.df) == 50
+
+
+def test_failed_reload_keeps_the_catalog_in_use(catalog_paths):
+    csv_path, snapshot_dir = catalog_paths
+    manager = CatalogManager(csv_path, snapshot_dir)
+    manager.ensure_loaded()
+    os.remove(csv_path)
+    with pytest.raises(FileNotFoundError):
+        manager.reload()
+    assert manager.current.version == 1 and len(manager.current.df) == 50
+    assert manager.stats()["last_error"]
+
+
+def test_watcher_reloads_a_changed_file(catalog_paths):
+    csv_path, snapshot_dir = catalog_paths
+    manager = CatalogManager(csv_path, snapshot_dir)
+    manager.ensure_loaded()
+    manager.start_watching(0.05)
+    try:
+        _rewrite_csv(csv_path, 80, seed=4)
+        deadline = time.monotonic() + 5
+        while manager.current.version == 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        manager.stop_watching()
+    assert manager.current.version == 2 and len(manager.current.df) == 80
+
+
+def test_first_load_of_a_missing_csv_raises_and_publishes_nothing(tmp_path):
+    swaps = []
+    manager = CatalogManager(str(tmp_path / "missing.csv"), str(tmp_path / "snapshots"), on_swap=swaps.append)
+    with pytest.raises(FileNotFoundError):
+        manager.ensure_loaded()
+    assert not manager.loaded and swaps == []
+    assert manager.stats()["last_error"]
+
+
+def test_watcher_survives_a_file_it_cannot_read(catalog_paths, monkeypatch, caplog):
+    csv_path, snapshot_dir = catalog_paths
+    manager = CatalogManager(csv_path, snapshot_dir)
+    manager.ensure_loaded()
+    failures = []
+
+    def flaky_sha256(path):
+        if not failures:
+            failures.append(path)
+            raise PermissionError(f"cannot open {path}")
+        return file_sha256(path)
+
+    monkeypatch.setattr(catalog_manager_module, "file_sha256", flaky_sha256)
+    manager.start_watching(0.05)
+    try:
+        _rewrite_csv(csv_path, 80, seed=4)
+        deadline = time.monotonic() + 5
+        while manager.current.version == 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        manager.stop_watching()
+    assert failures and "Could not read catalog file" in caplog.text
+    assert manager.current.version == 2 and len(manager.current.df) == 80
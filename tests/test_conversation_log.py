@@ -0,0 +1,95 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+
+from logs.store import ACTIVE_FILE_NAME, SEGMENT_PREFIX, ConversationLogWriter
+
+
+def _read_lines(path: str) -> list:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def _wait_for_compression(directory: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while any(name.endswith((".jsonl", ".tmp")) and name != ACTIVE_FILE_NAME for name in os.listdir(directory)):
+        assert time.monotonic() < deadline, "segments were not compressed"
+        time.sleep(0.01)
+
+
+def test_close_writes_every_queued_record(tmp_path):
+    writer = ConversationLogWriter(str(tmp_path), flush_seconds=60)
+    for number in range(100):
+        assert writer.write({"turn": number, "user": "سلام"})
+    writer.close()
+    records = _read_lines(str(tmp_path / ACTIVE_FILE_NAME))
+    assert [record["turn"] for record in records] == list(range(100))
+    assert records[0]["user"] == "سلام"
+    assert writer.stats()["written"] == 100
+
+
+def test_rotated_segments_are_compressed_and_keep_every_record(tmp_path):
+    writer = ConversationLogWriter(str(tmp_path), max_bytes=2000, flush_seconds=0.01, compression="gzip")
+    for number in range(200):
+        writer.write({"turn": number, "text": "x" * 40})
+        if number % 20 == 19:
+            time.sleep(0.02)  # let the writer take several batches
+    writer.close()
+    _wait_for_compression(str(tmp_path))
+
+    segments = sorted(name for name in os.listdir(tmp_path) if name.startswith(SEGMENT_PREFIX))
+    assert segments and all(name.endswith(".jsonl.gz") for name in segments)
+    assert writer.stats()["rotations"] == len(segments)
+    turns = []
+    for name in segments:
+        turns += [record["turn"] for record in _read_lines(str(tmp_path / name))]
+    if (tmp_path / ACTIVE_FILE_NAME).exists():
+        turns += [record["turn"] for record in _read_lines(str(tmp_path / ACTIVE_FILE_NAME))]
+    assert turns == list(range(200))
+
+
+def test_full_queue_drops_and_counts(tmp_path, monkeypatch):
+    writer = ConversationLogWriter(str(tmp_path), max_queue=2)
+    monkeypatch.setattr(writer, "start", lambda: None)  # no writer thread, so the queue stays full
+    assert [writer.write({"turn": number}) for number in range(4)] == [True, True, False, False]
+    assert writer.stats()["dropped"] == 2
+
+
+def test_block_waits_in_threads_but_never_on_the_event_loop(tmp_path, monkeypatch):
+    writer = ConversationLogWriter(str(tmp_path), max_queue=1, overflow="block", block_seconds=0.5)
+    monkeypatch.setattr(writer, "start", lambda: None)
+    assert writer.write({"turn": 0})
+
+    started = time.monotonic()
+    assert not writer.write({"turn": 1})
+    assert time.monotonic() - started >= 0.4
+
+    async def from_a_coroutine():
+        started = time.monotonic()
+        written = writer.write({"turn": 2})
+        return written, time.monotonic() - started
+
+    written, seconds = asyncio.run(from_a_coroutine())
+    assert not written and seconds < 0.1
+    assert writer.stats()["dropped"] == 2
+
+
+def test_drops_from_many_threads_are_all_counted(tmp_path, monkeypatch):
+    writer = ConversationLogWriter(str(tmp_path), max_queue=1)
+    monkeypatch.setattr(writer, "start", lambda: None)
+    writer.write({"turn": 0})
+
+    def write_many():
+        for number in range(2000):
+            writer.write({"turn": number})
+
+    threads = [threading.Thread(target=write_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert writer.stats()["dropped"] == 8 * 2000
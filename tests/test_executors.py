@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.executors import StageExecutor, StageSaturated
+
+
+def _blocking_job(started: threading.Event, release: threading.Event):
+    def job():
+        started.set()
+        release.wait(5)
+        return "done"
+    return job
+
+
+async def _wait_until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+
+def test_admits_up_to_workers_plus_queue_then_rejects():
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=1)
+        started, release = threading.Event(), threading.Event()
+        running = asyncio.create_task(stage.run(_blocking_job(started, release)))
+        queued = asyncio.create_task(stage.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(StageSaturated):
+            await stage.run(lambda: "rejected")
+        release.set()
+        assert await running == "done"
+        assert await queued == "queued"
+        return stage.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["completed"], stats["rejected"]) == (0, 2, 1)
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_job_ends():
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=0)
+        started, release = threading.Event(), threading.Event()
+        caller = asyncio.create_task(stage.run(_blocking_job(started, release)))
+        await asyncio.to_thread(started.wait, 5)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        # The job still runs on the pool, so the stage is still full
+        assert stage.stats()["in_flight"] == 1
+        with pytest.raises(StageSaturated):
+            await stage.run(lambda: None)
+        release.set()
+        await _wait_until(lambda: stage.stats()["in_flight"] == 0)
+        assert await stage.run(lambda: "free again") == "free again"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_before_start_frees_the_slot():
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=1)
+        started, release = threading.Event(), threading.Event()
+        running = asyncio.create_task(stage.run(_blocking_job(started, release)))
+        await asyncio.to_thread(started.wait, 5)
+        waiting = asyncio.create_task(stage.run(lambda: "never"))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        await _wait_until(lambda: stage.stats()["in_flight"] == 1)
+        release.set()
+        await running
+        await _wait_until(lambda: stage.stats()["in_flight"] == 0)
+
+    asyncio.run(scenario())
+
+
+def test_stream_yields_items_and_releases():
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=0)
+        items = [item async for item in stage.open_stream(iter([1, 2, 3]))]
+        return items, stage.stats()
+
+    items, stats = asyncio.run(scenario())
+    assert items == [1, 2, 3]
+    assert (stats["in_flight"], stats["completed"]) == (0, 1)
+
+
+def test_stream_that_is_never_iterated_holds_no_slot():
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=0)
+        stream = stage.open_stream(iter([1]))
+        assert stage.stats()["in_flight"] == 0
+        assert await stage.run(lambda: "ok") == "ok"
+        del stream
+        return stage.stats()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
+
+
+def test_stream_is_rejected_when_the_stage_is_full():
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=0)
+        started, release = threading.Event(), threading.Event()
+        running = asyncio.create_task(stage.run(_blocking_job(started, release)))
+        await asyncio.to_thread(started.wait, 5)
+        with pytest.raises(StageSaturated):
+            stage.open_stream(iter([1]))
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_stream_closes_the_iterator_after_the_running_item():
+    closed = threading.Event()
+    started, release = threading.Event(), threading.Event()
+
+    def produce():
+        try:
+            yield 1
+            started.set()
+            release.wait(5)
+            yield 2
+        finally:
+            closed.set()
+
+    async def scenario():
+        stage = StageExecutor("test", max_workers=1, max_queue=0)
+
+        async def consume():
+            async for _ in stage.open_stream(produce()):
+                pass
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.to_thread(started.wait, 5)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        assert stage.stats()["in_flight"] == 1
+        assert not closed.is_set()
+        release.set()
+        await _wait_until(lambda: stage.stats()["in_flight"] == 0)
+        assert closed.is_set()
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+import random
+import re
+
+from nlp_engine.intent_classifier import (
+    GREETING, INTENT_RULES, PREFIX, PRODUCT_INDICATOR, IntentClassifier, _substring_scan, classify_intents,
+)
+
+
+def _rule_loop(message_lower, rules=INTENT_RULES):
+    """One regex search per rule phrase, in priority order: what the compiled matcher must agree with."""
+    matched = {}
+    for intent, priority, mode, phrases in rules:
+        for phrase in phrases:
+            pattern = r'\b' + re.escape(phrase) + ('' if mode == PREFIX else r'\b')
+            if re.search(pattern, message_lower):
+                matched.setdefault(intent, priority)
+                break
+    return sorted(matched, key=matched.get)
+
+
+def _fuzz_messages(count, seed=0):
+    rng = random.Random(seed)
+    phrases = [phrase for _, _, _, rule_phrases in INTENT_RULES for phrase in rule_phrases]
+    fillers = ["the", "this", "a", "shipping", "headphones", "okapi", "hint", "news.", "hi!", "xyz", "s", "ed"]
+    messages = []
+    for _ in range(count):
+        parts = [rng.choice(phrases) if rng.random() < 0.6 else rng.choice(fillers) for _ in range(rng.randint(1, 6))]
+        # Glue some parts together so phrases also appear inside longer words
+        message = ""
+        for part in parts:
+            message += ("" if rng.random() < 0.2 else " ") + part
+        messages.append(message.strip())
+    return messages
+
+
+def test_compiled_matcher_equals_rule_loop():
+    classifier = IntentClassifier()
+    for message in _fuzz_messages(3000):
+        assert classifier.classify(message) == _rule_loop(message), message
+
+
+def test_agrees_with_substring_scan_on_whole_words():
+    messages = [
+        "hello there",
+        "what do you sell",
+        "how much is the wireless headphone",
+        "tell me about rome",
+        "thanks, that is all for today",
+        "do you have the black office chair in stock",
+    ]
+    for message in messages:
+        assert classify_intents(message) == _substring_scan(message), message
+
+
+def test_word_rules_need_whole_words():
+    # The old substring tests answered "this" and "history" with a greeting
+    assert GREETING not in classify_intents("is this in stock")
+    assert GREETING not in classify_intents("history of rome")
+    assert GREETING in classify_intents("hi, is this in stock")
+
+
+def test_prefix_rules_match_longer_words():
+    assert PRODUCT_INDICATOR in classify_intents("do you sell headphones")
+    assert PRODUCT_INDICATOR not in classify_intents("unwatched")
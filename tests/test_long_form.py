@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from speech_to_text.long_form import SAMPLE_RATE, iter_file_windows, iter_windows, merge_overlap
+from utils.audio_utils import resample
+
+
+def _windows(seconds, window_seconds, overlap_seconds, split_on_silence, audio=None):
+    if audio is None:
+        audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    return [(start, end) for start, end, _ in iter_windows(audio, window_seconds, overlap_seconds, split_on_silence)]
+
+
+def test_overlapping_windows_cover_the_audio():
+    windows = _windows(70, 30, 5, False)
+    assert windows == [(0, 30 * SAMPLE_RATE), (25 * SAMPLE_RATE, 55 * SAMPLE_RATE), (50 * SAMPLE_RATE, 70 * SAMPLE_RATE)]
+
+
+def test_short_and_empty_audio():
+    assert _windows(10, 30, 5, False) == [(0, 10 * SAMPLE_RATE)]
+    assert _windows(0, 30, 5, False) == []
+
+
+@pytest.mark.parametrize("split_on_silence", [False, True])
+def test_windows_always_move_forward(split_on_silence):
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, 95 * SAMPLE_RATE).astype(np.float32)
+    windows = _windows(95, 30, 29.9, split_on_silence, audio)
+    assert windows[-1][1] == len(audio)
+    assert all(start < next_start for (start, _), (next_start, _) in zip(windows, windows[1:]))
+    assert all(end - start <= 30 * SAMPLE_RATE for start, end in windows)
+
+
+def test_split_on_silence_cuts_at_the_quiet_point():
+    audio = np.full(50 * SAMPLE_RATE, 0.5, dtype=np.float32)
+    quiet = 27 * SAMPLE_RATE
+    audio[quiet:quiet + SAMPLE_RATE // 10] = 0.0
+    windows = _windows(50, 30, 5, True, audio)
+    assert len(windows) == 2
+    assert quiet <= windows[0][1] <= quiet + SAMPLE_RATE // 10
+    assert windows[1][0] == windows[0][1]
+
+
+@pytest.mark.parametrize("overlap_seconds", [30, 45, -1])
+def test_invalid_overlap_is_rejected(overlap_seconds):
+    with pytest.raises(ValueError):
+        _windows(70, 30, overlap_seconds, False)
+
+
+@pytest.mark.parametrize("file_rate", [8000, 48000])
+def test_file_windows_match_the_resampled_file_without_seams(tmp_path, file_rate):
+    seconds = 70
+    audio = (0.5 * np.sin(2 * np.pi * 440 * np.arange(seconds * file_rate) / file_rate)).astype(np.float32)
+    path = str(tmp_path / "long.wav")
+    sf.write(path, audio, file_rate, subtype="FLOAT")
+
+    whole = resample(audio, file_rate, SAMPLE_RATE)
+    windows = list(iter_file_windows(path, 30, 5, False))
+    assert [(start, end) for start, end, _ in windows] == _windows(seconds, 30, 5, False)
+    edge = 64  # only the filter's reach at each end of a window may differ
+    for start, end, window_audio in windows:
+        assert len(window_audio) == end - start
+        assert np.max(np.abs(window_audio[edge:-edge] - whole[start + edge:end - edge])) < 1e-4
+
+
+def test_merge_overlap_drops_repeated_words():
+    assert merge_overlap("we sell wireless headphones in black", "Headphones in black, and white.") == "and white."
+    assert merge_overlap("the quick brown fox", "jumps over") == "jumps over"
+    assert merge_overlap("", "hello world") == "hello world"
+    assert merge_overlap("a b c", "a b c") == ""
@@ -0,0 +1,76 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils.metrics import COUNTER, HTTP_REQUEST_SECONDS, MetricsMiddleware, MetricsRegistry, route_template
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("demo_requests", "Requests.", ["route"])
+    depth = registry.gauge("demo_depth", "Queue depth.")
+    latency = registry.histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.labels('/say "hi"').inc()
+    requests.labels('/say "hi"').inc(2)
+    depth.set(4)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    def collector():
+        yield "demo_cache_hits", COUNTER, "Cache hits.", [({"cache": "tts"}, 7)]
+
+    def broken_collector():
+        raise RuntimeError("stats unavailable")
+
+    registry.add_collector(collector)
+    registry.add_collector(broken_collector)
+    lines = registry.render().splitlines()
+
+    assert "# TYPE demo_requests counter" in lines
+    assert 'demo_requests_total{route="/say \\"hi\\""} 3.0' in lines
+    assert "demo_depth 4" in lines
+    assert [line for line in lines if line.startswith("demo_seconds")] == [
+        'demo_seconds_bucket{le="0.1"} 2',
+        'demo_seconds_bucket{le="1.0"} 3',
+        'demo_seconds_bucket{le="+Inf"} 4',
+        "demo_seconds_sum 3.65",
+        "demo_seconds_count 4",
+    ]
+    assert 'demo_cache_hits_total{cache="tts"} 7' in lines
+    assert any(line.startswith("# collector broken_collector failed") for line in lines)
+
+
+def test_labels_are_checked_and_names_are_unique():
+    registry = MetricsRegistry()
+    metric = registry.counter("demo_things", "Things.", ["kind"])
+    with pytest.raises(ValueError):
+        metric.labels()
+    with pytest.raises(ValueError):
+        registry.gauge("demo_things", "Again.")
+
+
+def test_route_template_replaces_path_parameter_values():
+    route = object()
+    assert route_template({"path": "/static/audio/ab/tts_ab12.wav", "route": route,
+                           "path_params": {"file_path": "ab/tts_ab12.wav"}}) == "/static/audio/{file_path}"
+    assert route_template({"path": "/api/items/7/7", "route": route,
+                           "path_params": {"group": "7", "item": "7"}}) == "/api/items/{group}/{item}"
+    assert route_template({"path": "/api/health", "route": route}) == "/api/health"
+    assert route_template({"path": "/nowhere"}) == "unmatched"
+
+
+def test_middleware_records_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/demo_products/{product_id}")
+    async def product(product_id: int):
+        return {"id": product_id}
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    for product_id in (1, 2, 3):
+        assert client.get(f"/demo_products/{product_id}").status_code == 200
+    assert client.get("/demo_missing").status_code == 404
+
+    assert HTTP_REQUEST_SECONDS.labels("GET", "/demo_products/{product_id}", 200).count == 3
+    assert HTTP_REQUEST_SECONDS.labels("GET", "unmatched", 404).count == 1
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from nlp_engine.reply import CATEGORY_LISTING, FALLBACK, PRODUCT_MATCH, ChatReply, ProductSummary
+
+
+def _summary(product_id: int, title: str, price=None, category="Audio") -> ProductSummary:
+    return ProductSummary(id=product_id, title=title, price=price, category=category)
+
+
+def test_from_row_converts_numpy_values_and_missing_fields():
+    row = pd.Series({"id": np.int64(7), "title": "Desk Lamp", "price": np.float64(19.5), "category": np.nan,
+                     "image-url": "https://example.com/lamp.jpg"})
+    summary = ProductSummary.from_row(row)
+    assert summary == ProductSummary(id=7, title="Desk Lamp", price=19.5, category=None, url=None,
+                                     image_url="https://example.com/lamp.jpg")
+    assert type(summary.id) is int and type(summary.price) is float
+
+
+def test_spoken_text_reads_the_product_and_two_related():
+    reply = ChatReply(
+        intent=PRODUCT_MATCH,
+        reply="<div>card</div>",
+        products=(_summary(1, "Wireless Headphones", 59),),
+        related=(_summary(2, "Headphone Stand", 15), _summary(3, "Ear Pads"), _summary(4, "Cable", 5)),
+    )
+    assert reply.spoken_text() == (
+        "Wireless Headphones, price 59 dollars. Related products: Headphone Stand, price 15 dollars; Ear Pads."
+    )
+    assert (reply.product_ids, reply.related_ids) == ([1], [2, 3, 4])
+
+
+def test_spoken_text_for_listings_and_plain_replies():
+    listing = ChatReply(
+        intent=CATEGORY_LISTING,
+        reply="<ul></ul>",
+        products=(_summary(1, "Lamp", 10), _summary(2, "Chair", 40), _summary(3, "Desk", 90)),
+        category="Furniture",
+    )
+    assert listing.spoken_text() == "In the Furniture category, we have Lamp, price 10 dollars; Chair, price 40 dollars."
+    assert ChatReply(intent=FALLBACK, reply="Sorry, I did not find that.").spoken_text() == "Sorry, I did not find that."
+
+
+def test_to_dict_is_json_serializable():
+    reply = ChatReply(intent=PRODUCT_MATCH, reply="card", products=(_summary(1, "Lamp", 10),))
+    payload = json.loads(json.dumps(reply.to_dict()))
+    assert payload["intent"] == PRODUCT_MATCH
+    assert payload["products"][0]["title"] == "Lamp"
+    assert payload["related"] == [] and payload["category"] is None
@@ -0,0 +1,56 @@
+from nlp_engine import response_cache as response_cache_module
+from nlp_engine.response_cache import ResponseCache, normalize_message
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_put_replaces_and_refreshes_an_entry():
+    cache = ResponseCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(capacity=10, ttl_seconds=5)
+    cache.put("a", 1)
+    now[0] += 4.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_counters_and_zero_capacity():
+    cache = ResponseCache(capacity=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"], stats["hit_rate"]) == (0, 1, 0, 0.0)
+
+    cache = ResponseCache(capacity=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert cache.stats()["hit_rate"] == 0.5
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_normalize_message_ignores_case_and_spacing():
+    assert normalize_message("  Do you   have\tHEADPHONES? ") == "do you have headphones?"
@@ -0,0 +1,35 @@
+import pytest
+
+from nlp_engine import response_generator
+from nlp_engine.catalog_index import make_synthetic_catalog
+from nlp_engine.catalog_manager import CatalogManager
+from nlp_engine.reply import CATEGORY_LISTING, FALLBACK
+from nlp_engine.response_cache import ResponseCache, normalize_message
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    manager = CatalogManager(csv_path=None)
+    manager.load_dataframe(make_synthetic_catalog(200, seed=3))
+    monkeypatch.setattr(response_generator, "catalog_manager", manager)
+    monkeypatch.setattr(response_generator, "response_cache", ResponseCache(capacity=100))
+    return manager.current
+
+
+def test_cached_reply_is_the_reply_to_the_normalized_message(catalog):
+    title = catalog.df["title"][5]
+    product_id = int(catalog.df["id"][7])
+    for message in [f"Do you have the  {title.upper()}?", f"I want a   {title}", "  Hello there",
+                    f"product {product_id}", "what is the capital of France", "Show me SMART   HOME"]:
+        expected = response_generator.build_reply(normalize_message(message), catalog)
+        assert response_generator.build_cached_reply(message) == expected
+
+
+def test_spellings_of_a_message_share_one_entry_and_one_reply(catalog):
+    # Taken literally the extra spaces hide the category; normalized, every spelling lists it
+    assert response_generator.build_reply("Show me SMART   HOME", catalog).intent == FALLBACK
+    replies = [response_generator.build_cached_reply(message)
+               for message in ["Show me SMART   HOME", "show me smart home", " SHOW  me Smart Home "]]
+    assert all(reply.intent == CATEGORY_LISTING and reply == replies[0] for reply in replies)
+    stats = response_generator.response_cache.stats()
+    assert (stats["size"], stats["misses"], stats["hits"]) == (1, 1, 2)
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from api_interface import routes
+from utils.startup import FAILED, READY, ComponentNotReady, StartupLoader
+
+
+def test_components_load_concurrently_and_only_required_ones_gate_readiness():
+    both_running = threading.Barrier(2, timeout=5)
+    release_speech = threading.Event()
+
+    def load_catalog():
+        both_running.wait()
+        return {"products": 3}
+
+    def load_speech():
+        both_running.wait()
+        release_speech.wait(5)
+
+    loader = StartupLoader()
+    loader.register("catalog", load_catalog, required=True)
+    loader.register("whisper", load_speech)
+    loader.start()
+
+    assert loader.wait("catalog", timeout=5)
+    status = loader.status()
+    assert (status["ready"], status["all_ready"]) == (True, False)
+    assert status["components"]["catalog"]["details"] == {"products": 3}
+    with pytest.raises(ComponentNotReady) as error:
+        loader.require("whisper")
+    assert error.value.state == "loading"
+
+    release_speech.set()
+    assert loader.wait("whisper", timeout=5)
+    assert loader.status()["all_ready"]
+    loader.require("whisper")
+    loader.require("not_registered")
+
+
+def test_a_failed_loader_is_reported():
+    def broken():
+        raise RuntimeError("model file missing")
+
+    loader = StartupLoader()
+    loader.register("tts", broken)
+    loader.start()
+    assert not loader.wait("tts", timeout=5)
+    component = loader.status()["components"]["tts"]
+    assert (component["state"], component["error"]) == (FAILED, "model file missing")
+    assert loader.state("catalog") != READY
+
+
+def test_ready_endpoint_follows_the_required_components(monkeypatch):
+    release = threading.Event()
+    loader = StartupLoader()
+    loader.register("catalog", lambda: release.wait(5), required=True)
+    monkeypatch.setattr(routes, "startup_loader", loader)
+
+    loader.start()
+    response = asyncio.run(routes.api_ready_check())
+    assert response.status_code == 503
+    assert json.loads(response.body)["components"]["catalog"]["state"] == "loading"
+
+    release.set()
+    assert loader.wait("catalog", timeout=5)
+    assert asyncio.run(routes.api_ready_check()).status_code == 200
@@ -0,0 +1,57 @@
+import numpy as np
+
+from speech_to_text.utils import EnergyVAD, RingBuffer
+
+
+def test_ring_buffer_keeps_the_newest_samples():
+    buffer = RingBuffer(5)
+    buffer.append(np.arange(3, dtype=np.float32))
+    assert buffer.read().tolist() == [0, 1, 2] and not buffer.full
+    buffer.append(np.arange(3, 7, dtype=np.float32))
+    assert buffer.full
+    assert buffer.read().tolist() == [2, 3, 4, 5, 6]
+    assert buffer.read(2).tolist() == [5, 6]
+
+    # A write longer than the capacity keeps only its tail
+    buffer.append(np.arange(10, 22, dtype=np.float32))
+    assert buffer.read().tolist() == [17, 18, 19, 20, 21]
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.read().tolist() == []
+
+
+def test_ring_buffer_matches_a_plain_list():
+    rng = np.random.default_rng(0)
+    buffer, reference = RingBuffer(64), []
+    for _ in range(200):
+        chunk = rng.standard_normal(int(rng.integers(0, 40))).astype(np.float32)
+        buffer.append(chunk)
+        reference = (reference + chunk.tolist())[-64:]
+        assert np.array_equal(buffer.read(), np.array(reference, dtype=np.float32))
+
+
+def _frames(vad: EnergyVAD, level: float, count: int) -> list:
+    rng = np.random.default_rng(1)
+    return [vad.process(rng.uniform(-level, level, vad.frame_size).astype(np.float32) * np.sqrt(3)) for _ in range(count)]
+
+
+def test_vad_starts_after_min_speech_and_ends_after_the_silence_hangover():
+    vad = EnergyVAD(frame_ms=30, min_speech_ms=90, end_silence_ms=300)
+    assert set(_frames(vad, 0.001, 20)) == {None}
+
+    events = _frames(vad, 0.2, 5)
+    assert events == [None, None, EnergyVAD.SPEECH_START, None, None] and vad.in_speech
+
+    # Short pauses inside the utterance do not end it
+    assert set(_frames(vad, 0.001, 9) + _frames(vad, 0.2, 2)) == {None}
+    events = _frames(vad, 0.001, 10)
+    assert events[-1] == EnergyVAD.SPEECH_END and set(events[:-1]) == {None}
+    assert not vad.in_speech
+
+
+def test_vad_noise_floor_rises_with_the_background():
+    quiet_room, noisy_room = EnergyVAD(min_rms=0.01, speech_ratio=3.0), EnergyVAD(min_rms=0.01, speech_ratio=3.0)
+    _frames(noisy_room, 0.009, 200)
+    assert noisy_room.noise_floor > 0.008
+    # A level that counts as speech in a quiet room is background once the floor has adapted
+    assert _frames(quiet_room, 0.02, 5)[2] == EnergyVAD.SPEECH_START
+    assert set(_frames(noisy_room, 0.02, 5)) == {None}
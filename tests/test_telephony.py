@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from voice_interface.twilio_handler import (
+    _ULAW_ENCODE, FRAME_BYTES, ULAW_SILENCE, FramePacketizer, float32_to_ulaw, ulaw_to_float32,
+)
+
+
+def test_tables_match_audioop():
+    audioop = pytest.importorskip("audioop")  # removed from the standard library in Python 3.13
+    every_code = bytes(range(256))
+    decoded = np.frombuffer(audioop.ulaw2lin(every_code, 2), dtype=np.int16)
+    assert np.array_equal(ulaw_to_float32(every_code), decoded.astype(np.float32) / 32768.0)
+
+    every_sample = np.arange(-32768, 32768, dtype=np.int16)
+    encoded = audioop.lin2ulaw(every_sample.tobytes(), 2)
+    assert _ULAW_ENCODE[every_sample.view(np.uint16)].tobytes() == encoded
+
+
+def test_round_trip():
+    every_code = bytes(range(256))
+    decoded = ulaw_to_float32(every_code)
+    # Every code decodes to a level that encodes back to itself (0x7F and 0xFF are both zero)
+    reencoded = float32_to_ulaw(decoded)
+    assert all(a == b or {a, b} == {0x7F, 0xFF} for a, b in zip(reencoded, every_code))
+
+    signal = 0.8 * np.sin(2 * np.pi * 440 * np.arange(8000) / 8000).astype(np.float32)
+    restored = ulaw_to_float32(float32_to_ulaw(signal))
+    # μ-law keeps about 2 % relative error over the whole range
+    assert np.max(np.abs(restored - signal)) < 0.02 * 0.8 + 1e-3
+    assert ulaw_to_float32(bytes([ULAW_SILENCE]))[0] == 0.0
+
+
+def test_packetizer_emits_fixed_frames_and_pads_the_last():
+    packetizer = FramePacketizer()
+    frames = packetizer.feed(b"\x01" * (FRAME_BYTES + 10)) + packetizer.feed(b"\x02" * (FRAME_BYTES - 5))
+    assert [len(frame) for frame in frames] == [FRAME_BYTES, FRAME_BYTES]
+    last = packetizer.flush()
+    assert len(last) == 1 and len(last[0]) == FRAME_BYTES
+    assert last[0] == b"\x02" * 5 + bytes([ULAW_SILENCE]) * (FRAME_BYTES - 5)
+    assert packetizer.flush() == []
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from text_to_speech import tts_cache as tts_cache_module
+from text_to_speech.audio_store import AudioStore
+from text_to_speech.tts_cache import TTSCache
+
+
+def _fake_synthesis(monkeypatch, delay: float = 0.0):
+    calls = []
+
+    def synthesize_speech(text, output_dir, file_name, voice=None, **kwargs):
+        calls.append(text)
+        time.sleep(delay)
+        (output_dir / file_name).write_bytes(text.encode("utf-8") * 10)
+
+    monkeypatch.setattr(tts_cache_module, "synthesize_speech", synthesize_speech)
+    return calls
+
+
+def test_repeated_text_is_synthesized_once(tmp_path, monkeypatch):
+    calls = _fake_synthesis(monkeypatch)
+    cache = TTSCache(AudioStore(str(tmp_path), max_bytes=10_000))
+    first = cache.get_audio_url("hello there")
+    assert cache.get_audio_url("hello there") == first
+    assert cache.get_audio_url("hello there", voice="other_voice") != first
+    assert calls == ["hello there", "hello there"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert not list(tmp_path.glob(".*"))  # no temporary files left behind
+
+
+def test_concurrent_requests_share_one_synthesis(tmp_path, monkeypatch):
+    calls = _fake_synthesis(monkeypatch, delay=0.05)
+    cache = TTSCache(AudioStore(str(tmp_path), max_bytes=10_000))
+    urls = []
+    threads = [threading.Thread(target=lambda: urls.append(cache.get_audio_url("same text"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["same text"]
+    assert len(set(urls)) == 1
+
+
+def test_a_failed_synthesis_reaches_every_waiter_and_is_retried(tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def failing_synthesis(text, output_dir, file_name, voice=None, **kwargs):
+        calls.append(text)
+        started.set()
+        release.wait(5)
+        raise RuntimeError("voice model crashed")
+
+    monkeypatch.setattr(tts_cache_module, "synthesize_speech", failing_synthesis)
+    cache = TTSCache(AudioStore(str(tmp_path), max_bytes=10_000))
+    errors = []
+
+    def request():
+        try:
+            cache.get_audio_url("same text")
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=request)
+    owner.start()
+    assert started.wait(5)
+    waiters = [threading.Thread(target=request) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    time.sleep(0.1)  # the waiters are blocked on the owner's synthesis
+    release.set()
+    for thread in [owner, *waiters]:
+        thread.join(5)
+    assert errors == ["voice model crashed"] * 5
+    assert calls == ["same text"]
+
+    calls_after_failure = _fake_synthesis(monkeypatch)
+    assert cache.get_audio_url("same text")
+    assert calls_after_failure == ["same text"]
+    assert not cache._pending
+
+
+def test_least_recently_used_unpinned_files_are_evicted(tmp_path, monkeypatch):
+    _fake_synthesis(monkeypatch)
+    # Each fake file is 100 bytes, so the store holds two of them
+    cache = TTSCache(AudioStore(str(tmp_path), max_bytes=250))
+    cache.get_audio_url("canned one", pin=True)
+    cache.get_audio_url("reply ten")
+    cache.get_audio_url("reply 11!")
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["pinned"]) == (2, 1, 1)
+    assert cache.get_audio_url("canned one") and cache.stats()["hits"] == 1
+    assert cache.get_audio_url("reply ten") and cache.stats()["misses"] == 4
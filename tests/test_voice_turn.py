@@ -0,0 +1,87 @@
+import io
+from urllib.parse import unquote
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import FastAPI
+
+pytest.importorskip("httpx")  # used by the test client
+from fastapi.testclient import TestClient
+
+from api_interface import routes
+from nlp_engine.reply import FALLBACK, ChatReply
+from speech_to_text.whisper_handler import TranscriptionError
+from utils.startup import StartupLoader
+
+
+def _wav_upload(seconds: float = 0.5) -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(16000 * seconds), dtype=np.float32), 16000, format="WAV")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    logged = []
+    monkeypatch.setattr(routes, "startup_loader", StartupLoader())  # nothing registered, so nothing to wait for
+    monkeypatch.setattr(routes, "transcribe_audio", lambda audio, **kwargs: "آیا چراغ مطالعه دارید؟")
+    monkeypatch.setattr(routes, "build_cached_reply", lambda message: ChatReply(intent=FALLBACK, reply="We have desk lamps."))
+    monkeypatch.setattr(routes, "stream_speech", lambda text, **kwargs: iter([np.full(100, 0.5, dtype=np.float32)] * 3))
+    monkeypatch.setattr(routes, "log_chat_reply", lambda *args, **kwargs: logged.append(args))
+    app = FastAPI()
+    app.include_router(routes.router)
+    test_client = TestClient(app)
+    test_client.logged = logged
+    return test_client
+
+
+def test_voice_turn_streams_the_spoken_reply(client):
+    response = client.post("/api/voice_turn", files={"audio_file": ("question.wav", _wav_upload(), "audio/wav")})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/wav"
+    body = response.content
+    assert body[:4] == b"RIFF" and len(body) == 44 + 3 * 100 * 2
+    assert np.all(np.frombuffer(body[44:], dtype="<i2") == 16383)
+
+    assert unquote(response.headers["x-transcript"]) == "آیا چراغ مطالعه دارید؟"
+    assert unquote(response.headers["x-reply-text"]) == "We have desk lamps."
+    assert response.headers["x-reply-intent"] == FALLBACK
+    stages = [part.split(";")[0].strip() for part in response.headers["server-timing"].split(",")]
+    assert stages == ["decode", "stt", "nlp", "tts_first_byte", "total"]
+    assert len(client.logged) == 1
+
+
+def test_voice_turn_rejects_unsupported_uploads(client):
+    response = client.post("/api/voice_turn", files={"audio_file": ("question.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+
+
+def _failing_transcription(audio, **kwargs):
+    raise TranscriptionError("An unexpected error occurred during audio transcription: out of memory")
+
+
+def test_voice_turn_reports_transcription_errors(client, monkeypatch):
+    monkeypatch.setattr(routes, "transcribe_audio", _failing_transcription)
+    response = client.post("/api/voice_turn", files={"audio_file": ("question.wav", _wav_upload(), "audio/wav")})
+    assert response.status_code == 500
+    assert "out of memory" in response.json()["detail"]
+    assert client.logged == []
+
+
+def test_process_audio_reports_transcription_errors(client, monkeypatch):
+    monkeypatch.setattr(routes, "transcribe_audio", _failing_transcription)
+    response = client.post("/api/process_audio", files={"audio_file": ("question.wav", _wav_upload(), "audio/wav")})
+    assert response.status_code == 500
+    assert "out of memory" in response.json()["detail"]
+
+    monkeypatch.setattr(routes, "transcribe_audio", lambda audio, **kwargs: "Error: is just a word here")
+    response = client.post("/api/process_audio", files={"audio_file": ("question.wav", _wav_upload(), "audio/wav")})
+    assert response.status_code == 200
+    assert response.json()["transcribed_text"] == "Error: is just a word here"
+
+
+def test_voice_turn_rejects_an_upload_that_cannot_be_decoded(client):
+    response = client.post("/api/voice_turn", files={"audio_file": ("question.wav", b"RIFF not really a wav", "audio/wav")})
+    assert response.status_code == 400
+    assert client.logged == []
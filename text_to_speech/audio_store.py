@@ -0,0 +1,266 @@
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Stored audio formats: name -> (file extension, soundfile format, soundfile subtype, media type)
+AUDIO_FORMATS = {
+    "wav": (".wav", "WAV", "PCM_16", "audio/wav"),
+    "opus": (".ogg", "OGG", "OPUS", "audio/ogg"),
+    "mp3": (".mp3", "MP3", "MPEG_LAYER_III", "audio/mpeg"),
+}
+MEDIA_TYPES = {extension: media_type for extension, _, _, media_type in AUDIO_FORMATS.values()}
+
+
+def resolve_audio_format(name: str) -> tuple:
+    """
+    The AUDIO_FORMATS row for name, falling back to WAV when the format is unknown or the
+    installed libsndfile cannot encode it (Opus needs >= 1.0.29, MP3 >= 1.1.0).
+    """
+    row = AUDIO_FORMATS.get(name)
+    if row is None:
+        logger.warning("Unknown audio format %r, storing WAV", name)
+        return AUDIO_FORMATS["wav"]
+    import soundfile as sf
+    _, file_format, subtype, _ = row
+    if subtype not in sf.available_subtypes(file_format):
+        logger.warning("libsndfile cannot write %s/%s, storing WAV", file_format, subtype)
+        return AUDIO_FORMATS["wav"]
+    return row
+
+
+# Stored names look like <prefix>_<hex digest><extension>; anything else is never served
+_NAME_PATTERN = re.compile(r'^[a-z]+_([0-9a-f]{16,64})(\.[a-z0-9]+)$')
+
+
+def shard_of(name: str) -> str:
+    """Subdirectory of a stored file: the first two hex digits of its digest (256 shards)."""
+    return _NAME_PATTERN.match(name).group(1)[:2]
+
+
+class _Entry:
+    __slots__ = ("size", "created_at", "last_access", "pinned")
+
+    def __init__(self, size: int, created_at: float, last_access: float, pinned: bool = False):
+        self.size = size
+        self.created_at = created_at
+        self.last_access = last_access
+        self.pinned = pinned
+
+
+class AudioStore:
+    """
+    Disk store of generated audio files, bounded by age and by total size.
+
+    Files are spread over 256 shard directories (directory/<2 hex digits>/<name>) so no
+    directory grows huge. An in-memory index keeps each file's size, creation and last access
+    time in least-recently-used order. A background sweeper deletes files not accessed for
+    ttl_seconds and, least recently used first, whatever exceeds max_bytes; pinned files
+    (the pre-rendered canned replies) are never deleted. Adding a file also trims the store
+    right away when it goes over budget.
+
+    The index and the byte budget are per process: with several uvicorn workers sharing the
+    directory, each one tracks (and trims) only the files it has seen, so the disk may hold up
+    to workers x max_bytes. A file another worker deleted is forgotten when it is next used.
+    open() indexes the directory once, at startup (or on first use in scripts).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float = 0, url_prefix: str = config.AUDIO_URL_PREFIX):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.url_prefix = url_prefix
+        self._entries = OrderedDict()  # name -> _Entry, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeping = threading.Event()
+        self.evictions = 0
+        self.expirations = 0
+        self._opened = False
+
+    def open(self):
+        """Creates the directory and indexes the files already in it; later calls do nothing."""
+        if self._opened:
+            return
+        with self._lock:
+            if not self._opened:
+                self._scan()
+                self._opened = True
+
+    def _scan(self):
+        """
+        Indexes files left by a previous run (moving files of the old flat layout into their shard).
+        Temporary files are only deleted once they are older than AUDIO_STORE_TEMP_GRACE_SECONDS,
+        since another worker process may still be writing them. Caller holds the lock.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_cutoff = time.time() - config.AUDIO_STORE_TEMP_GRACE_SECONDS
+        found = []
+        for path in list(self.directory.glob("*")) + list(self.directory.glob("*/*")):
+            try:
+                if not path.is_file():
+                    continue
+                if path.name.startswith(".") and path.parent == self.directory:
+                    if path.stat().st_mtime < temp_cutoff:
+                        path.unlink()  # temporary file of a synthesis interrupted by a crash
+                    continue
+                if not _NAME_PATTERN.match(path.name):
+                    continue
+                if path.parent == self.directory:
+                    sharded = self.path(path.name)
+                    sharded.parent.mkdir(exist_ok=True)
+                    os.replace(path, sharded)
+                    path = sharded
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # moved or deleted meanwhile by another worker
+            found.append((stat.st_mtime, path.name, stat.st_size))
+        for mtime, name, size in sorted(found):
+            self._entries[name] = _Entry(size, mtime, mtime)
+            self._total_bytes += size
+
+    def path(self, name: str) -> Path:
+        return self.directory / shard_of(name) / name
+
+    def url(self, name: str) -> str:
+        return f"{self.url_prefix}/{shard_of(name)}/{name}"
+
+    def temp_path(self, extension: str) -> Path:
+        """A path in the store directory to write a new file to before add() publishes it."""
+        self.open()
+        return self.directory / f".{uuid.uuid4().hex}{extension}"
+
+    def touch(self, name: str, pin: bool = False) -> bool:
+        """Marks the file as just used; returns False if it is not in the store."""
+        self.open()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not self._exists(name):
+                return False
+            entry.last_access = time.time()
+            entry.pinned = entry.pinned or pin
+            self._entries.move_to_end(name)
+            return True
+
+    def add(self, name: str, temp_path: Path, pin: bool = False):
+        """Moves a finished file into its shard under name (atomically, so it is never served half-written)."""
+        final_path = self.path(name)
+        final_path.parent.mkdir(exist_ok=True)
+        os.replace(temp_path, final_path)
+        size = final_path.stat().st_size
+        now = time.time()
+        with self._lock:
+            previous = self._entries.pop(name, None)
+            if previous is not None:
+                self._total_bytes -= previous.size
+                pin = pin or previous.pinned
+            self._entries[name] = _Entry(size, now, now, pin)
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict_over_budget()
+
+    def lookup(self, relative_path: str):
+        """
+        Resolves a served path ("<shard>/<name>") to (file path, entry) and touches it.
+        Returns None for unknown or malformed paths, so nothing outside the store can be read.
+        """
+        shard, _, name = relative_path.partition("/")
+        if not _NAME_PATTERN.match(name) or shard != shard_of(name):
+            return None
+        self.open()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not self._exists(name):
+                return None
+            entry.last_access = time.time()
+            self._entries.move_to_end(name)
+        return self.path(name), entry
+
+    def _exists(self, name: str) -> bool:
+        """False (and the entry is dropped) if another worker process deleted the file. Caller holds the lock."""
+        if self.path(name).exists():
+            return True
+        self._total_bytes -= self._entries.pop(name).size
+        return False
+
+    def _remove(self, name: str):
+        """Caller holds the lock."""
+        entry = self._entries.pop(name)
+        self._total_bytes -= entry.size
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def _evict_over_budget(self):
+        """Deletes least recently used unpinned files until the store fits max_bytes. Caller holds the lock."""
+        for name in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if not self._entries[name].pinned:
+                self._remove(name)
+                self.evictions += 1
+
+    def sweep(self) -> int:
+        """Deletes expired files and trims the store to its byte budget; returns the number deleted."""
+        deleted = 0
+        with self._lock:
+            if self.ttl_seconds > 0:
+                cutoff = time.time() - self.ttl_seconds
+                # Least recently used first: stop at the first entry accessed after the cutoff
+                for name in list(self._entries):
+                    entry = self._entries[name]
+                    if entry.last_access >= cutoff:
+                        break
+                    if not entry.pinned:
+                        self._remove(name)
+                        self.expirations += 1
+                        deleted += 1
+            evictions = self.evictions
+            self._evict_over_budget()
+            deleted += self.evictions - evictions
+        if deleted:
+            logger.info("Audio store sweep deleted %d files", deleted)
+        return deleted
+
+    def start_sweeper(self, interval_seconds: float = config.AUDIO_STORE_SWEEP_SECONDS):
+        if interval_seconds <= 0 or self._sweeper is not None:
+            return
+        self._stop_sweeping.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval_seconds,), name="audio-store-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_sweeping.set()
+        self._sweeper = None
+
+    def _sweep_loop(self, interval_seconds: float):
+        while not self._stop_sweeping.wait(interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Audio store sweep failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pinned": sum(entry.pinned for entry in self._entries.values()),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+audio_store = AudioStore(config.AUDIO_OUTPUT_DIR, config.TTS_CACHE_MAX_BYTES, ttl_seconds=config.AUDIO_STORE_TTL_SECONDS)
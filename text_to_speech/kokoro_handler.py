@@ -1,17 +1,201 @@
-from kokoro import KPipeline
+# kokoro (and torch with it) is imported when the pipelines load, so importing this module stays fast
 import soundfile as sf
+import numpy as np
 from pathlib import Path
+from contextlib import contextmanager
+import logging
+import os
+import queue
+import threading
+import time
 
-def synthesize_speech(text: str, output_dir: Path, file_name: str = "output.wav", voice: str = 'af_heart'):
-    pipeline = KPipeline(lang_code='a')
-    generator = pipeline(text, voice=voice)
-    
+import config
+from utils.metrics import AUDIO_SECONDS, FILE_WRITE_BYTES, FILE_WRITE_SECONDS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+# Kokoro's split_pattern for one segment per sentence (by default it only splits on newlines),
+# so the first sentence is ready without waiting for the whole paragraph
+SENTENCE_SPLIT_PATTERN = r'\n+|(?<=[.!?؟])\s+'
+
+TTS_SYNTHESIS_SECONDS = STAGE_SECONDS.labels("tts_synthesis")
+TTS_FIRST_AUDIO_SECONDS = STAGE_SECONDS.labels("tts_first_audio")
+SYNTHESIZED_AUDIO_SECONDS = AUDIO_SECONDS.labels("synthesized")
+
+
+class PipelinePool:
+    """
+    A fixed set of warmed-up KPipeline instances for one language code.
+    All instances share the same Kokoro model weights; each request borrows one pipeline.
+    """
+
+    def __init__(self, lang_code: str, size: int, model):
+        self.lang_code = lang_code
+        self.size = size
+        self._model = model
+        self._idle = queue.Queue()
+
+    def load(self):
+        from kokoro import KPipeline
+
+        for _ in range(self.size):
+            pipeline = KPipeline(lang_code=self.lang_code, repo_id=config.KOKORO_REPO_ID, model=self._model)
+            # Warm-up: loads the voice pack and runs the G2P and the model once
+            for _ in pipeline(config.TTS_WARMUP_TEXT, voice=config.TTS_DEFAULT_VOICE):
+                pass
+            self._idle.put(pipeline)
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        try:
+            pipeline = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free TTS pipeline for lang_code '{self.lang_code}' after {timeout} seconds")
+        try:
+            yield pipeline
+        finally:
+            self._idle.put(pipeline)
+
+    @property
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+
+# Process-wide TTS engine state
+_model = None
+_pools = {}
+_load_lock = threading.Lock()
+tts_ready = False
+
+# Per-call latency counters, see get_tts_status()
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0, "errors": 0, "total_seconds": 0.0, "last_seconds": None, "max_seconds": 0.0,
+    "first_audio_calls": 0, "first_audio_total_seconds": 0.0, "last_first_audio_seconds": None,
+}
+
+
+def load_tts_pipelines(lang_codes=None, pool_size: int = None):
+    """
+    Loads the Kokoro model once and a warmed pool of pipelines per language code.
+    Should be called once when the program starts (next to load_whisper_model).
+    """
+    global _model, tts_ready
+
+    lang_codes = lang_codes or config.TTS_LANG_CODES
+    pool_size = pool_size or config.TTS_POOL_SIZE
+
+    with _load_lock:
+        started = time.perf_counter()
+        if _model is None:
+            from kokoro import KModel
+            logger.info("Loading Kokoro model: %s", config.KOKORO_REPO_ID)
+            _model = KModel(repo_id=config.KOKORO_REPO_ID).eval()
+
+        for lang_code in lang_codes:
+            if lang_code in _pools:
+                continue
+            pool = PipelinePool(lang_code, pool_size, _model)
+            pool.load()
+            _pools[lang_code] = pool
+            logger.info("Kokoro pipelines ready for lang_code '%s' (pool size %d)", lang_code, pool_size)
+
+        tts_ready = True
+        logger.info("TTS engine ready in %.2f s", time.perf_counter() - started)
+
+
+def _get_pool(lang_code: str) -> PipelinePool:
+    pool = _pools.get(lang_code)
+    if pool is None:
+        # Cold path: a language that was not loaded at startup
+        load_tts_pipelines([lang_code])
+        pool = _pools[lang_code]
+    return pool
+
+
+def _record_first_audio(seconds: float):
+    TTS_FIRST_AUDIO_SECONDS.observe(seconds)
+    with _stats_lock:
+        _stats["first_audio_calls"] += 1
+        _stats["first_audio_total_seconds"] += seconds
+        _stats["last_first_audio_seconds"] = seconds
+
+
+def _record_latency(seconds: float, failed: bool):
+    TTS_SYNTHESIS_SECONDS.observe(seconds)
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["errors"] += int(failed)
+        _stats["total_seconds"] += seconds
+        _stats["last_seconds"] = seconds
+        _stats["max_seconds"] = max(_stats["max_seconds"], seconds)
+
+
+def is_tts_ready() -> bool:
+    return tts_ready
+
+
+def get_tts_status() -> dict:
+    """Readiness flag, idle pipelines per language and per-call latency counters."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_seconds"] = stats["total_seconds"] / stats["calls"] if stats["calls"] else None
+    stats["avg_first_audio_seconds"] = (
+        stats["first_audio_total_seconds"] / stats["first_audio_calls"] if stats["first_audio_calls"] else None
+    )
+    return {
+        "ready": tts_ready,
+        "idle_pipelines": {lang_code: pool.idle for lang_code, pool in _pools.items()},
+        "latency": stats,
+    }
+
+
+def stream_speech(text: str, voice: str = None, lang_code: str = 'a', split_pattern: str = None):
+    """
+    Yields the audio of text segment by segment (float32 numpy arrays at SAMPLE_RATE),
+    each one as soon as Kokoro has produced it. The pipeline stays borrowed until the
+    generator is exhausted or closed. split_pattern overrides where Kokoro cuts segments
+    (e.g. SENTENCE_SPLIT_PATTERN).
+    """
+    voice = voice or config.TTS_DEFAULT_VOICE
+    options = {} if split_pattern is None else {"split_pattern": split_pattern}
+    started = time.perf_counter()
+    first_audio_seconds = None
+    failed = True
+    try:
+        with _get_pool(lang_code).acquire(timeout=config.TTS_ACQUIRE_TIMEOUT_SECONDS) as pipeline:
+            for gs, ps, audio in pipeline(text, voice=voice, **options):
+                if audio is None:
+                    continue
+                if first_audio_seconds is None:
+                    first_audio_seconds = time.perf_counter() - started
+                    _record_first_audio(first_audio_seconds)
+                    logger.info("TTS time to first audio: %.3f s (%d chars)", first_audio_seconds, len(text))
+                audio = np.asarray(audio, dtype=np.float32)
+                SYNTHESIZED_AUDIO_SECONDS.inc(len(audio) / SAMPLE_RATE)
+                yield audio
+        failed = False
+    finally:
+        elapsed = time.perf_counter() - started
+        _record_latency(elapsed, failed)
+        logger.info("TTS synthesis of %d chars took %.3f s", len(text), elapsed)
+
+
+def synthesize_speech(text: str, output_dir: Path, file_name: str = "output.wav", voice: str = None, lang_code: str = 'a',
+                      file_format: str = None, subtype: str = None):
+    """
+    Synthesizes the whole text (every segment) into output_dir/file_name and returns its path.
+    file_format/subtype are passed to soundfile (e.g. "OGG"/"OPUS"); by default the format follows the file extension.
+    """
     output_dir.mkdir(parents=True, exist_ok=True)
-    
-    for i, (gs, ps, audio) in enumerate(generator):
-        output_path = output_dir / file_name
-        sf.write(output_path, audio, 24000)
-        print(f"Saved audio to: {output_path}")
-        break
-
-    return str(output_path)
\ No newline at end of file
+    output_path = output_dir / file_name
+
+    segments = list(stream_speech(text, voice=voice, lang_code=lang_code))
+    audio = np.concatenate(segments) if segments else np.zeros(0, dtype=np.float32)
+    with FILE_WRITE_SECONDS.labels("tts_audio").time():
+        sf.write(output_path, audio, SAMPLE_RATE, format=file_format, subtype=subtype)
+    FILE_WRITE_BYTES.labels("tts_audio").inc(os.path.getsize(output_path))
+    print(f"Saved audio to: {output_path}")
+
+    return str(output_path)
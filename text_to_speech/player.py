@@ -0,0 +1,33 @@
+import struct
+
+import numpy as np
+
+from utils.audio_utils import float32_to_int16
+
+# Placeholder RIFF/data sizes for a WAV stream whose length is not known in advance.
+# Browsers and most decoders play such a stream until the connection closes.
+STREAMING_WAV_SIZE = 0xFFFFFFFF
+
+
+def wav_header(sample_rate: int, channels: int = 1, bits_per_sample: int = 16, data_size: int = STREAMING_WAV_SIZE) -> bytes:
+    """44-byte PCM WAV header. With the default data_size the header suits an open-ended stream."""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    riff_size = STREAMING_WAV_SIZE if data_size == STREAMING_WAV_SIZE else 36 + data_size
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def pcm16_bytes(audio) -> bytes:
+    """Converts float audio in [-1, 1] to little-endian 16-bit PCM bytes."""
+    return float32_to_int16(np.asarray(audio, dtype=np.float32)).tobytes()
+
+
+def stream_wav(segments, sample_rate: int):
+    """Yields a WAV header and then each float audio segment as PCM bytes, as they arrive."""
+    yield wav_header(sample_rate)
+    for segment in segments:
+        yield pcm16_bytes(segment)
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+import config
+from text_to_speech.audio_store import AudioStore, audio_store, resolve_audio_format
+from text_to_speech.kokoro_handler import synthesize_speech, SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_PREFIX = "tts_"
+
+
+def tts_cache_key(text: str, voice: str, sample_rate: int = SAMPLE_RATE) -> str:
+    return hashlib.sha256(f"{sample_rate}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized replies.
+
+    Audio for a (text, voice, sample rate) triple is synthesized once and saved in the audio
+    store as tts_<sha256><ext> (the extension follows AUDIO_FORMAT); later requests for the
+    same text get the existing URL. Size and age limits are enforced by the AudioStore;
+    pinned entries (the pre-rendered canned replies) are never evicted.
+    """
+
+    def __init__(self, store: AudioStore, audio_format: str = config.AUDIO_FORMAT):
+        self.store = store
+        self.extension, self.file_format, self.subtype, _ = resolve_audio_format(audio_format)
+        self._lock = threading.Lock()
+        self._pending = {}  # file name -> Future of the synthesis in progress
+        self.hits = 0
+        self.misses = 0
+
+    def _file_name(self, key: str) -> str:
+        return f"{CACHE_FILE_PREFIX}{key}{self.extension}"
+
+    def get_audio_url(self, text: str, voice: str = None, pin: bool = False) -> str:
+        """Returns the URL of the audio for text, synthesizing it only on a cache miss."""
+        voice = voice or config.TTS_DEFAULT_VOICE
+        name = self._file_name(tts_cache_key(text, voice))
+        url = self.store.url(name)
+
+        # One synthesis per key at a time: the first request owns it, concurrent requests for the
+        # same text wait on its Future (and see its exception if it fails). The entry is removed
+        # once the synthesis ends, so a later request after a failure tries again.
+        while not self._touch(name, pin):
+            with self._lock:
+                pending = self._pending.get(name)
+                owner = pending is None
+                if owner:
+                    pending = self._pending[name] = Future()
+            if not owner:
+                pending.result()
+                continue  # normally a hit now (pinned too, if this request asks for it)
+
+            try:
+                if not self._touch(name, pin):
+                    with self._lock:
+                        self.misses += 1
+                    self._synthesize(text, voice, name, pin)
+                pending.set_result(url)
+            except BaseException as e:
+                pending.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._pending.pop(name, None)
+            return url
+        return url
+
+    def _synthesize(self, text: str, voice: str, name: str, pin: bool):
+        # Synthesize under a temporary name so a half-written file is never served
+        temp_path = self.store.temp_path(self.extension)
+        try:
+            synthesize_speech(text, temp_path.parent, file_name=temp_path.name, voice=voice,
+                              file_format=self.file_format, subtype=self.subtype)
+            self.store.add(name, temp_path, pin=pin)
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+
+    def _touch(self, name: str, pin: bool) -> bool:
+        if not self.store.touch(name, pin):
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {"hits": self.hits, "misses": self.misses}
+        return {**self.store.stats(), **counters, "format": self.extension.lstrip(".")}
+
+
+tts_cache = TTSCache(audio_store)
+
+
+def prerender_canned_replies(texts) -> int:
+    """Synthesizes (or finds) the audio of every fixed reply and pins it in the cache."""
+    rendered = 0
+    for text in texts:
+        try:
+            tts_cache.get_audio_url(text, pin=True)
+            rendered += 1
+        except Exception as e:
+            logger.warning("Could not pre-render TTS for %r: %s", text, e)
+    logger.info("Pre-rendered %d canned TTS replies", rendered)
+    return rendered
@@ -0,0 +1,139 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from utils.metrics import STAGE_SECONDS
+
+# Scale between 16-bit PCM and float samples in [-1, 1]
+INT16_SCALE = 32768.0
+RESAMPLE_SECONDS = STAGE_SECONDS.labels("resample")
+
+
+def pcm16_to_float32(data) -> np.ndarray:
+    """Converts 16-bit little-endian PCM bytes (or an int16 array) to float32 samples in [-1, 1], in a single pass."""
+    samples = np.frombuffer(data, dtype='<i2') if not isinstance(data, np.ndarray) else data
+    return np.multiply(samples, np.float32(1.0 / INT16_SCALE), dtype=np.float32)
+
+
+def float32_to_int16(audio: np.ndarray) -> np.ndarray:
+    """
+    Converts float samples to little-endian int16, clipping to [-1, 1].
+    Uses one float32 work buffer and the int16 output; the input is not modified.
+    """
+    scaled = np.multiply(audio, np.float32(INT16_SCALE - 1), dtype=np.float32)
+    np.clip(scaled, -(INT16_SCALE - 1), INT16_SCALE - 1, out=scaled)
+    return scaled.astype('<i2')
+
+
+def to_float32(audio: np.ndarray) -> np.ndarray:
+    """Float32 view of audio: int16 PCM is scaled to [-1, 1]; float32 input is returned without a copy."""
+    if audio.dtype == np.int16:
+        return pcm16_to_float32(audio)
+    return audio.astype(np.float32, copy=False)
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """Downmixes (frames, channels) audio, as soundfile returns it, to float32 mono. 1-D audio is returned as is."""
+    if audio.ndim == 1:
+        return audio
+    if audio.shape[1] == 1:
+        return audio[:, 0]
+    return audio.mean(axis=1, dtype=np.float32)
+
+
+def normalize(audio: np.ndarray, peak: float = 0.95, in_place: bool = False) -> np.ndarray:
+    """Scales audio so its largest absolute sample is `peak`. Silence is returned unchanged."""
+    current_peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+    if current_peak == 0.0:
+        return audio
+    out = audio if in_place else None
+    return np.multiply(audio, np.float32(peak / current_peak), out=out, dtype=np.float32)
+
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up: int, down: int):
+    """
+    Anti-aliasing low-pass FIR for resampling by up/down, designed once per rate pair.
+    Same design as scipy.signal.resample_poly (Kaiser window, beta 5, 10 zero crossings per side),
+    pre-padded so the output is centered; returns (taps, leading output samples to drop).
+    """
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+    pre_pad = down - half_len % down
+    taps = np.concatenate([np.zeros(pre_pad), taps]).astype(np.float32)
+    taps.flags.writeable = False
+    return taps, (half_len + pre_pad) // down
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """
+    Resamples 1-D float audio from orig_sr to target_sr with a polyphase filter (float32 throughout).
+    Only the output samples that are kept are computed, so 8 -> 16 kHz or 48 -> 16 kHz costs a few
+    multiply-adds per sample; the filter for each rate pair is cached.
+    """
+    if orig_sr == target_sr:
+        return audio
+    from scipy.signal import upfirdn
+
+    with RESAMPLE_SECONDS.time():
+        divisor = math.gcd(orig_sr, target_sr)
+        up, down = target_sr // divisor, orig_sr // divisor
+        taps, drop = _polyphase_filter(up, down)
+        output_length = -(-len(audio) * up // down)
+        resampled = upfirdn(taps, to_float32(audio), up, down)[drop:drop + output_length]
+        if len(resampled) < output_length:
+            # Only for inputs shorter than the filter
+            resampled = np.pad(resampled, (0, output_length - len(resampled)))
+    return resampled
+
+
+# Benchmark against librosa.resample and scipy's resample_poly (which designs its filter on every call):
+# speed and error on a test tone (python -m utils.audio_utils)
+if __name__ == "__main__":
+    import time
+
+    from scipy.signal import resample_poly
+
+    try:
+        import librosa
+    except ImportError:
+        librosa = None
+        print("librosa is not installed; skipping its columns")
+
+    def tone(rate: int, seconds: float) -> np.ndarray:
+        # Two tones below the 4 kHz Nyquist limit of 8 kHz telephony audio
+        t = np.arange(int(rate * seconds)) / rate
+        return (0.5 * np.sin(2 * np.pi * 440 * t) + 0.25 * np.sin(2 * np.pi * 3000 * t)).astype(np.float32)
+
+    def snr_db(result: np.ndarray, reference: np.ndarray) -> float:
+        # Edges are skipped: both methods pad the signal with zeros there
+        margin = len(reference) // 20
+        error = result[margin:-margin] - reference[margin:-margin]
+        return 10 * math.log10(np.sum(np.square(reference[margin:-margin])) / max(np.sum(np.square(error)), 1e-20))
+
+    def best_of(function, repeats: int = 5) -> float:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    seconds = 30.0
+    print(f"{'rates':>14} {'ours (ms)':>10} {'SNR (dB)':>9} {'resample_poly (ms)':>19} {'librosa (ms)':>13} {'SNR (dB)':>9}")
+    for orig_sr, target_sr in ((8000, 16000), (22050, 16000), (24000, 16000), (44100, 16000), (48000, 16000), (24000, 8000)):
+        source, reference = tone(orig_sr, seconds), tone(target_sr, seconds)
+        resample(source[:100], orig_sr, target_sr)  # designs and caches the filter
+        ours_seconds = best_of(lambda: resample(source, orig_sr, target_sr))
+        poly_seconds = best_of(lambda: resample_poly(source, target_sr, orig_sr))
+        line = (f"{orig_sr:>6} > {target_sr:>5} {ours_seconds * 1000:>10.1f} "
+                f"{snr_db(resample(source, orig_sr, target_sr), reference):>9.1f} {poly_seconds * 1000:>19.1f}")
+        if librosa is not None:
+            librosa_seconds = best_of(lambda: librosa.resample(source, orig_sr=orig_sr, target_sr=target_sr))
+            librosa_result = librosa.resample(source, orig_sr=orig_sr, target_sr=target_sr)
+            line += f" {librosa_seconds * 1000:>13.1f} {snr_db(librosa_result[:len(reference)], reference):>9.1f}"
+        print(line)
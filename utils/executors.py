@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from utils.metrics import STAGE_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StageSaturated(Exception):
+    """Raised when a stage already has as many running and queued jobs as it accepts."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"The {stage} stage is saturated, please retry later.")
+        self.stage = stage
+
+
+class StageExecutor:
+    """
+    A dedicated thread pool for one blocking stage of a request (search, STT, TTS).
+
+    At most max_workers jobs run at the same time and at most max_queue more wait for a
+    worker. Any job beyond that is rejected at once with StageSaturated, so a burst
+    sheds load instead of growing an unbounded queue, and the event loop itself
+    never runs model or search work.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, initializer=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-stage", initializer=initializer)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._queue_wait = STAGE_QUEUE_WAIT_SECONDS.labels(name)
+
+    def _saturated(self) -> bool:
+        with self._lock:
+            return self.in_flight >= self.max_workers + self.max_queue
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        logger.warning("Rejecting request: %s stage saturated", self.name)
+        raise StageSaturated(self.name)
+
+    def _admit(self):
+        if not self._slots.acquire(blocking=False):
+            self._reject()
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    async def run(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on the stage's pool and awaits the result."""
+        self._admit()
+        try:
+            future = self._executor.submit(self._call, time.perf_counter(), functools.partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job ends on the pool: a cancelled caller (client gone,
+        # timeout) does not stop a job that already started, so it must keep counting
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _call(self, submitted: float, func):
+        self._queue_wait.observe(time.perf_counter() - submitted)
+        return func()
+
+    def open_stream(self, iterator):
+        """
+        Checks now that the stage has room (so rejection happens before a response starts) and
+        returns an async generator that pulls each item of the blocking iterator on the pool.
+
+        The slot is only taken when the generator starts, so a stream that is never iterated
+        (e.g. the client left before the response body) holds nothing. Under a race with other
+        requests the first item may still raise StageSaturated.
+        """
+        if self._saturated():
+            self._reject()
+        return self._stream(iterator)
+
+    async def _stream(self, iterator):
+        self._admit()
+        done = object()
+        pending = None
+        try:
+            while True:
+                pending = self._executor.submit(next, iterator, done)
+                item = await asyncio.wrap_future(pending)
+                if item is done:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+
+            def finish():
+                try:
+                    if close is not None:
+                        close()
+                finally:
+                    self._release()
+
+            if pending is not None and not pending.done():
+                # The consumer was cancelled while next() still runs on the pool: close the
+                # iterator (and free the slot) only once that call has returned
+                pending.add_done_callback(lambda _: self._executor.submit(finish))
+            else:
+                await asyncio.wrap_future(self._executor.submit(finish))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_limit": self.max_queue,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+async def prefetch(iterator, depth: int):
+    """
+    Re-yields an async iterator while a background task stays up to `depth` items ahead of the
+    consumer, so the producing stage (e.g. TTS) keeps working while earlier items are being
+    sent. Errors of the producer are raised to the consumer; closing the consumer stops it.
+    """
+    queue = asyncio.Queue(maxsize=max(1, depth))
+    done = object()
+
+    async def fill():
+        try:
+            async for item in iterator:
+                await queue.put((item, None))
+            await queue.put((done, None))
+        except Exception as e:
+            await queue.put((done, e))
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    producer = asyncio.create_task(fill())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+def _configure_torch_threads():
+    """Worker initializer of the model stages: applies TORCH_NUM_THREADS (process-wide in torch)."""
+    if config.TORCH_NUM_THREADS > 0:
+        import torch
+        if torch.get_num_threads() != config.TORCH_NUM_THREADS:
+            torch.set_num_threads(config.TORCH_NUM_THREADS)
+
+
+search_executor = StageExecutor("search", config.SEARCH_WORKERS, config.SEARCH_QUEUE)
+stt_executor = StageExecutor("stt", config.STT_WORKERS, config.STT_QUEUE, initializer=_configure_torch_threads)
+tts_executor = StageExecutor("tts", config.TTS_WORKERS, config.TTS_QUEUE, initializer=_configure_torch_threads)
+
+
+def executor_stats() -> dict:
+    return {executor.name: executor.stats() for executor in (search_executor, stt_executor, tts_executor)}
@@ -0,0 +1,285 @@
+"""
+Process-wide metrics in the Prometheus text format (served on GET /metrics).
+
+Hot paths only touch in-memory numbers: a counter increment or a histogram observation updates
+a few fields under a per-series lock (about a microsecond). Everything that is already
+counted elsewhere - stage queues, caches, the conversation log queue, model load times - is
+read by collectors only while /metrics is being scraped, so an idle scraper costs nothing.
+
+    SEARCH_SECONDS = STAGE_SECONDS.labels("catalog_search")
+    with SEARCH_SECONDS.time():
+        ...
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+
+import config
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class _CounterSeries:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: dict):
+        yield name + "_total", labels, self.value
+
+
+class _GaugeSeries:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def samples(self, name: str, labels: dict):
+        yield name, labels, self.value
+
+
+class _Timer:
+    __slots__ = ("_series", "_started")
+
+    def __init__(self, series):
+        self._series = series
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._series.observe(time.perf_counter() - self._started)
+        return False
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: tuple):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        slot = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager observing the seconds spent in its block."""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: dict):
+        with self._lock:
+            counts, total, count = list(self._counts), self.sum, self.count
+        cumulative = 0
+        for upper, bucket_count in zip(self._buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            yield name + "_bucket", {**labels, "le": _format_value(float(upper))}, cumulative
+        yield name + "_sum", labels, total
+        yield name + "_count", labels, count
+
+
+class Metric:
+    """A named metric with zero or more label names; each label value combination is one series."""
+
+    def __init__(self, name: str, help_text: str, metric_type: str, labelnames=(), buckets=None):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.labelnames = tuple(labelnames)
+        self._buckets = tuple(sorted(buckets or config.METRICS_LATENCY_BUCKETS))
+        self._series = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_series(self):
+        if self.type == COUNTER:
+            return _CounterSeries()
+        if self.type == GAUGE:
+            return _GaugeSeries()
+        return _HistogramSeries(self._buckets)
+
+    def labels(self, *values):
+        """The series of these label values (created on first use); keep a reference to it on hot paths."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    # Unlabelled metrics are used directly
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def samples(self):
+        for key, series in list(self._series.items()):
+            yield from series.samples(self.name, dict(zip(self.labelnames, key)))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Metric:
+        return self._register(Metric(name, help_text, COUNTER, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames=()) -> Metric:
+        return self._register(Metric(name, help_text, GAUGE, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=None) -> Metric:
+        return self._register(Metric(name, help_text, HISTOGRAM, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """
+        Registers a function called on every scrape. It yields (name, type, help, samples) with
+        samples a list of (labels dict, value); counters are named without the _total suffix.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """The whole registry in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {_escape(e)}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                sample_name = name + "_total" if metric_type == COUNTER else name
+                lines.extend(f"{sample_name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Seconds spent in each step of a request, by stage (see the callers for what each stage covers)
+STAGE_SECONDS = registry.histogram("callcenter_stage_seconds", "Seconds spent in each processing stage.", ["stage"])
+# Seconds a job waited for a worker of a StageExecutor (utils.executors)
+STAGE_QUEUE_WAIT_SECONDS = registry.histogram(
+    "callcenter_stage_queue_wait_seconds", "Seconds a job waited for a free worker of its stage pool.", ["stage"])
+FILE_WRITE_SECONDS = registry.histogram("callcenter_file_write_seconds", "Seconds spent writing files, by kind.", ["kind"])
+FILE_WRITE_BYTES = registry.counter("callcenter_file_write_bytes", "Bytes written to files, by kind.", ["kind"])
+# Audio in and out, so stage seconds / audio seconds gives the real-time factor
+AUDIO_SECONDS = registry.counter("callcenter_audio_seconds", "Seconds of audio transcribed or synthesized.", ["direction"])
+WHISPER_BATCH_SIZE = registry.histogram("callcenter_whisper_batch_size", "Inputs decoded per Whisper generate call.",
+                                        buckets=(1, 2, 4, 8, 16, 32))
+CHAT_REPLIES = registry.counter("callcenter_chat_replies", "Chat replies, by intent.", ["intent"])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "callcenter_http_request_seconds", "Seconds from request start to the end of the response body.",
+    ["method", "route", "status"])
+
+
+def route_template(scope) -> str:
+    """
+    The request path with every path parameter value replaced by its name (/static/audio/{file_path}),
+    so each route is one series however many files or ids it serves; "unmatched" for 404s of unknown paths.
+    """
+    if "route" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in reversed(list(scope.get("path_params", {}).items())):
+        value = str(value)
+        position = path.rfind(value) if value else -1
+        if position >= 0:
+            path = path[:position] + "{" + name + "}" + path[position + len(value):]
+    return path
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request (until its last body chunk is sent) by method,
+    route template and status code.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_template(scope), status[0]).observe(time.perf_counter() - started)
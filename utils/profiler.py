@@ -0,0 +1,119 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+OTHER_STACK = "(other)"
+# Leaf frames of threads that are only waiting (idle pool workers, the event loop's select)
+IDLE_LEAVES = {"thread.py:_worker", "threading.py:wait", "threading.py:_wait_for_tstate_lock", "selectors.py:select", "queue.py:get"}
+_THREAD_NUMBER = re.compile(r"[_-]\d+$")
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of the whole process, switched on and off at runtime.
+
+    While running, a background thread takes the Python stack of every other thread each
+    interval_ms (sys._current_frames) and counts identical stacks. The result is in the
+    "collapsed" format of flamegraph.pl / speedscope: one line per stack, frames from the thread
+    down to the leaf separated by ';', followed by the number of samples. When it is stopped
+    nothing runs at all, so it can stay available in production.
+    """
+
+    def __init__(self, interval_ms: int = config.PROFILER_INTERVAL_MS, max_stacks: int = config.PROFILER_MAX_STACKS):
+        self.interval_ms = interval_ms
+        self.max_stacks = max_stacks
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: int = None, max_seconds: float = config.PROFILER_MAX_SECONDS) -> dict:
+        """Starts a new profile (the previous one is discarded); it stops by itself after max_seconds."""
+        self.stop()
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+            self.interval_ms = interval_ms or self.interval_ms
+            self.started_at = time.time()
+            self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(max_seconds,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info("Sampling profiler started (every %d ms, at most %.0f s)", self.interval_ms, max_seconds)
+        return self.stats()
+
+    def stop(self) -> dict:
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._thread = None
+            logger.info("Sampling profiler stopped after %d samples", self.samples)
+        return self.stats()
+
+    def _run(self, max_seconds: float):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + max_seconds
+        while not self._stop.wait(self.interval_ms / 1000):
+            if time.monotonic() >= deadline:
+                break
+            names = {thread.ident: _THREAD_NUMBER.sub("", thread.name) for thread in threading.enumerate()}
+            stacks = [self._collapse(names.get(ident, "thread"), frame)
+                      for ident, frame in sys._current_frames().items() if ident != own_ident]
+            with self._lock:
+                for stack in stacks:
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self._stacks[OTHER_STACK] += 1
+                self.samples += 1
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+    def collapsed(self, include_idle: bool = False, top: int = None) -> str:
+        """The profile in collapsed-stack format, most sampled stacks first."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        if not include_idle:
+            stacks = [(stack, count) for stack, count in stacks if stack.rsplit(";", 1)[-1] not in IDLE_LEAVES]
+        if top:
+            stacks = stacks[:top]
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval_ms": self.interval_ms,
+                "samples": self.samples,
+                "stacks": len(self._stacks),
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at,
+            }
+
+
+sampling_profiler = SamplingProfiler()
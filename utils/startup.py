@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ComponentNotReady(Exception):
+    """Raised when a request needs a component (catalog, Whisper, TTS) that is still loading or failed to load."""
+
+    def __init__(self, component: str, state: str):
+        super().__init__(f"The {component} component is {state}, please retry later.")
+        self.component = component
+        self.state = state
+
+
+class _Component:
+    def __init__(self, name: str, loader, required: bool):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.state = PENDING
+        self.error = None
+        self.details = None
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        if self.started_at is None:
+            seconds = None
+        else:
+            seconds = round((self.finished_at or time.perf_counter()) - self.started_at, 3)
+        return {"state": self.state, "required": self.required, "seconds": seconds, "error": self.error, "details": self.details}
+
+
+class StartupLoader:
+    """
+    Loads the heavy components of the app (catalog, Whisper, Kokoro) concurrently, each on its
+    own background thread, and tracks their state and load time for /api/ready.
+
+    A loader is a plain function; what it returns is reported as the component's details, and an
+    exception marks the component as failed. `required` components decide overall readiness, so
+    text chat can serve as soon as the catalog is loaded while the speech models keep loading.
+    """
+
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader, required: bool = False):
+        with self._lock:
+            self._components[name] = _Component(name, loader, required)
+
+    def start(self):
+        """Starts every pending component in the background and returns immediately."""
+        with self._lock:
+            pending = [component for component in self._components.values() if component.state == PENDING]
+            for component in pending:
+                component.state = LOADING
+                component.started_at = time.perf_counter()
+        for component in pending:
+            threading.Thread(target=self._load, args=(component,), name=f"startup-{component.name}", daemon=True).start()
+
+    def _load(self, component: _Component):
+        try:
+            component.details = component.loader()
+            component.state = READY
+            logger.info("Component '%s' ready in %.2f s", component.name, time.perf_counter() - component.started_at)
+        except Exception as e:
+            component.error = str(e)
+            component.state = FAILED
+            logger.error("Component '%s' failed to load: %s", component.name, e)
+        finally:
+            component.finished_at = time.perf_counter()
+            component.done.set()
+
+    def state(self, name: str) -> str:
+        component = self._components.get(name)
+        return component.state if component else PENDING
+
+    def is_ready(self, name: str) -> bool:
+        return self.state(name) == READY
+
+    def require(self, name: str):
+        """Raises ComponentNotReady unless the component has loaded (unregistered components are not checked)."""
+        component = self._components.get(name)
+        if component is not None and component.state != READY:
+            raise ComponentNotReady(name, component.state)
+
+    def wait(self, name: str, timeout: float = None) -> bool:
+        component = self._components.get(name)
+        return component is None or (component.done.wait(timeout) and component.state == READY)
+
+    def status(self) -> dict:
+        components = {name: component.to_dict() for name, component in self._components.items()}
+        return {
+            "ready": all(component.state == READY for component in self._components.values() if component.required),
+            "all_ready": all(component.state == READY for component in self._components.values()),
+            "components": components,
+        }
+
+
+startup_loader = StartupLoader()
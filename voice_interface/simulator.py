@@ -0,0 +1,140 @@
+"""
+Simulated phone call against the app, without Twilio: posts the voice webhook, opens the media
+stream it returns and plays a recording as a caller would (8 kHz μ-law in 20 ms "media" events),
+then collects the spoken replies.
+
+    python -m voice_interface.simulator caller.wav --out reply.wav --realtime
+"""
+import argparse
+import base64
+import json
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+
+import numpy as np
+import soundfile as sf
+from starlette.testclient import TestClient
+
+from utils.audio_utils import resample, to_mono
+from voice_interface.twilio_handler import (
+    FRAME_BYTES, FRAME_MS, TELEPHONY_SAMPLE_RATE, FramePacketizer, float32_to_ulaw, ulaw_to_float32,
+)
+
+
+def caller_frames(audio: np.ndarray, sample_rate: int, trailing_silence_ms: int) -> list:
+    """The recording as the 20 ms μ-law frames Twilio would send, followed by silence (so the VAD ends the utterance)."""
+    audio = resample(to_mono(audio.astype(np.float32, copy=False)), sample_rate, TELEPHONY_SAMPLE_RATE)
+    audio = np.concatenate([audio, np.zeros(trailing_silence_ms * TELEPHONY_SAMPLE_RATE // 1000, dtype=np.float32)])
+    packetizer = FramePacketizer()
+    return packetizer.feed(float32_to_ulaw(audio)) + packetizer.flush()
+
+
+class SimulatedCall:
+    """One call over a TestClient: a sender plays the frames while a reader thread timestamps every reply message."""
+
+    def __init__(self, client: TestClient, from_number: str = "+15550000000"):
+        self.client = client
+        self.from_number = from_number
+        self.call_sid = "CA" + uuid.uuid4().hex
+        self.stream_sid = "MZ" + uuid.uuid4().hex
+        self.received = []  # (seconds since the caller stopped speaking, message)
+
+    def connect(self) -> str:
+        """Posts the voice webhook and returns the media stream path from its TwiML."""
+        response = self.client.post("/voice/twilio/incoming", data={"CallSid": self.call_sid, "From": self.from_number})
+        response.raise_for_status()
+        stream = ElementTree.fromstring(response.text).find("./Connect/Stream")
+        if stream is None:
+            raise RuntimeError(f"The webhook did not connect a media stream: {response.text}")
+        return urlparse(stream.get("url")).path
+
+    def run(self, frames: list, speech_frames: int, realtime: bool = False, wait_seconds: float = 30.0) -> dict:
+        path = self.connect()
+        speech_ended_at = None
+        with self.client.websocket_connect(path) as websocket:
+            reader = threading.Thread(target=self._read, args=(websocket, lambda: speech_ended_at), daemon=True)
+            reader.start()
+            websocket.send_text(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+            websocket.send_text(json.dumps({
+                "event": "start",
+                "streamSid": self.stream_sid,
+                "start": {"streamSid": self.stream_sid, "callSid": self.call_sid, "tracks": ["inbound"],
+                          "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": TELEPHONY_SAMPLE_RATE, "channels": 1}},
+            }))
+            started = time.perf_counter()
+            for index, frame in enumerate(frames):
+                if realtime:
+                    time.sleep(max(0.0, started + index * FRAME_MS / 1000 - time.perf_counter()))
+                websocket.send_text(json.dumps({
+                    "event": "media",
+                    "streamSid": self.stream_sid,
+                    "media": {"track": "inbound", "chunk": str(index + 1), "timestamp": str(index * FRAME_MS),
+                              "payload": base64.b64encode(frame).decode("ascii")},
+                }))
+                if index + 1 == speech_frames:
+                    speech_ended_at = time.perf_counter()
+            # "stop" makes the server finish the last utterance and send every reply before it closes
+            websocket.send_text(json.dumps({"event": "stop", "streamSid": self.stream_sid, "stop": {"callSid": self.call_sid}}))
+            reader.join(wait_seconds)
+        return self.summary()
+
+    def _read(self, websocket, speech_ended_at):
+        try:
+            while True:
+                message = websocket.receive_json()
+                ended_at = speech_ended_at()
+                self.received.append((None if ended_at is None else time.perf_counter() - ended_at, message))
+        except Exception:
+            pass  # the server closed the stream after the last reply
+
+    def reply_audio(self) -> np.ndarray:
+        payloads = [base64.b64decode(message["media"]["payload"]) for _, message in self.received if message.get("event") == "media"]
+        return ulaw_to_float32(b"".join(payloads))
+
+    def summary(self) -> dict:
+        media = [(seconds, message) for seconds, message in self.received if message.get("event") == "media"]
+        marks = [message["mark"]["name"] for _, message in self.received if message.get("event") == "mark"]
+        first_audio = next((seconds for seconds, _ in media if seconds is not None), None)
+        return {
+            "call_sid": self.call_sid,
+            "reply_frames": len(media),
+            "reply_seconds": len(media) * FRAME_BYTES / TELEPHONY_SAMPLE_RATE,
+            "replies": marks,
+            "end_of_speech_to_first_audio_ms": None if first_audio is None else round(first_audio * 1000, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a Twilio phone call against the app.")
+    parser.add_argument("audio", help="Recording of the caller (any format soundfile reads, any sample rate)")
+    parser.add_argument("--out", help="Write the spoken replies to this WAV file")
+    parser.add_argument("--realtime", action="store_true", help="Send frames at the pace of a real call")
+    parser.add_argument("--silence-ms", type=int, default=1500, help="Silence sent after the recording")
+    parser.add_argument("--wait", type=float, default=30.0, help="Seconds to wait for the replies after the call ends")
+    args = parser.parse_args()
+
+    from main import app
+    from utils.startup import startup_loader
+
+    audio, sample_rate = sf.read(args.audio, dtype="float32")
+    frames = caller_frames(audio, sample_rate, args.silence_ms)
+    speech_frames = len(frames) - args.silence_ms // FRAME_MS
+
+    with TestClient(app) as client:
+        for component in ("catalog", "whisper", "tts"):
+            if not startup_loader.wait(component, timeout=600):
+                raise SystemExit(f"The {component} component did not load: {startup_loader.status()['components'][component]}")
+        call = SimulatedCall(client)
+        summary = call.run(frames, speech_frames, realtime=args.realtime, wait_seconds=args.wait)
+
+    print(json.dumps(summary, indent=2))
+    if args.out:
+        sf.write(args.out, call.reply_audio(), TELEPHONY_SAMPLE_RATE)
+        print(f"Saved the replies to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import asyncio
+import base64
+import logging
+import time
+
+import numpy as np
+
+import config
+from chat_interface.web_chat import extract_tts_text
+from logs.store import log_chat_reply
+from nlp_engine.response_cache import ResponseCache
+from nlp_engine.response_generator import build_cached_reply
+from speech_to_text.streaming import StreamingSession
+from text_to_speech.kokoro_handler import is_tts_ready, stream_speech, SAMPLE_RATE
+from text_to_speech.tts_cache import tts_cache_key
+from utils.audio_utils import float32_to_int16, resample
+from utils.executors import search_executor, tts_executor, StageSaturated
+from utils.startup import startup_loader, ComponentNotReady
+
+logger = logging.getLogger(__name__)
+
+# Phone audio: G.711 μ-law, 8 kHz mono, one byte per sample, sent in 20 ms frames
+TELEPHONY_SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_BYTES = TELEPHONY_SAMPLE_RATE * FRAME_MS // 1000
+ULAW_SILENCE = 0xFF
+
+
+def _build_ulaw_tables():
+    """
+    Lookup tables of the G.711 μ-law codec (the same mapping as audioop.lin2ulaw / ulaw2lin):
+    encode maps every int16 value (indexed by its uint16 bit pattern) to a code byte,
+    decode maps every code byte to a float32 sample in [-1, 1].
+    """
+    segment_ends = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+    values = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.int16).astype(np.int32) >> 2
+    magnitude = np.minimum(np.abs(values), 8159) + 33
+    segment = np.searchsorted(segment_ends, magnitude)
+    code = np.where(segment >= 8, 0x7F, (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    encode = (code ^ np.where(values < 0, 0x7F, 0xFF)).astype(np.uint8)
+
+    inverted = ~np.arange(256, dtype=np.uint8)
+    magnitude = (((inverted & 0x0F).astype(np.int32) << 3) + 0x84) << ((inverted & 0x70) >> 4)
+    decode = np.where(inverted & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.float32) / 32768.0
+    encode.flags.writeable = False
+    decode.flags.writeable = False
+    return encode, decode
+
+
+_ULAW_ENCODE, _ULAW_DECODE = _build_ulaw_tables()
+
+
+def ulaw_to_float32(data: bytes) -> np.ndarray:
+    """Decodes μ-law bytes to float32 samples with one table lookup per sample."""
+    return _ULAW_DECODE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def float32_to_ulaw(audio: np.ndarray) -> bytes:
+    """Encodes float samples in [-1, 1] to μ-law bytes with one table lookup per sample."""
+    return _ULAW_ENCODE[float32_to_int16(audio).view(np.uint16)].tobytes()
+
+
+class FramePacketizer:
+    """Cuts a byte stream that arrives in chunks of any size into fixed frames (20 ms of μ-law by default)."""
+
+    def __init__(self, frame_bytes: int = FRAME_BYTES):
+        self.frame_bytes = frame_bytes
+        self._leftover = b""
+
+    def feed(self, data: bytes) -> list:
+        data = self._leftover + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._leftover = data[usable:]
+        return [data[start:start + self.frame_bytes] for start in range(0, usable, self.frame_bytes)]
+
+    def flush(self) -> list:
+        """The last partial frame, padded with silence (empty when nothing is left)."""
+        if not self._leftover:
+            return []
+        frame = self._leftover.ljust(self.frame_bytes, bytes([ULAW_SILENCE]))
+        self._leftover = b""
+        return [frame]
+
+
+# Rendered replies, keyed like the TTS cache (text, voice and the 8 kHz rate)
+telephony_audio_cache = ResponseCache(capacity=config.TELEPHONY_AUDIO_CACHE_SIZE)
+
+
+def iter_telephony_audio(text: str, voice: str = None):
+    """
+    Yields the reply as 8 kHz μ-law chunks: Kokoro's 24 kHz segments are resampled and encoded
+    as soon as each one is synthesized, so a call hears the first sentence before the rest is ready.
+    A reply rendered to the end is cached; a cached reply is yielded as a single chunk.
+    """
+    voice = voice or config.TTS_DEFAULT_VOICE
+    key = tts_cache_key(text, voice, TELEPHONY_SAMPLE_RATE)
+    cached = telephony_audio_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    for segment in stream_speech(text, voice=voice):
+        chunk = float32_to_ulaw(resample(segment, SAMPLE_RATE, TELEPHONY_SAMPLE_RATE))
+        chunks.append(chunk)
+        yield chunk
+    telephony_audio_cache.put(key, b"".join(chunks))
+
+
+def render_telephony_audio(text: str, voice: str = None) -> bytes:
+    """The whole reply as 8 kHz μ-law bytes (from the cache when it was rendered before)."""
+    return b"".join(iter_telephony_audio(text, voice))
+
+
+def prerender_telephony_replies(texts) -> int:
+    """Renders the fixed replies for phone calls ahead of time."""
+    rendered = 0
+    for text in texts:
+        try:
+            render_telephony_audio(text)
+            rendered += 1
+        except Exception as e:
+            logger.warning("Could not pre-render telephony audio for %r: %s", text, e)
+    logger.info("Pre-rendered %d canned telephony replies", rendered)
+    return rendered
+
+
+class TwilioMediaSession:
+    """
+    One phone call over Twilio Media Streams.
+
+    Caller audio ("media" events, base64 μ-law) is decoded and fed at 8 kHz to a StreamingSession,
+    whose VAD cuts it into utterances. Each final transcript is answered like a chat message and
+    the reply is streamed back as 20 ms μ-law "media" messages, followed by a "mark" that Twilio
+    echoes once the caller has heard it. Replies are spoken in the order of the utterances.
+
+    `send` is an async callable taking a dict (sent to Twilio as JSON).
+    """
+
+    def __init__(self, send, language: str = config.TELEPHONY_STT_LANGUAGE):
+        self._send = send
+        self.stream_sid = None
+        self.call_sid = None
+        self.stt = StreamingSession(self._on_transcript, language=language,
+                                    sample_rate=TELEPHONY_SAMPLE_RATE, partials=False)
+        self._reply_task = None
+        self._tasks = set()
+        self.frames_received = 0
+        self.frames_sent = 0
+        self.replies = 0
+
+    async def handle(self, message: dict) -> bool:
+        """Processes one message from Twilio; returns False once the stream has stopped."""
+        event = message.get("event")
+        if event == "media":
+            media = message["media"]
+            if media.get("track", "inbound") == "inbound":
+                self.frames_received += 1
+                await self.stt.feed_samples(ulaw_to_float32(base64.b64decode(media["payload"])))
+        elif event == "start":
+            start = message.get("start", {})
+            self.stream_sid = message.get("streamSid") or start.get("streamSid")
+            self.call_sid = start.get("callSid")
+            logger.info("Call %s: media stream %s started", self.call_sid, self.stream_sid)
+        elif event == "mark":
+            logger.debug("Call %s: %s played", self.call_sid, message.get("mark", {}).get("name"))
+        elif event == "stop":
+            await self.finish()
+            return False
+        return True
+
+    async def _on_transcript(self, message: dict):
+        if message.get("type") != "final" or not message.get("text", "").strip():
+            return
+        task = asyncio.create_task(self._reply(message["text"].strip(), self._reply_task))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._reply_task = task
+
+    async def _reply(self, text: str, previous):
+        started = time.perf_counter()
+        try:
+            startup_loader.require("catalog")
+            reply = await search_executor.run(build_cached_reply, text)
+        except (StageSaturated, ComponentNotReady) as e:
+            logger.warning("Call %s: no reply to %r: %s", self.call_sid, text, e)
+            return
+        latency_ms = (time.perf_counter() - started) * 1000
+        log_chat_reply("phone", text, reply, latency_ms=latency_ms, call_sid=self.call_sid)
+
+        if previous is not None:
+            # The previous reply is fully queued before this one starts
+            await asyncio.gather(previous, return_exceptions=True)
+        if not is_tts_ready():
+            logger.warning("Call %s: TTS not ready, reply not spoken", self.call_sid)
+            return
+
+        index = self.replies
+        self.replies += 1
+        packetizer = FramePacketizer()
+        try:
+            async for chunk in tts_executor.open_stream(iter_telephony_audio(extract_tts_text(reply))):
+                for frame in packetizer.feed(chunk):
+                    await self._send_frame(frame)
+        except StageSaturated:
+            logger.warning("Call %s: TTS stage saturated, reply not spoken", self.call_sid)
+            return
+        for frame in packetizer.flush():
+            await self._send_frame(frame)
+        await self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": f"reply-{index}"}})
+        logger.info("Call %s: reply %d queued %.0f ms after the transcript", self.call_sid, index,
+                    (time.perf_counter() - started) * 1000)
+
+    async def _send_frame(self, frame: bytes):
+        self.frames_sent += 1
+        await self._send({
+            "event": "media",
+            "streamSid": self.stream_sid,
+            "media": {"payload": base64.b64encode(frame).decode("ascii")},
+        })
+
+    async def finish(self):
+        """Transcribes the last utterance and waits until every reply has been sent."""
+        await self.stt.finish()
+        if self._reply_task is not None:
+            await asyncio.gather(self._reply_task, return_exceptions=True)
+
+    def close(self):
+        """Drops pending work when the call has hung up."""
+        self.stt.close()
+        for task in list(self._tasks):
+            task.cancel()
+
+
+# Benchmark: per-frame cost of the media path, i.e. how many concurrent calls one worker could
+# carry before the codec alone used a whole core (python -m voice_interface.twilio_handler)
+if __name__ == "__main__":
+    import json
+
+    from speech_to_text.utils import EnergyVAD
+
+    rng = np.random.default_rng(0)
+    speech = (0.3 * np.sin(2 * np.pi * 300 * np.arange(FRAME_BYTES * 3000) / TELEPHONY_SAMPLE_RATE)
+              + rng.normal(0, 0.02, FRAME_BYTES * 3000)).astype(np.float32)
+    inbound = [json.dumps({"event": "media", "media": {"track": "inbound", "payload": base64.b64encode(frame).decode()}})
+               for frame in FramePacketizer().feed(float32_to_ulaw(speech))]
+
+    vad = EnergyVAD(sample_rate=TELEPHONY_SAMPLE_RATE, frame_ms=config.STREAM_VAD_FRAME_MS, min_rms=config.STREAM_VAD_MIN_RMS)
+    started = time.perf_counter()
+    pending = np.zeros(0, dtype=np.float32)
+    for text in inbound:
+        message = json.loads(text)
+        pending = np.concatenate([pending, ulaw_to_float32(base64.b64decode(message["media"]["payload"]))])
+        usable = len(pending) - len(pending) % vad.frame_size
+        for frame in pending[:usable].reshape(-1, vad.frame_size):
+            vad.process(frame)
+        pending = pending[usable:]
+    inbound_us = (time.perf_counter() - started) / len(inbound) * 1e6
+
+    reply = resample(speech, TELEPHONY_SAMPLE_RATE, SAMPLE_RATE)  # 24 kHz, like Kokoro's output
+    started = time.perf_counter()
+    packetizer = FramePacketizer()
+    frames = packetizer.feed(float32_to_ulaw(resample(reply, SAMPLE_RATE, TELEPHONY_SAMPLE_RATE))) + packetizer.flush()
+    for frame in frames:
+        json.dumps({"event": "media", "streamSid": "MZ0", "media": {"payload": base64.b64encode(frame).decode("ascii")}})
+    outbound_us = (time.perf_counter() - started) / len(frames) * 1e6
+
+    frames_per_second = 1000 // FRAME_MS
+    core_share = (inbound_us + outbound_us) * frames_per_second / 1e6
+    print(f"inbound frame (JSON + base64 + μ-law decode + VAD):        {inbound_us:7.1f} µs")
+    print(f"outbound frame (resample + μ-law encode + base64 + JSON):  {outbound_us:7.1f} µs")
+    print(f"one call, both directions: {core_share * 100:.3f}% of a core -> about {int(1 / core_share)} calls per core "
+          f"(media path only; Whisper and Kokoro not included)")
@@ -0,0 +1,77 @@
+import base64
+import hashlib
+import hmac
+import logging
+from xml.sax.saxutils import quoteattr
+
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+
+import config
+from utils.startup import startup_loader
+from voice_interface.twilio_handler import TwilioMediaSession
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+NOT_READY_TWIML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    "<Response><Say>Sorry, our assistant is starting up. Please call again in a minute.</Say><Hangup/></Response>"
+)
+
+
+def twilio_signature(url: str, params: dict, auth_token: str) -> str:
+    """Twilio's request signature: base64 HMAC-SHA1 of the URL followed by every POST parameter (sorted by name)."""
+    payload = url + "".join(f"{name}{params[name]}" for name in sorted(params))
+    digest = hmac.new(auth_token.encode("utf-8"), payload.encode("utf-8"), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+@router.post("/incoming")
+async def twilio_incoming_call(request: Request):
+    """
+    Voice webhook of the Twilio phone number. Answers with TwiML that connects the call to the
+    bidirectional media stream below. When TWILIO_AUTH_TOKEN is set the X-Twilio-Signature header
+    is checked (the app must see the public URL Twilio called, e.g. uvicorn --proxy-headers).
+    """
+    form = await request.form()
+    if config.TWILIO_AUTH_TOKEN:
+        expected = twilio_signature(str(request.url), dict(form), config.TWILIO_AUTH_TOKEN)
+        if not hmac.compare_digest(expected, request.headers.get("x-twilio-signature", "")):
+            raise HTTPException(status_code=403, detail="Invalid Twilio signature.")
+
+    if not startup_loader.is_ready("whisper"):
+        logger.warning("Call %s rejected: speech-to-text is %s", form.get("CallSid"), startup_loader.state("whisper"))
+        return Response(content=NOT_READY_TWIML, media_type="application/xml")
+
+    stream_url = config.TWILIO_STREAM_URL or str(request.url_for("twilio_media_stream")).replace("http", "ws", 1)
+    twiml = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f"<Response><Connect><Stream url={quoteattr(stream_url)} /></Connect></Response>"
+    )
+    logger.info("Call %s from %s connected to %s", form.get("CallSid"), form.get("From"), stream_url)
+    return Response(content=twiml, media_type="application/xml")
+
+
+@router.websocket("/media", name="twilio_media_stream")
+async def twilio_media_stream(websocket: WebSocket):
+    """
+    Twilio Media Streams WebSocket: receives the caller's 8 kHz μ-law audio as JSON "media" events
+    and sends the spoken replies back the same way (see TwilioMediaSession).
+    """
+    await websocket.accept()
+    if not startup_loader.is_ready("whisper"):
+        await websocket.close(code=1013)  # try again later
+        return
+    session = TwilioMediaSession(websocket.send_json)
+    try:
+        while True:
+            if not await session.handle(await websocket.receive_json()):
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+        logger.info("Call %s ended: %d frames received, %d frames sent, %d replies",
+                    session.call_sid, session.frames_received, session.frames_sent, session.replies)
+